@@ -18,6 +18,12 @@ Note that this log will contain Personally Identifiable Information, so by
 default it is saved in the `tmp` folder where it shouldn't stick around for
 more than a week.
 
+Alongside the logfile there is a journal (the logfile path with ".jsonl"
+appended) which has the same state updates as JSON lines; this is what is
+actually read when resuming a run, because it is much quicker to parse. It also
+contains PII. If there is no journal, for instance for runs started with an
+older version of this module, the logfile is read instead.
+
 All emails sent with email_engine will have the same Notify reference; by
 default (see email_engine.cli) this is the name of the script. Alternatively,
 you can override the reference with a command line argument. The reference is
@@ -48,6 +54,44 @@ job parameter that by default is the name of the job and the date, and the
 logfile could be located in a directory that is preserved between runs. Then
 re-running a job with the same parameters would resume the previous run.
 
+For large mailings most of the run time is spent waiting for Notify to respond;
+the `--concurrency` flag sets how many notifications are sent at the same time.
+Resuming a run works the same however many workers were used. Options like
+this, which change how notifications are sent but not which ones, are left out
+of the hash in the default reference, so a run can be resumed with different
+settings as long as they are spelt out in full (not abbreviated).
+
+Requests to Notify are rate limited (see the `--rate-limit` and
+`--rate-limit-burst` flags) so that sending concurrently doesn't go over
+Notify's own rate limit. If Notify does respond with 429 Too Many Requests or a
+server error, the notification will be retried with backoff (up to
+`--max-retries` times) instead of stopping the run. At the end of the run a
+summary of the number of requests made and how long they took is logged.
+
+Normally all the notifications are generated (which usually means a lot of
+calls to the DMp API) before any are sent. With the `--pipeline` flag sending
+starts straight away, while the generator runs in the background; at most
+`--max-queued` notifications will be waiting to be sent at any time. If a
+pipelined run is interrupted before the generator is exhausted, running the
+script again runs the generator again and only sends the notifications that
+weren't sent the first time.
+
+If every recipient gets the same template, the `--bulk` flag will send the
+notifications in batches (of `--batch-size`) with Notify's bulk sending API
+instead of one request per notification. See the `bulk` module in this package
+for details.
+
+After a run, `python -m dmscripts.email_engine status --reference=<reference>`
+will ask Notify what happened to each notification in the run and print a
+summary of delivery statuses for each template. See the `status` module in this
+package for details.
+
+To plan a large mailing, `--simulate-latency` does a dry run where Notify is
+replaced by a fake that takes a random amount of time to respond, and reports
+how long sending would have taken, response time percentiles, and how many
+requests were in flight at once. See the `simulate` module in this package for
+details.
+
 How to use as a script writer
 -----------------------------
 
@@ -132,15 +176,20 @@ from notifications_python_client.notifications import NotificationsAPIClient
 from dmscripts.helpers.logging_helpers import configure_logger
 
 from .cli import argument_parser_factory
+from .bulk import BulkBackend, LoopingBulkBackend, NotifyBulkBackend, RateLimitedBulkBackend
 from .typing import EmailNotification, NotificationResponse, Notifications
-from .logger import STATE, logger
+from .journal import journal_handler, journal_path
+from .logger import STATE, journal_logger, logger
 from .queue import run
+from .ratelimit import RateLimitedSender
+from .simulate import ScaledClock, SimulatedNotify
 
 
 def email_engine(
     notifications: Notifications,
     *,
     args: argparse.Namespace = None,
+    bulk_backend: BulkBackend = None,
     **kwargs,
 ):
     """Send emails via Notify
@@ -154,6 +203,8 @@ def email_engine(
 
     :param notifications: a generator that yields `EmailNotification`s to send
     :param args: parsed command line arguments, if not provided email_engine.cli will be used to parse sys.argv
+    :param bulk_backend: backend to send batches of notifications with if the --bulk flag is given,
+        if not provided Notify's bulk sending API will be used
     """
 
     if args is None:
@@ -188,14 +239,36 @@ def email_engine(
     # then you will just get an error message saying `failed to format log
     # message`. So don't do that.
 
+    # The journal gets machine-readable copies of the state updates, which
+    # are used to resume the run.
+    journal = journal_path(logfile)
+    journal_log_handler = journal_handler(journal)
+    journal_logger.logger.addHandler(journal_log_handler)
+
     # prepare the state, call the generator (if not already called) with the
     # command line arguments as keyword arguments
     if callable(notifications):
         notifications = notifications(**vars(args))
 
     notify_client = NotificationsAPIClient(args.notify_api_key)
+    stats = None
+    dry_run = args.dry_run or args.simulate_latency is not None
+
+    if args.simulate_latency is not None:
+        # everything that waits has to run at the same speed for the
+        # projected times to be right, including backoff between retries
+        simulated_time = ScaledClock(args.simulate_speedup)
+        send_email_notification = RateLimitedSender(
+            SimulatedNotify(args.simulate_latency, sleep=simulated_time.sleep),
+            rate=args.rate_limit,
+            burst=args.rate_limit_burst,
+            max_tries=args.max_retries + 1,
+            clock=simulated_time.clock,
+            sleep=simulated_time.sleep,
+        )
+        stats = send_email_notification.stats
 
-    if args.dry_run:
+    elif args.dry_run:
 
         def send_email_notification(
             notification: EmailNotification,
@@ -205,7 +278,7 @@ def email_engine(
 
     else:
 
-        def send_email_notification(
+        def notify_send_email_notification(
             notification: EmailNotification,
         ) -> NotificationResponse:
             return notify_client.send_email_notification(
@@ -213,12 +286,47 @@ def email_engine(
                 reference=f"{reference}-{notification.sha256_hash}",
             )
 
+        send_email_notification = RateLimitedSender(
+            notify_send_email_notification,
+            rate=args.rate_limit,
+            burst=args.rate_limit_burst,
+            max_tries=args.max_retries + 1,
+        )
+        stats = send_email_notification.stats
+
+    if not args.bulk:
+        bulk_backend = None
+    elif dry_run:
+        bulk_backend = LoopingBulkBackend(send_email_notification)
+    else:
+        bulk_backend = RateLimitedBulkBackend(
+            bulk_backend or NotifyBulkBackend(notify_client, reference), send_email_notification
+        )
+
     try:
         # do the thing
         done = run(
-            send_email_notification, notifications=notifications, logfile=logfile
+            send_email_notification,
+            notifications=notifications,
+            logfile=logfile,
+            journal=journal,
+            concurrency=args.concurrency,
+            bulk_backend=bulk_backend,
+            batch_size=args.batch_size,
+            pipeline=args.pipeline,
+            max_queued=args.max_queued,
         )
     except KeyboardInterrupt:
         logger.critical("email engine interrupted by user")
+    finally:
+        journal_logger.logger.removeHandler(journal_log_handler)
+        journal_log_handler.close()
 
     logger.info(f"sent {len(done)} email notifications with reference {reference}")
+    if stats:
+        logger.info(stats.summary())
+    if args.simulate_latency is not None:
+        logger.info(
+            f"[SIMULATION] with latency profile {args.simulate_latency!r} and concurrency {args.concurrency},"
+            f" sending {len(done)} email notifications would take about {stats.elapsed:.0f}s"
+        )
@@ -0,0 +1,117 @@
+"""Sending notifications to Notify in batches
+
+For mailings where lots of recipients get the same template, making one HTTP
+request per notification is a lot of overhead. In bulk mode `run()` takes
+notifications from the front of the queue in batches, groups them by template
+ID, and hands each group to a bulk backend to send in one go.
+
+A bulk backend is any object with a `send_batch(template_id, notifications)`
+method that returns a `NotificationResponse` for each notification, in the same
+order. `NotifyBulkBackend` sends batches as jobs using Notify's bulk sending
+API; `LoopingBulkBackend` sends each notification in the batch separately
+with an ordinary `send_email_notification` callable, which is useful for dry
+runs, and tests can use any other object with the same method.
+`RateLimitedBulkBackend` wraps another backend so that its requests go through
+the same rate limit and retries as single notifications (see
+email_engine.ratelimit).
+
+Each notification in a batch is logged as sent individually, with its own
+response, so resuming a run works the same as when sending one at a time. If
+sending a batch fails, none of the notifications in it are logged as sent, and
+they will all be sent again when the run is resumed.
+"""
+
+from typing import Callable, List
+
+from notifications_python_client.notifications import NotificationsAPIClient
+
+from .ratelimit import RateLimitedSender
+from .typing import EmailNotification, NotificationResponse
+
+
+__all__ = ["DEFAULT_BATCH_SIZE", "BulkBackend", "LoopingBulkBackend", "NotifyBulkBackend", "RateLimitedBulkBackend"]
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class BulkBackend:
+    """Interface for bulk backends"""
+
+    def send_batch(self, template_id: str, notifications: List[EmailNotification]) -> List[NotificationResponse]:
+        raise NotImplementedError
+
+
+class LoopingBulkBackend(BulkBackend):
+    """Send each notification in a batch with `send_email_notification`"""
+
+    def __init__(self, send_email_notification: Callable[[EmailNotification], NotificationResponse]) -> None:
+        self.send_email_notification = send_email_notification
+
+    def send_batch(self, template_id: str, notifications: List[EmailNotification]) -> List[NotificationResponse]:
+        return [self.send_email_notification(notification) for notification in notifications]
+
+
+class NotifyBulkBackend(BulkBackend):
+    """Send batches of notifications as jobs with Notify's bulk sending API
+
+    Notify's bulk API takes the recipients as rows of a CSV-style table, with
+    a header row of "email address" followed by the personalisation fields. It
+    doesn't support setting a reference for each notification, so the
+    reference we would have used (`{reference}-{sha256_hash}`) is included as
+    an extra "reference" column, and the job is named after `reference`.
+
+    Every notification in a batch must have the same personalisation fields;
+    if one is missing a field `ValueError` is raised and nothing is sent.
+
+    The response for each notification in the batch has the job ID and the
+    row number of the notification in the job.
+    """
+
+    def __init__(self, notify_client: NotificationsAPIClient, reference: str) -> None:
+        self.notify_client = notify_client
+        self.reference = reference
+
+    def send_batch(self, template_id: str, notifications: List[EmailNotification]) -> List[NotificationResponse]:
+        personalisation_keys = sorted(
+            {key for notification in notifications for key in (notification["personalisation"] or {})}
+        )
+        rows = [["email address", *personalisation_keys, "reference"]]
+        for notification in notifications:
+            personalisation = notification["personalisation"] or {}
+            missing_keys = [key for key in personalisation_keys if key not in personalisation]
+            if missing_keys:
+                raise ValueError(
+                    f"notification {notification.sha256_hash} is missing personalisation {', '.join(missing_keys)}"
+                    f" needed by other notifications in the batch for template {template_id}"
+                )
+            rows.append([
+                notification["email_address"],
+                *(personalisation[key] for key in personalisation_keys),
+                f"{self.reference}-{notification.sha256_hash}",
+            ])
+
+        job = self.notify_client.post(
+            "/v2/notifications/bulk",
+            data={
+                "name": self.reference,
+                "template_id": template_id,
+                "rows": rows,
+            },
+        )
+        job_id = job["data"]["id"]
+
+        return [
+            NotificationResponse(job_id=job_id, row_number=row_number)
+            for row_number in range(len(notifications))
+        ]
+
+
+class RateLimitedBulkBackend(BulkBackend):
+    """Send batches with `backend`, using the rate limit and retries of `sender`"""
+
+    def __init__(self, backend: BulkBackend, sender: RateLimitedSender) -> None:
+        self.backend = backend
+        self.sender = sender
+
+    def send_batch(self, template_id: str, notifications: List[EmailNotification]) -> List[NotificationResponse]:
+        return self.sender.send_batch(self.backend.send_batch, template_id, notifications)
@@ -19,11 +19,15 @@ Running this module will show the default command line arguments::
     python dmscripts/email_engine/cli.py
 """
 from pathlib import Path
+from typing import List
 import argparse
 import hashlib
 import os
 import sys
 
+from .bulk import DEFAULT_BATCH_SIZE
+from .simulate import latency_profile
+
 
 __all__ = ["argument_parser_factory"]
 
@@ -74,6 +78,81 @@ def argument_parser_factory(
     p.add_argument(
         "-n", "--dry-run", action="store_true", help="Do not send notifications."
     )
+    p.add_argument(
+        "--simulate-latency",
+        type=latency_profile,
+        metavar="PROFILE",
+        help=(
+            "Do not send notifications, instead pretend Notify takes a random time to respond"
+            " and report how long sending would have taken. Implies --dry-run."
+            " PROFILE is a distribution and parameters in seconds, for example 'lognormal:0.2,0.5;errors=0.01'"
+            " (see email_engine.simulate for details)."
+        ),
+    )
+    p.add_argument(
+        "--simulate-speedup",
+        type=_positive_float,
+        default=1,
+        help="Run the --simulate-latency simulation this many times faster than real time (default: 1).",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=1,
+        help="Number of notifications to send to Notify at the same time (default: 1).",
+    )
+    p.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "Start sending notifications while the script is still working out who to send them to,"
+            " rather than waiting until it has finished."
+        ),
+    )
+    p.add_argument(
+        "--max-queued",
+        type=_positive_int,
+        default=1000,
+        help="Maximum number of notifications waiting to be sent when using --pipeline (default: 1000).",
+    )
+    p.add_argument(
+        "--bulk",
+        action="store_true",
+        help=(
+            "Send notifications in batches using Notify's bulk sending API,"
+            " rather than making a request for each notification."
+        ),
+    )
+    p.add_argument(
+        "--batch-size",
+        type=_positive_int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Maximum number of notifications in each batch when using --bulk (default: {DEFAULT_BATCH_SIZE}).",
+    )
+    p.add_argument(
+        "--rate-limit",
+        type=_positive_float,
+        default=50,
+        help=(
+            "Maximum number of requests per second to make to Notify (default: 50)."
+            " Notify's rate limit is 3,000 requests per minute."
+        ),
+    )
+    p.add_argument(
+        "--rate-limit-burst",
+        type=_positive_int,
+        default=10,
+        help="Maximum number of requests to make to Notify in a single burst (default: 10).",
+    )
+    p.add_argument(
+        "--max-retries",
+        type=_non_negative_int,
+        default=5,
+        help=(
+            "Number of times to retry sending a notification if Notify is rate limiting us"
+            " or has a server error (default: 5)."
+        ),
+    )
     p.add_argument(
         "-v",
         "--verbose",
@@ -113,7 +192,8 @@ def argument_parser_factory(
         type=append_hash_of_argv if not has_custom_reference() else None,  # Only append hash if no reference specified
         help=(
             "Identifer to reference all the emails sent by this script (sent to Notify)."
-            " Defaults to the name of the script, plus a hash of the arguments."
+            " Defaults to the name of the script, plus a hash of the arguments"
+            " (not counting options such as --concurrency that only change how notifications are sent)."
         ),
     )
 
@@ -136,16 +216,65 @@ def argument_parser_factory(
     return p
 
 
+# Options that change how notifications are sent but not which ones, mapped to
+# whether they take a value. They are left out of the default reference so
+# that a run can be resumed with different settings.
+_TUNING_OPTIONS = {
+    "--concurrency": True,
+    "--pipeline": False,
+    "--max-queued": True,
+    "--bulk": False,
+    "--batch-size": True,
+    "--rate-limit": True,
+    "--rate-limit-burst": True,
+    "--max-retries": True,
+}
+
+
 def append_hash_of_argv(reference: str) -> str:
     # Add a hash of the command line arguments to the reference so running the
     # same script with different arguments results in a different reference.
-    args = [reference] + sorted(sys.argv[1:])
+    args = [reference] + sorted(_without_tuning_options(sys.argv[1:]))
     arghash = hashlib.blake2b(
         " ".join(args).encode(), digest_size=4
     ).hexdigest()
     return f"{reference}-{arghash}"
 
 
+def _without_tuning_options(argv: List[str]) -> List[str]:
+    args = []
+    skip_value = False
+    for arg in argv:
+        if skip_value:
+            skip_value = False
+        elif arg.split("=", 1)[0] in _TUNING_OPTIONS:
+            skip_value = "=" not in arg and _TUNING_OPTIONS[arg]
+        else:
+            args.append(arg)
+    return args
+
+
+def _positive_int(s: str) -> int:
+    i = int(s)
+    if i < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer, got {s}")
+    return i
+
+
+def _non_negative_int(s: str) -> int:
+    i = int(s)
+    if i < 0:
+        raise argparse.ArgumentTypeError(f"must be a non-negative integer, got {s}")
+    return i
+
+
+def _positive_float(s: str) -> float:
+    f = float(s)
+    if f <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number, got {s}")
+    return f
+
+
 # copied from https://stackoverflow.com/a/10551190
 class EnvDefault(argparse.Action):
     def __init__(self, envvar, required=True, default=None, **kwargs):
@@ -0,0 +1,57 @@
+"""Structured journal of LoggingQueue state updates
+
+The logfile is great for humans, but reading it back in to resume a run means
+parsing Python literals out of log lines, which is slow for big runs and can be
+tripped up by unusual personalisation.
+
+So as well as the logfile, every state update is written to a journal file as
+a line of JSON (one record per line). Each record has an "op" key:
+
+    {"op": "queued", "hash": "<sha256_hash>", "notification": {...}}
+    {"op": "sent", "hash": "<sha256_hash>", "response": {...}}
+    {"op": "exhausted", "count": <count>}
+
+"sent" records only refer to the notification by its hash, so the journal
+effectively contains a compact index of which notifications have been sent,
+and each record can be decoded with a single call to `json.loads()`.
+
+By default the journal lives next to the logfile, with ".jsonl" appended to the
+filename. If there is no journal for a run (for instance because the run was
+started before journals existed) then `run()` will resume from the logfile
+instead, and write what it read to a new journal so that later resumes can use
+it.
+"""
+
+from pathlib import Path
+from typing import Iterator
+import json
+import logging
+
+
+__all__ = ["journal_path", "journal_handler", "encode_record", "read_journal"]
+
+
+def journal_path(logfile: Path) -> Path:
+    """Path of the journal that goes with `logfile`"""
+    return logfile.with_name(logfile.name + ".jsonl")
+
+
+def journal_handler(path: Path) -> logging.Handler:
+    """Create a log handler that writes journal records to `path`"""
+    handler = logging.FileHandler(path, delay=True)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def encode_record(op: str, **fields) -> str:
+    # responses from Notify should always be JSON-serialisable, but just in
+    # case we fall back to the string representation
+    return json.dumps({"op": op, **fields}, separators=(",", ":"), default=str)
+
+
+def read_journal(path: Path) -> Iterator[dict]:
+    """Read records from the journal at `path`, skipping blank lines"""
+    with path.open() as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -13,6 +13,11 @@ alongside the state updates; this will aid debugging issues in future.
 
 We also create `logger` attached to the usual dmscripts logger for logging to
 stderr for messages that are not state updates.
+
+Finally there is `journal_logger`, which gets a machine-readable copy of every
+state update (see email_engine.journal). It does not propagate to the root
+logger, so journal records only end up in the journal file and not in the
+human-readable logfile.
 """
 
 import logging
@@ -38,3 +43,8 @@ logger = logging.getLogger("script.email_engine")
 state_logger = StateLogger(logging.getLogger("email_engine_audit_logger"))
 
 state_logger.setLevel(STATE)
+
+journal_logger = StateLogger(logging.getLogger("email_engine_journal"))
+
+journal_logger.setLevel(STATE)
+journal_logger.logger.propagate = False
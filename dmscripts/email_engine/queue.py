@@ -16,32 +16,52 @@ Design notes
 This code is designed specifically for the email_engine use case, so it is less
 generic than it perhaps could be.
 
-Currently this module doesn't do error handling or recovery, or allow for any
-concurrency. Whether or not this module should handle those things is an open
-question.
+Currently this module doesn't do error handling or recovery. Whether or not
+this module should handle that is an open question.
+
+Sending can be done concurrently: `run()` takes a `concurrency` argument and
+if it is greater than one it will start that many worker threads which each
+call `LoggingQueue.send_next()` until the queue is empty. Each sent
+notification is logged as soon as its response comes back, so the order of
+"send" lines in the log may not match the order of "queued" lines; this is fine
+because when reading the log back we only care about which notifications were
+sent, not in what order.
 
 At the moment there is also an implicit state machine whose logic is shared
 between LoggingQueue and run(). LoggingQueue could probably be tweaked to make
 it clearer that, for instance, you shouldn't put notifications in the queue
-after resuming from a logfile, but rather than spending a lot of time thinking
+after resuming from a logfile (unless the original generator was interrupted,
+and then only ones the logfile doesn't have), but rather than spending a lot of time thinking
 about the best API design I just decided to encapsulate it in the run()
 function.  With some more thought perhaps the LoggingQueue could be made to
 enforce the state logic itself.
 """
 
-from collections import deque
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import (
+    BinaryIO,
     Callable,
+    Collection,
     Dict,
-    Deque,
     Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
     Tuple,
 )
+import locale
+import os
 import sys
+import threading
+import time
 
+from .bulk import DEFAULT_BATCH_SIZE, BulkBackend
+from .journal import encode_record, read_journal
 from .typing import EmailNotification, NotificationResponse
-from .logger import logger, state_logger
+from .logger import journal_logger, logger, state_logger
 
 
 def run(
@@ -49,6 +69,12 @@ def run(
     *,
     notifications: Iterable[EmailNotification],
     logfile: Path,
+    journal: Optional[Path] = None,
+    concurrency: int = 1,
+    bulk_backend: Optional[BulkBackend] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    pipeline: bool = False,
+    max_queued: int = 1000,
 ) -> Dict[EmailNotification, NotificationResponse]:
     """Send notifications using `send_email_notification`
 
@@ -62,10 +88,40 @@ def run(
     If `logfile` contains logging messages from a previous call, then
     `notifications` will be discarded without being iterated. This should mean
     that this function is idempotent.
+
+    If `journal` is given and contains records from a previous call, state is
+    restored from the journal rather than from `logfile`. If the state had to
+    be restored from `logfile` then it is written to the journal; `journal`
+    should be attached to a file handler on `journal_logger`.
+
+    If `concurrency` is greater than one then that many threads will call
+    `send_email_notification` at the same time, so it must be thread-safe.
+
+    If `bulk_backend` is given then notifications are sent in batches of up to
+    `batch_size` using `bulk_backend.send_batch()` instead of
+    `send_email_notification` (see email_engine.bulk).
+
+    If `pipeline` is true then, rather than reading all the notifications
+    before sending any of them, `notifications` is iterated in a background
+    thread while notifications are sent. At most `max_queued` notifications
+    will be waiting to be sent at any one time. If sending fails, we wait for
+    the generator to be exhausted (without sending any more) before raising the
+    error. If the generator fails, or the run is interrupted by the user, the
+    log will not record that the generator was exhausted but may record that
+    some notifications were sent. Resuming such a run iterates `notifications`
+    again, skipping any that were already queued, so notifications that were
+    sent are not sent again.
     """
+    start = time.monotonic()
     queue = LoggingQueue()
+    producer = None
 
-    resuming, exhausted = queue.put_from_logfile(logfile)
+    if journal and journal.exists() and journal.stat().st_size:
+        resuming, exhausted = queue.put_from_journal(journal)
+    else:
+        resuming, exhausted = queue.put_from_logfile(logfile)
+        if resuming and journal:
+            queue.write_journal(exhausted=exhausted)
 
     # If you are doing a a re-run and the iterator of notifications in the
     # original run was exhausted, then we don't iterate again.
@@ -79,7 +135,31 @@ def run(
     #
     # The downside is how do you handle the scenario where the original
     # generator wasn't exhausted... for now we just crash.
-    if resuming and not queue.todo:
+    #
+    # With `pipeline` notifications can be sent before the generator is
+    # exhausted, so we need to check for that even if there is nothing left
+    # in the queue. We can't crash then, as deleting the log to start again
+    # would resend everything that was sent, so we iterate the generator
+    # again and only queue the notifications the log doesn't have.
+    get_notifications = False
+    already_queued: Set[EmailNotification] = set()
+
+    if resuming and not exhausted and not queue.done:
+        # not sure what to do in this situation, maybe in future we can add a flag to proceed anyway
+        raise RuntimeError(
+            "in the logs for the original run the notifications generator was not exhausted, refusing to proceed"
+        )
+
+    elif resuming and not exhausted:
+        logger.info(
+            "in the logs for the original run the notifications generator was not exhausted,"
+            f" but {len(queue.done)} notifications were sent; getting notifications from API again"
+            " and only sending the rest"
+        )
+        already_queued = {*queue.todo, *queue.done}
+        get_notifications = True
+
+    elif resuming and not queue.todo:
         logger.info("nothing left to do! exiting")
         sys.exit(0)
 
@@ -88,54 +168,172 @@ def run(
         logger.info("resuming from log file")
         del notifications
 
-    elif queue.todo and not exhausted:
-        # not sure what to do in this situation, maybe in future we can add a flag to proceed anyway
-        raise RuntimeError(
-            "in the logs for the original run the notifications generator was not exhausted, refusing to proceed"
-        )
-
     elif not resuming:
         state_logger.info("OFFICIAL SENSITIVE - do not distribute - this file contains email addresses and other PII")
         logger.info("getting notifications to send from API")
-        queue.put_from(notifications)
+        get_notifications = True
 
     else:
         # this should never be reached
         assert True, "non-exhaustive if-else statement"
 
+    if get_notifications:
+        producer = _get_notifications(
+            queue, notifications, pipeline=pipeline, max_queued=max_queued, already_queued=already_queued
+        )
+
+    if bulk_backend:
+        def send_next() -> bool:
+            return queue.send_next_batch(bulk_backend.send_batch, batch_size)
+    else:
+        def send_next() -> bool:
+            return queue.send_next(send_email_notification)
+
     # main loop
-    # this could probably be asynchronous
     try:
-        while queue.todo:
-            queue.send_next(send_email_notification)
+        if concurrency > 1:
+            _send_concurrently(queue, send_next, concurrency=concurrency)
+        else:
+            while send_next():
+                pass
+        if producer:
+            # raises if the generator failed
+            producer.result()
     except Exception as e:
+        if producer and not producer.done():
+            # let the generator finish so the run can be resumed
+            logger.info("waiting for notifications generator to be exhausted")
+            queue.stop()
+            producer.exception()
         # we want to log how many are left to send
         logger.warning(
             f"sending emails was stopped by {e.__class__.__name__} with {len(queue.todo)} notifications left to send"
         )
         raise
+    finally:
+        # make sure the producer doesn't carry on if we were interrupted
+        queue.abort()
+
+    if queue.first_sent_at is not None:
+        logger.info(
+            f"first notification was sent after {queue.first_sent_at - start:.1f}s,"
+            f" all notifications were sent after {time.monotonic() - start:.1f}s"
+        )
 
     return queue.done
 
 
+def _send_concurrently(queue: "LoggingQueue", send_next: Callable[[], bool], *, concurrency: int) -> None:
+    """Call `send_next()` from `concurrency` worker threads until the queue is empty
+
+    If any worker raises an exception the queue is stopped so the other
+    workers finish, and once their in-flight notifications have been sent (and
+    logged) the exception is re-raised.
+    """
+    def worker() -> None:
+        try:
+            while send_next():
+                pass
+        except BaseException:
+            queue.stop()
+            raise
+
+    logger.info(f"sending notifications with {concurrency} workers")
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="email_engine") as executor:
+        futures = [executor.submit(worker) for _ in range(concurrency)]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        finally:
+            queue.stop()
+
+
+def _get_notifications(
+    queue: "LoggingQueue",
+    notifications: Iterable[EmailNotification],
+    *,
+    pipeline: bool,
+    max_queued: int,
+    already_queued: Collection[EmailNotification],
+) -> "Optional[Future[int]]":
+    """Put notifications into the queue, in the background if `pipeline` is true
+
+    :returns: the future for the background thread if `pipeline` is true
+    """
+    if not pipeline:
+        queue.put_from(notifications, already_queued=already_queued)
+        return None
+
+    queue.maxsize = max_queued
+    # senders must wait for the producer even if they get to the queue before
+    # the producer thread has started
+    with queue._changed:
+        queue.producing = True
+    return _start_producer(queue, notifications, already_queued=already_queued)
+
+
+def _start_producer(
+    queue: "LoggingQueue",
+    notifications: Iterable[EmailNotification],
+    *,
+    already_queued: Collection[EmailNotification] = (),
+) -> "Future[int]":
+    """Put notifications from the iterable into the queue in a background thread"""
+    def producer() -> int:
+        try:
+            return queue.put_from(notifications, already_queued=already_queued)
+        except BaseException:
+            # don't carry on sending if we don't know we have all the notifications
+            queue.abort()
+            raise
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="email_engine_producer")
+    future = executor.submit(producer)
+    executor.shutdown(wait=False)
+    return future
+
+
+def _read_lines(fp: BinaryIO, size: int) -> Iterator[str]:
+    """Lazily read lines from `fp`, stopping after `size` bytes
+
+    A line that hadn't been finished after `size` bytes (because it was still
+    being written) is dropped rather than cut short, as it could end part way
+    through a multibyte character.
+    """
+    encoding = locale.getpreferredencoding(False)
+    for line in fp:
+        if len(line) > size or not line.endswith(b"\n"):
+            break
+        size -= len(line)
+        yield line.decode(encoding).rstrip("\r\n")
+
+
 class LoggingQueue:
     """Queue that streams state to logs and can be recreated from logs
 
     Thread-safety
     -------------
 
-    Sending is (probably) currently thread-safe because of the design of
-    `send_next()` (but it has not been proven to be so). Because we need to log
-    when the notification has been sent (and we want to log the API response),
-    rather than letting users get a notification from the queue and then
-    requiring them to give us the response, we just ask them to give us the
-    callable they would use anyway. This does means that the interface for
+    Sending is thread-safe because of the design of `send_next()`. Because we
+    need to log when the notification has been sent (and we want to log the API
+    response), rather than letting users get a notification from the queue and
+    then requiring them to give us the response, we just ask them to give us
+    the callable they would use anyway. This does means that the interface for
     LoggingQueue is a bit more `concurrent.futures.Executor` than
     `queue.Queue`, but it makes things simpler in the end.
 
-    Putting is currently not thread-safe, because the de-duplication can cause
-    a race condition. This could be fixed with a lock, or (better) by
-    using different primitives, or (best) maybe by not allowing putting at all.
+    The queue state is guarded by a lock, which is held while popping a
+    notification and while recording its response, but not while the
+    notification is being sent. Notifications that are being sent are tracked
+    in `sending` so that the de-duplication in `put()` still works while
+    sending is in progress.
+
+    Notifications can be put into the queue while it is being sent from (see
+    `run()` with `pipeline=True`). While `put_from()` is running, senders wait
+    for more notifications instead of stopping when the queue is empty, and if
+    `maxsize` is set `put()` waits for space in the queue. `stop()` tells
+    senders to stop, and lets `put()` carry on without waiting for space;
+    `abort()` also makes `put()` raise an error.
     """
 
     send_msg = "queue update: send notification {notification} response {response}"
@@ -144,68 +342,262 @@ class LoggingQueue:
         "queue update: generator is exhausted, read {count} notifications into queue"
     )
 
-    def __init__(self) -> None:
-        self.todo: Deque[EmailNotification] = deque()
+    def __init__(self, maxsize: int = 0) -> None:
+        # `todo` is an ordered set of notifications (the values are always
+        # None), so we get FIFO order and O(1) membership tests and removal
+        self.todo: Dict[EmailNotification, None] = OrderedDict()
         self.done: Dict[EmailNotification, NotificationResponse] = {}
+        self.sending: Set[EmailNotification] = set()
+        self.maxsize = maxsize
+        self.producing = False
+        self.stopped = False
+        self.aborted = False
+        self.first_sent_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
 
     def __contains__(self, notification: EmailNotification) -> bool:
-        """Return true if `notification` has been queued or sent"""
-        return notification in self.todo or notification in self.done
+        """Return true if `notification` has been queued, is being sent, or has been sent"""
+        return notification in self.todo or notification in self.sending or notification in self.done
 
-    def put(self, notification: EmailNotification, *, log=True) -> None:
+    def put(self, notification: EmailNotification, *, log=True) -> bool:
         """Put `notification` into the queue
 
         Logs `repr(notification)` when it is added to the queue if `log` is
         true. If `notification` has already been queued or sent, does nothing.
+
+        :returns: true if `notification` was added to the queue
         """
 
-        # TODO: make this thread-safe
-        if notification in self:
-            logger.warning(f"ignoring duplicate notification {notification}")
-            return
+        with self._changed:
+            if notification in self:
+                logger.warning(f"ignoring duplicate notification {notification}")
+                return False
 
-        self.todo.append(notification)
+            while self.maxsize and len(self.todo) >= self.maxsize and not self.stopped:
+                self._changed.wait()
+            if self.aborted:
+                raise RuntimeError("queue has been aborted")
 
-        if log:
-            state_logger.state(self.put_msg.format(notification=notification))
+            self.todo[notification] = None
+            self._changed.notify_all()
+
+            if log:
+                journal_logger.state(
+                    encode_record("queued", hash=notification.sha256_hash, notification=notification)
+                )
+                state_logger.state(self.put_msg.format(notification=notification))
+
+            return True
 
     def send_next(
         self,
         send_email_notification: Callable[[EmailNotification], NotificationResponse],
-    ) -> None:
+    ) -> bool:
         """Send the next notification in the queue
 
         Calls `send_email_notification()` with the next notification in the
         queue and logs the result of the call.
+
+        :returns: false if the queue was empty (or stopped), true otherwise
         """
+        with self._changed:
+            if not self._wait_for_todo():
+                return False
+            notification, _ = self.todo.popitem(last=False)
+            logger.debug(f"popping notification {notification} to send it")
+            assert notification not in self, "duplicate notification in queue"
+            self.sending.add(notification)
+
+        try:
+            response = send_email_notification(notification)
+        except BaseException:
+            with self._lock:
+                self.sending.discard(notification)
+            raise
+
+        with self._lock:
+            self._record_sent(notification, response)
+
+        return True
+
+    def send_next_batch(
+        self,
+        send_batch: Callable[[str, List[EmailNotification]], List[NotificationResponse]],
+        size: int,
+    ) -> bool:
+        """Send up to `size` notifications from the front of the queue
 
-        # TODO: this should be thread-safe, test that it is
-        notification = self.todo.popleft()
-        logger.debug(f"popping notification {notification} to send it")
-        assert notification not in self, "duplicate notification in queue"
+        The notifications are grouped by template ID and `send_batch()` is
+        called once for each template with the notifications that use it; it
+        should return a response for each notification, in the same order.
+        Each notification is logged as sent separately.
 
-        response = send_email_notification(notification)
+        :returns: false if the queue was empty (or stopped), true otherwise
+        """
+        with self._changed:
+            if not self._wait_for_todo():
+                return False
+            batch = [self.todo.popitem(last=False)[0] for _ in range(min(size, len(self.todo)))]
+            logger.debug(f"popping {len(batch)} notifications to send them")
+            self.sending.update(batch)
+
+        batches_by_template: Dict[str, List[EmailNotification]] = {}
+        for notification in batch:
+            batches_by_template.setdefault(notification["template_id"], []).append(notification)
+
+        try:
+            for template_id, notifications in batches_by_template.items():
+                responses = send_batch(template_id, notifications)
+                if len(responses) != len(notifications):
+                    raise RuntimeError(
+                        f"expected {len(notifications)} responses for batch but got {len(responses)}"
+                    )
 
+                with self._lock:
+                    for notification, response in zip(notifications, responses):
+                        self._record_sent(notification, response)
+        finally:
+            # anything still marked as sending didn't get sent
+            with self._lock:
+                self.sending.difference_update(batch)
+
+        return True
+
+    def stop(self) -> None:
+        """Stop sending notifications"""
+        with self._changed:
+            self.stopped = True
+            self._changed.notify_all()
+
+    def abort(self) -> None:
+        """Stop sending and putting notifications"""
+        with self._changed:
+            self.stopped = True
+            self.aborted = True
+            self._changed.notify_all()
+
+    def _wait_for_todo(self) -> bool:
+        # must be called with the lock held; waits until there is something
+        # to send, returns false if there never will be
+        while not self.todo and self.producing and not self.stopped:
+            self._changed.wait()
+        if self.stopped or not self.todo:
+            return False
+        # there will be space in the queue once the caller pops
+        self._changed.notify_all()
+        return True
+
+    def _record_sent(self, notification: EmailNotification, response: NotificationResponse) -> None:
+        # must be called with the lock held
+        if self.first_sent_at is None:
+            self.first_sent_at = time.monotonic()
+        journal_logger.state(encode_record("sent", hash=notification.sha256_hash, response=response))
         state_logger.state(self.send_msg.format(notification=notification, response=response))
-
+        self.sending.discard(notification)
         self.done[notification] = response
 
-    def put_from(self, notifications: Iterable[EmailNotification]) -> int:
+    def put_from(
+        self,
+        notifications: Iterable[EmailNotification],
+        *,
+        already_queued: Collection[EmailNotification] = (),
+    ) -> int:
         """Put notifications from the iterable into the queue
 
+        Duplicate notifications are not counted. Notifications in
+        `already_queued` (queued by the run being resumed) are skipped without
+        a warning, and are included in the count logged once the iterable is
+        exhausted so that it matches the number of notifications in the log.
+
         :returns: the number of notifications added to the queue
         """
         count = 0
-        for notification in notifications:
-            # TODO: this is a hack to allow a plain dict
-            # it can be removed with a postional only arg
-            # in EmailNotification.__init__
-            # when on Python 3.8
-            self.put(EmailNotification(**notification))
-            count += 1
-        state_logger.state(self.put_from_msg.format(generator=notifications, count=count))
+        with self._lock:
+            self.producing = True
+        try:
+            for notification in notifications:
+                # TODO: this is a hack to allow a plain dict
+                # it can be removed with a postional only arg
+                # in EmailNotification.__init__
+                # when on Python 3.8
+                notification = EmailNotification(**notification)
+                if notification in already_queued:
+                    continue
+                if self.put(notification):
+                    count += 1
+            journal_logger.state(encode_record("exhausted", count=len(already_queued) + count))
+            state_logger.state(
+                self.put_from_msg.format(generator=notifications, count=len(already_queued) + count)
+            )
+        finally:
+            with self._changed:
+                self.producing = False
+                self._changed.notify_all()
         return count
 
+    def put_from_journal(self, f: Path) -> Tuple[int, bool]:
+        """Reload queue from journal file `f`
+
+        This is the equivalent of `put_from_logfile()` for journals written by
+        `journal_logger`, and has the same return values.
+        """
+        logger.info(f"logging queue reading from journal {f}")
+
+        todo: Dict[str, EmailNotification] = {}
+        done: Dict[EmailNotification, NotificationResponse] = {}
+        count = 0
+        exhausted = False
+
+        for record in read_journal(f):
+            op = record["op"]
+            if op == "queued":
+                todo[record["hash"]] = EmailNotification(**record["notification"])
+                count += 1
+            elif op == "sent":
+                try:
+                    notification = todo.pop(record["hash"])
+                except KeyError:
+                    raise RuntimeError(
+                        f"journal is invalid, notification {record['hash']} was sent before it was queued"
+                    )
+                done[notification] = NotificationResponse(record["response"])
+            elif op == "exhausted":
+                exhausted = True
+                if record["count"] != count:
+                    raise RuntimeError(
+                        "journal is invalid, number of notifications queued does not match number originally queued"
+                    )
+            else:
+                raise RuntimeError(f"unable to parse journal record {record}")
+
+        with self._lock:
+            self.todo.update(dict.fromkeys(todo.values()))
+            self.done.update(done)
+
+        logger.info(
+            f"queue has {len(self.todo)} notifications outstanding and {len(self.done)} already sent"
+        )
+
+        return count, exhausted
+
+    def write_journal(self, *, exhausted: bool) -> None:
+        """Write the current state of the queue to the journal
+
+        This is used to create a journal for a run that was resumed from a
+        logfile without one.
+        """
+        logger.info("writing queue state to journal")
+        with self._lock:
+            for notification in (*self.done, *self.todo):
+                journal_logger.state(
+                    encode_record("queued", hash=notification.sha256_hash, notification=notification)
+                )
+            if exhausted:
+                journal_logger.state(encode_record("exhausted", count=len(self.done) + len(self.todo)))
+            for notification, response in self.done.items():
+                journal_logger.state(encode_record("sent", hash=notification.sha256_hash, response=response))
+
     def put_from_logfile(self, f: Path) -> Tuple[int, bool]:
         """Reload queue from log file `f`
 
@@ -224,12 +616,16 @@ class LoggingQueue:
         :returns: the number of notifications added to the queue and whether
                   the previous had completed all `put_from()` calls successfully
         """
-        # we read the whole file into memory at once to avoid reading our own tail
-        loglines = f.read_text().splitlines()
-        if not loglines:
-            return 0, False
-        logger.info(f"logging queue reading from logfile {f}")
-        return self._read_log(loglines)
+        # The logfile is also where our own log messages go, so to avoid
+        # reading our own tail we only read up to the size the file was when
+        # we opened it. Lines are read one at a time so we don't have to hold
+        # the whole (possibly very large) file in memory.
+        with f.open("rb") as fp:
+            size = os.fstat(fp.fileno()).st_size
+            if not size:
+                return 0, False
+            logger.info(f"logging queue reading from logfile {f}")
+            return self._read_log(_read_lines(fp, size))
 
     def _read_log(self, logstream: Iterable[str]) -> Tuple[int, bool]:
         count = 0
@@ -268,7 +664,7 @@ class LoggingQueue:
                         f"log is invalid, notification {notification} was sent before it was queued"
                     )
 
-                self.todo.remove(notification)
+                del self.todo[notification]
                 self.done[notification] = response
             elif update.startswith("generator is exhausted"):
                 exhausted = True
@@ -278,8 +674,11 @@ class LoggingQueue:
                         update.find("notifications")
                     ]
                 )
-                assert original_count == len(self.todo) + 2 * len(
-                    self.done
+                # when pipelining, notifications may have been sent before the
+                # generator was exhausted, so compare with all the notifications
+                # queued so far
+                assert (
+                    original_count == count
                 ), "number of log lines parsed does not match number of notifications originally queued"
             else:
                 raise RuntimeError(f"unable to parse log line {logline}")
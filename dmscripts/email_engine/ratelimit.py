@@ -0,0 +1,283 @@
+"""Rate limiting and retries for sending notifications with Notify
+
+Notify limits the number of requests a service can make (at the time of
+writing, 3,000 messages per minute) and will respond with 429 Too Many Requests
+if we go over. It can also occasionally respond with a server error. Neither of
+these mean there is anything wrong with the notification, so rather than
+stopping the whole run we want to slow down and try again.
+
+`RateLimitedSender` wraps the `send_email_notification` callable that
+`email_engine()` passes to `run()`. Every attempt to send a notification takes
+a token from a `TokenBucket`, so however many workers are sending no more than
+`rate` requests are made per second on average (with bursts of up to `burst`
+requests). If Notify responds with a 429 or 5xx status the request is retried
+with jittered exponential backoff, and each retry is logged at STATE level so
+it ends up in the logfile. Any other error is raised straight away.
+
+`RateLimitedSender.send_batch()` does the same for a request that sends a
+batch of notifications (see email_engine.bulk).
+
+`RateLimitedSender.stats` counts requests, retries and response times, so that
+a summary can be logged at the end of a run.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Iterator, List, Optional, TypeVar
+import threading
+import time
+
+import backoff
+from notifications_python_client.errors import APIError
+
+from .typing import EmailNotification, NotificationResponse
+from .logger import state_logger
+
+
+__all__ = ["RateLimitedSender", "SendStats", "TokenBucket", "retry_with_backoff"]
+
+T = TypeVar("T")
+
+
+def is_retryable(e: Exception) -> bool:
+    """Return true if the error from Notify means we should try again later"""
+    return isinstance(e, APIError) and (e.status_code == 429 or e.status_code >= 500)
+
+
+def retry_with_backoff(
+    func: Callable[..., T],
+    *,
+    max_tries: int,
+    backoff_factor: float = 1.0,
+    backoff_max: float = 60.0,
+    on_backoff: Optional[Callable[[dict], None]] = None,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Callable[..., T]:
+    """Wrap `func` so that retryable errors from Notify are retried
+
+    Waits between attempts use jittered exponential backoff, like
+    `backoff.on_exception`, but go through `sleep` so that they can be
+    simulated or faked. `on_backoff` is called before each wait with a dict
+    containing the `args`, `tries`, `wait` and `exception`.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs) -> T:
+        waits = backoff.expo(factor=backoff_factor, max_value=backoff_max)
+        next(waits)  # backoff's wait generators yield None first to prime them
+        tries = 0
+        while True:
+            tries += 1
+            try:
+                return func(*args, **kwargs)
+            except APIError as e:
+                if not is_retryable(e) or tries >= max_tries:
+                    raise
+                wait = backoff.full_jitter(next(waits))
+                if on_backoff:
+                    on_backoff({"args": args, "kwargs": kwargs, "tries": tries, "wait": wait, "exception": e})
+                sleep(wait)
+
+    return wrapper
+
+
+class TokenBucket:
+    """Thread-safe token bucket
+
+    Tokens are added to the bucket at `rate` tokens per second, up to a
+    maximum of `burst` tokens. `acquire()` takes a token from the bucket,
+    waiting until there is one if the bucket is empty. Waiting threads are
+    served in the order they called `acquire()`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+
+        self.rate = rate
+        self.capacity = max(burst, 1)
+
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)
+        self._updated = clock()
+
+    def acquire(self) -> float:
+        """Take a token from the bucket
+
+        If the bucket is empty the token is reserved (so the bucket goes into
+        debt) and we wait until it would have been added.
+
+        :returns: the number of seconds spent waiting for a token
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.rate)
+
+        if wait:
+            self._sleep(wait)
+        return wait
+
+
+class SendStats:
+    """Thread-safe counters for requests made to Notify"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latencies: List[float] = []
+
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    @contextmanager
+    def timing(self) -> Iterator[None]:
+        """Record a request that is made inside the context"""
+        with self._lock:
+            start = self._clock()
+            if self._started is None:
+                self._started = start
+            self.in_flight += 1
+            self.max_in_flight = max(self.in_flight, self.max_in_flight)
+
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            with self._lock:
+                end = self._clock()
+                self._finished = end
+                self.in_flight -= 1
+                self.requests += 1
+                self.latencies.append(end - start)
+                if not ok:
+                    self.errors += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def elapsed(self) -> float:
+        if self._started is None or self._finished is None:
+            return 0.0
+        return self._finished - self._started
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second"""
+        if not self.elapsed:
+            return 0.0
+        return (self.requests - self.errors) / self.elapsed
+
+    def percentile(self, p: float) -> float:
+        """Response time in seconds at percentile `p` (0-100)"""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+    def summary(self) -> str:
+        return (
+            f"made {self.requests} requests to Notify in {self.elapsed:.1f}s"
+            f" ({self.throughput:.1f}/s) with {self.errors} errors and {self.retries} retries;"
+            f" response time p50 {self.percentile(50):.3f}s p95 {self.percentile(95):.3f}s;"
+            f" max {self.max_in_flight} requests in flight"
+        )
+
+
+class RateLimitedSender:
+    """Wrap `send_email_notification` with rate limiting and retries
+
+    :param send_email_notification: callable that sends a notification
+    :param rate: maximum average number of requests per second, if None there
+        is no rate limit
+    :param burst: maximum number of requests that can be made at once
+    :param max_tries: maximum number of attempts at sending a notification
+        before giving up and raising the last error
+    :param backoff_factor: multiplier (in seconds) for the exponential backoff
+    :param backoff_max: maximum time (in seconds) to wait between retries
+    :param clock: clock used for the rate limit and stats
+    :param sleep: function used to wait for the rate limit and between retries
+    """
+
+    def __init__(
+        self,
+        send_email_notification: Callable[[EmailNotification], NotificationResponse],
+        *,
+        rate: Optional[float] = None,
+        burst: int = 1,
+        max_tries: int = 6,
+        backoff_factor: float = 1.0,
+        backoff_max: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._send_email_notification = send_email_notification
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep) if rate else None
+        self.max_tries = max_tries
+        self.stats = SendStats(clock)
+
+        self._send_with_retries = retry_with_backoff(
+            self._send,
+            max_tries=max_tries,
+            backoff_factor=backoff_factor,
+            backoff_max=backoff_max,
+            on_backoff=self._on_backoff,
+            sleep=sleep,
+        )
+
+    def __call__(self, notification: EmailNotification) -> NotificationResponse:
+        return self._send_with_retries(self._send_email_notification, notification)
+
+    def send_batch(
+        self,
+        send_batch: Callable[[str, List[EmailNotification]], List[NotificationResponse]],
+        template_id: str,
+        notifications: List[EmailNotification],
+    ) -> List[NotificationResponse]:
+        """Send a batch of notifications with `send_batch`, with the same rate limit and retries
+
+        A batch is a single request to Notify, so it takes one token from the bucket.
+        """
+        return self._send_with_retries(send_batch, template_id, notifications)
+
+    def _send(self, send: Callable[..., T], *args) -> T:
+        if self.bucket:
+            self.bucket.acquire()
+
+        with self.stats.timing():
+            return send(*args)
+
+    def _on_backoff(self, details: dict) -> None:
+        self.stats.record_retry()
+
+        _, *args = details["args"]
+        if len(args) == 1:
+            description = f"notification {args[0].sha256_hash}"
+        else:
+            template_id, notifications = args
+            description = f"batch of {len(notifications)} notifications with template {template_id}"
+        state_logger.state(
+            f"rate limiter: retrying {description}"
+            f" after {details['exception'].status_code} response from Notify"
+            f" (attempt {details['tries']} of {self.max_tries}, waiting {details['wait']:.2f}s)"
+        )
@@ -0,0 +1,181 @@
+"""Simulate sending notifications to Notify
+
+A dry run doesn't tell us how long a real run would take, because nothing is
+sent. With `--simulate-latency=<profile>` email_engine swaps Notify for a fake
+that waits for a random amount of time before responding (and occasionally
+responds with an error), so we can see how long a large mailing is likely to
+take with a given `--concurrency`, `--rate-limit` and so on without sending any
+emails.
+
+A latency profile is a distribution name followed by a colon and its
+parameters (in seconds), optionally followed by error rates::
+
+    fixed:0.2
+    uniform:0.1,0.5
+    lognormal:0.2,0.5          (median and sigma)
+    exponential:0.2            (mean)
+    lognormal:0.2,0.5;errors=0.01;rate-limited=0.02
+
+`errors` is the fraction of requests that fail with a 500 Internal Server Error
+and `rate-limited` the fraction that fail with 429 Too Many Requests; both are
+retried by the rate limiter in the same way as real errors would be.
+
+Simulating a big mailing in real time would take as long as the mailing, so
+`--simulate-speedup=<n>` makes everything (simulated response times, the rate
+limiter and backoff between retries) happen `n` times faster, and the report at
+the end of the run is scaled back up to project how long the real run would
+take.
+"""
+
+from typing import Callable, Optional
+import argparse
+import math
+import random
+import time
+
+from notifications_python_client.errors import HTTPError
+import requests
+
+from .typing import EmailNotification, NotificationResponse
+
+
+__all__ = ["LatencyProfile", "SimulatedNotify", "ScaledClock"]
+
+
+class LatencyProfile:
+    """Distribution of response times and error rates for simulated requests"""
+
+    DISTRIBUTIONS = {
+        "fixed": 1,
+        "uniform": 2,
+        "lognormal": 2,
+        "exponential": 1,
+    }
+
+    def __init__(
+        self,
+        distribution: str,
+        *params: float,
+        error_rate: float = 0.0,
+        rate_limited_rate: float = 0.0,
+    ) -> None:
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(
+                f"unknown latency distribution {distribution!r},"
+                f" expected one of {', '.join(self.DISTRIBUTIONS)}"
+            )
+        if len(params) != self.DISTRIBUTIONS[distribution]:
+            raise ValueError(
+                f"{distribution} latency distribution takes {self.DISTRIBUTIONS[distribution]} parameters,"
+                f" got {len(params)}"
+            )
+        if any(p < 0 for p in params):
+            raise ValueError("latency parameters must not be negative")
+        if not 0 <= error_rate + rate_limited_rate <= 1:
+            raise ValueError("error rates must be between 0 and 1")
+
+        self.distribution = distribution
+        self.params = params
+        self.error_rate = error_rate
+        self.rate_limited_rate = rate_limited_rate
+
+    @classmethod
+    def parse(cls, s: str) -> "LatencyProfile":
+        """Parse a latency profile from the command line, see module docstring for the format"""
+        spec, *options = s.split(";")
+        distribution, _, params = spec.partition(":")
+
+        error_rates = {}
+        for option in options:
+            key, _, value = option.partition("=")
+            if key not in ("errors", "rate-limited"):
+                raise ValueError(f"unknown latency profile option {key!r}")
+            error_rates[key] = float(value)
+
+        return cls(
+            distribution.strip(),
+            *(float(p) for p in params.split(",") if p.strip()),
+            error_rate=error_rates.get("errors", 0.0),
+            rate_limited_rate=error_rates.get("rate-limited", 0.0),
+        )
+
+    def latency(self, rng: random.Random) -> float:
+        if self.distribution == "fixed":
+            return self.params[0]
+        elif self.distribution == "uniform":
+            return rng.uniform(*self.params)
+        elif self.distribution == "lognormal":
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(median), sigma) if median else 0.0
+        else:
+            mean, = self.params
+            return rng.expovariate(1 / mean) if mean else 0.0
+
+    def status_code(self, rng: random.Random) -> Optional[int]:
+        """Status code of an error response, or None if the request should succeed"""
+        r = rng.random()
+        if r < self.error_rate:
+            return 500
+        if r < self.error_rate + self.rate_limited_rate:
+            return 429
+        return None
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.distribution}:{','.join(str(p) for p in self.params)}"
+            f";errors={self.error_rate};rate-limited={self.rate_limited_rate}"
+        )
+
+
+def latency_profile(s: str) -> LatencyProfile:
+    """Argument type for --simulate-latency"""
+    try:
+        return LatencyProfile.parse(s)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+class ScaledClock:
+    """Clock and sleep function that run `speedup` times faster than real time
+
+    `clock()` returns times in simulated seconds, and `sleep()` takes a
+    duration in simulated seconds.
+    """
+
+    def __init__(self, speedup: float = 1.0) -> None:
+        self.speedup = speedup
+
+    def clock(self) -> float:
+        return time.monotonic() * self.speedup
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds / self.speedup)
+
+
+class SimulatedNotify:
+    """Fake `send_email_notification` that responds according to a latency profile"""
+
+    def __init__(
+        self,
+        profile: LatencyProfile,
+        *,
+        sleep: Callable[[float], None] = time.sleep,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.profile = profile
+        self._sleep = sleep
+        self._rng = random.Random(seed)
+
+    def __call__(self, notification: EmailNotification) -> NotificationResponse:
+        # random.Random is thread-safe, so workers can share it
+        latency = self.profile.latency(self._rng)
+        status_code = self.profile.status_code(self._rng)
+
+        self._sleep(latency)
+
+        if status_code:
+            response = requests.Response()
+            response.status_code = status_code
+            raise HTTPError(response)
+
+        return NotificationResponse(id=f"simulated-{notification.sha256_hash[:16]}")
@@ -0,0 +1,302 @@
+"""Find out what happened to the notifications sent in an email_engine run
+
+Every notification sent by email_engine is given the reference
+`{reference}-{sha256_hash}`, and the response from Notify (including the
+notification ID) is recorded in the run's journal. This module reads the
+journal and asks Notify for the status of each sent notification, then writes a
+summary of how many notifications have each status for each template.
+
+Usage::
+
+    python -m dmscripts.email_engine status --reference=<reference> [--logfile=<logfile>]
+
+Statuses are fetched by notification ID using several threads at once. If a
+response doesn't have a notification ID then the notification is looked up by
+its reference instead, using Notify's paginated notifications search.
+
+Notifications sent with --bulk only have the ID of the Notify job and their row
+in it. Notify's public API can't look up a job's notifications, so these are
+reported with the status "bulk-unsupported" rather than being looked up.
+
+Requests to Notify are rate limited the same way as when sending (see the
+`ratelimit` module in this package), and requests that get a 429 or server
+error response are retried with backoff. If Notify still can't tell us the
+status of a notification, it is reported with the status "error" instead of
+stopping the command.
+
+Once a notification has reached a final status (delivered or one of the
+failures) it won't change, so final statuses are cached in a file next to the
+journal (the journal path with ".status.json" appended), and running the status
+command again will only ask Notify about notifications that were still in
+progress. The cache only contains notification hashes, template IDs and
+statuses, not email addresses.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import argparse
+import csv
+import json
+import logging
+import sys
+import time
+
+from notifications_python_client.notifications import NotificationsAPIClient
+
+from dmscripts.helpers.logging_helpers import configure_logger
+
+from .cli import EnvDefault, _non_negative_int, _positive_float, _positive_int
+from .journal import journal_path, read_journal
+from .logger import logger
+from .ratelimit import TokenBucket, retry_with_backoff
+from .typing import NotificationResponse
+
+
+__all__ = ["fetch_statuses", "main", "sent_notifications", "StatusCache", "summarise"]
+
+
+FINAL_STATUSES = {"delivered", "permanent-failure", "temporary-failure", "technical-failure"}
+
+# status for notifications sent as part of a bulk job, which we can't look up
+BULK_UNSUPPORTED = "bulk-unsupported"
+
+# status for notifications we couldn't get a status for from Notify
+ERROR = "error"
+
+
+def sent_notifications(journal: Path) -> Iterator[Tuple[str, str, NotificationResponse]]:
+    """Read sent notifications from the journal
+
+    :returns: iterator of the hash, template ID and response for each
+              notification that was sent
+    """
+    template_ids: Dict[str, str] = {}
+    for record in read_journal(journal):
+        if record["op"] == "queued":
+            template_ids[record["hash"]] = record["notification"]["template_id"]
+        elif record["op"] == "sent":
+            yield record["hash"], template_ids[record["hash"]], NotificationResponse(record["response"])
+
+
+class StatusCache:
+    """Final statuses of notifications keyed by notification hash"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.statuses: Dict[str, Dict[str, str]] = {}
+        if path.exists():
+            self.statuses = json.loads(path.read_text())
+
+    def __contains__(self, notification_hash: str) -> bool:
+        return notification_hash in self.statuses
+
+    def __getitem__(self, notification_hash: str) -> str:
+        return self.statuses[notification_hash]["status"]
+
+    def add(self, notification_hash: str, template_id: str, status: str) -> None:
+        if status in FINAL_STATUSES:
+            self.statuses[notification_hash] = {"template_id": template_id, "status": status}
+
+    def save(self) -> None:
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.statuses))
+        tmp.replace(self.path)
+
+
+def _fetch_status(
+    notify_client: NotificationsAPIClient, reference: str, notification_hash: str, response: NotificationResponse
+) -> str:
+    if response.get("id"):
+        return notify_client.get_notification_by_id(response["id"])["status"]
+
+    if response.get("job_id"):
+        return BULK_UNSUPPORTED
+
+    for notification in notify_client.get_all_notifications_iterator(
+        reference=f"{reference}-{notification_hash}"
+    ):
+        return notification["status"]
+
+    return "not-found"
+
+
+def fetch_statuses(
+    notify_client: NotificationsAPIClient,
+    sent: List[Tuple[str, str, NotificationResponse]],
+    *,
+    reference: str,
+    cache: StatusCache,
+    concurrency: int = 10,
+    rate: Optional[float] = 50,
+    burst: int = 10,
+    max_tries: int = 6,
+    backoff_factor: float = 1.0,
+    backoff_max: float = 60.0,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, str]:
+    """Get the status of every sent notification
+
+    Statuses in `cache` are used without asking Notify, and any final statuses
+    fetched are added to `cache`.
+
+    No more than `rate` requests are made to Notify per second (with bursts of
+    up to `burst` requests), and requests that Notify responds to with a 429 or
+    server error are tried up to `max_tries` times. Notifications whose status
+    can't be fetched get the status "error".
+
+    :returns: dict of notification hash to status
+    """
+    statuses = {notification_hash: cache[notification_hash] for notification_hash, _, _ in sent
+                if notification_hash in cache}
+    to_fetch = [item for item in sent if item[0] not in statuses]
+
+    logger.info(f"{len(statuses)} statuses cached, fetching {len(to_fetch)} statuses from Notify")
+
+    bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep) if rate else None
+
+    def on_backoff(details: dict) -> None:
+        logger.info(
+            f"retrying status of notification {details['args'][0][0]}"
+            f" after {details['exception'].status_code} response from Notify"
+            f" (attempt {details['tries']} of {max_tries}, waiting {details['wait']:.2f}s)"
+        )
+
+    def fetch_once(item: Tuple[str, str, NotificationResponse]) -> str:
+        notification_hash, _, response = item
+        if bucket:
+            bucket.acquire()
+        return _fetch_status(notify_client, reference, notification_hash, response)
+
+    fetch_with_retries = retry_with_backoff(
+        fetch_once,
+        max_tries=max_tries,
+        backoff_factor=backoff_factor,
+        backoff_max=backoff_max,
+        on_backoff=on_backoff,
+        sleep=sleep,
+    )
+
+    def fetch(item: Tuple[str, str, NotificationResponse]) -> str:
+        try:
+            return fetch_with_retries(item)
+        except Exception as e:
+            logger.warning(f"could not get status of notification {item[0]}: {e.__class__.__name__} {e}")
+            return ERROR
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for (notification_hash, template_id, _), status in zip(to_fetch, executor.map(fetch, to_fetch)):
+            statuses[notification_hash] = status
+            cache.add(notification_hash, template_id, status)
+
+    return statuses
+
+
+def summarise(
+    sent: List[Tuple[str, str, NotificationResponse]], statuses: Dict[str, str]
+) -> "Counter[Tuple[str, str]]":
+    """Count notifications by template ID and status"""
+    return Counter((template_id, statuses[notification_hash]) for notification_hash, template_id, _ in sent)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m dmscripts.email_engine",
+        description="Tools for runs of scripts that send emails with email_engine.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    status_parser = subparsers.add_parser(
+        "status",
+        help="Summarise the delivery status of notifications sent in a run.",
+    )
+    status_parser.add_argument(
+        "--reference",
+        required=True,
+        help="Reference of the run (printed at the end of the run).",
+    )
+    status_parser.add_argument(
+        "--logfile",
+        type=Path,
+        help="Logfile of the run, defaults to /tmp/<reference>.log.",
+    )
+    status_parser.add_argument(
+        "--notify-api-key",
+        action=EnvDefault,
+        envvar="DM_NOTIFY_API_KEY",
+        help="Can also be set with environment variable DM_NOTIFY_API_KEY.",
+    )
+    status_parser.add_argument(
+        "--concurrency",
+        type=_positive_int,
+        default=10,
+        help="Number of requests to make to Notify at the same time (default: 10).",
+    )
+    status_parser.add_argument(
+        "--rate-limit",
+        type=_positive_float,
+        default=50,
+        help="Maximum number of requests per second to make to Notify (default: 50).",
+    )
+    status_parser.add_argument(
+        "--rate-limit-burst",
+        type=_positive_int,
+        default=10,
+        help="Maximum number of requests to make to Notify in a single burst (default: 10).",
+    )
+    status_parser.add_argument(
+        "--max-retries",
+        type=_non_negative_int,
+        default=5,
+        help=(
+            "Number of times to retry getting a status if Notify is rate limiting us"
+            " or has a server error (default: 5)."
+        ),
+    )
+    status_parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Print more detail about what the command is doing.",
+    )
+
+    args = parser.parse_args(argv)
+
+    loglevel = logging.INFO if args.verbose else logging.WARN
+    configure_logger({"dmapiclient": loglevel})
+
+    logfile = args.logfile or Path(f"/tmp/{args.reference}.log")
+    journal = journal_path(logfile)
+    if not journal.exists():
+        parser.error(f"could not find journal for run at {journal}")
+
+    sent = list(sent_notifications(journal))
+    cache = StatusCache(journal.with_name(journal.name + ".status.json"))
+    try:
+        statuses = fetch_statuses(
+            NotificationsAPIClient(args.notify_api_key),
+            sent,
+            reference=args.reference,
+            cache=cache,
+            concurrency=args.concurrency,
+            rate=args.rate_limit,
+            burst=args.rate_limit_burst,
+            max_tries=args.max_retries + 1,
+        )
+    finally:
+        cache.save()
+
+    summary = summarise(sent, statuses)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["template_id", "status", "count"])
+    for (template_id, status), count in sorted(summary.items()):
+        writer.writerow([template_id, status, count])
+
+    totals = Counter(statuses.values())
+    logger.info(
+        f"{len(sent)} notifications sent with reference {args.reference}: "
+        + ", ".join(f"{count} {status}" for status, count in sorted(totals.items()))
+    )
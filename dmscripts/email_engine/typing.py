@@ -8,12 +8,28 @@ reading it back into memory in a human readable fashion.
 """
 
 from ast import literal_eval
-from typing import Callable, Dict, Generator, Union
+from typing import Callable, Dict, Generator, Optional, Union
 
 from dmutils.email.helpers import hash_string
 
 
-class EmailNotification(dict):
+class FrozenDict(dict):
+    """A dict that can't be changed after it is created
+
+    The string representation is the same as a dict's, so it can be written to
+    and read from logs and journals in the same way.
+    """
+
+    __slots__ = ()
+
+    def _frozen(self, *args, **kwargs):
+        raise RuntimeError(f"{self.__class__.__name__} instances are frozen")
+
+    __setitem__ = __delitem__ = __ior__ = _frozen
+    clear = pop = popitem = setdefault = update = _frozen
+
+
+class EmailNotification(FrozenDict):
     """A typed, hashable, serder-able, frozen dict subclass
 
     This class packages the arguments to to
@@ -25,8 +41,18 @@ class EmailNotification(dict):
         - compare two notifications to remove duplicates
         - allow using notifications as keys to a dictionary
         - write and read a human-readable string representation
+
+    Because instances are frozen (and the personalisation is copied into a
+    FrozenDict, so it can't be changed afterwards either), the string
+    representation is worked out once when the notification is created and the
+    hashes derived from it are memoised, as they are needed many times for each
+    notification. The representation uses the personalisation as it was given,
+    so a mapping such as an OrderedDict gives the same representation (and the
+    same reference) as it always has.
     """
 
+    __slots__ = ("_repr", "_hash", "_sha256_hash")
+
     def __init__(
         self,
         *,
@@ -34,29 +60,29 @@ class EmailNotification(dict):
         template_id: str,
         personalisation: Dict[str, str] = None
     ):
-        super().__init__(
+        # The order of keys is important for the representation (and so the
+        # hashes), so make it explicit
+        self._repr = repr(dict(
             email_address=email_address,
             template_id=template_id,
             personalisation=personalisation,
+        ))
+        super().__init__(
+            email_address=email_address,
+            template_id=template_id,
+            personalisation=None if personalisation is None else FrozenDict(personalisation),
         )
+        self._hash = hash(self._repr)
+        self._sha256_hash: Optional[str] = None
 
-    def __setitem__(self, key: str, value: str) -> None:
-        raise RuntimeError("EmailNotification instances are frozen")
+    def __repr__(self) -> str:
+        return self._repr
 
     def __hash__(self) -> int:  # type: ignore[override]  # noqa: F821
         # dicts are usually unhashable, but we want to use EmailNotifications
-        # as the key to another dict, so we cheat and find the hash of the
-        # string representation. The order of keys is going to be important for
-        # this, so we make it explicit
-        return (
-            dict(
-                email_address=self["email_address"],
-                template_id=self["template_id"],
-                personalisation=self["personalisation"],
-            )
-            .__repr__()
-            .__hash__()
-        )
+        # as the key to another dict, so we cheat and use the hash of the
+        # string representation
+        return self._hash
 
     @classmethod
     def from_str(cls, s: str) -> "EmailNotification":
@@ -67,18 +93,9 @@ class EmailNotification(dict):
     def sha256_hash(self) -> str:
         # Calculate the SHA256 hash of the string representation. This is reproducible and allows us to generate a
         # unique reference for an email that can be stored in our logs and checked to see an email's status
-        # The order of keys is important for the hash, so make it explicit
-        return (
-            hash_string(
-                str(
-                    dict(
-                        email_address=self["email_address"],
-                        template_id=self["template_id"],
-                        personalisation=self["personalisation"],
-                    )
-                )
-            )
-        )
+        if self._sha256_hash is None:
+            self._sha256_hash = hash_string(self._repr)
+        return self._sha256_hash
 
 
 class NotificationResponse(dict):
@@ -7,6 +7,7 @@ from typing import Any, List, Mapping
 from dmutils.formats import DATE_FORMAT, DATETIME_FORMAT
 from dmutils.s3 import S3
 
+from dmscripts.helpers.pagination_helpers import prefetch_iter
 from dmscripts.helpers.s3_helpers import get_bucket_name
 
 # This URL is framework agnostic
@@ -95,8 +96,8 @@ def get_latest_dos_framework(client) -> str:
 
 def get_brief_data(client, logger, include_buyer_user_details: bool = False) -> list:
     logger.info("Fetching closed briefs from API")
-    briefs = client.find_briefs_iter(status="closed,awarded,unsuccessful,cancelled", with_users=True,
-                                     with_clarification_questions=True)
+    briefs = prefetch_iter(client, 'find_briefs', status="closed,awarded,unsuccessful,cancelled", with_users=True,
+                           with_clarification_questions=True)
     rows = []
     for brief in briefs:
         logger.info(f"Fetching brief responses for Brief ID {brief['id']}")
@@ -1,7 +1,7 @@
 from itertools import chain
 
 from dmscripts.helpers.csv_helpers import write_csv
-from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_service_counts
+from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_service_counts_in_bulk
 from dmscripts.helpers.supplier_data_helpers import country_code_to_name
 
 
@@ -163,9 +163,7 @@ def _create_row(
     return row
 
 
-def export_supplier_details(
-    data_api_client, framework_slug, filename, framework_lot_slugs, map_impl=map, logger=None
-):
-    records = find_suppliers_with_details_and_draft_service_counts(data_api_client, framework_slug, map_impl=map_impl)
+def export_supplier_details(data_api_client, framework_slug, filename, framework_lot_slugs, logger=None):
+    records = find_suppliers_with_details_and_draft_service_counts_in_bulk(data_api_client, framework_slug)
     headers, rows_iter = get_csv_rows(records, framework_slug, framework_lot_slugs, logger=logger)
     write_csv(headers, rows_iter, filename)
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """Class used to output a csv of how framework applications looked after the deadline."""
-from collections import OrderedDict
+from collections import Counter, OrderedDict
 
 from dmscripts.helpers.csv_helpers import GenerateCSVFromAPI
 
@@ -15,14 +15,16 @@ class GenerateFrameworkApplicationsCSV(GenerateCSVFromAPI):
         ("failed", "completed")
     ])
 
-    def __init__(self, client, target_framework_slug):
+    def __init__(self, client, target_framework_slug, draft_services=None):
         """Set up CSV builder with a client, framework and lot details and a placeholder for output.
 
         :param client: Instance of dmapiclient.data.DataAPIClient
         :param target_framework_slug: A framework slug ie 'digital-outcomes-and-specialists-2' or 'g-cloud-8'
+        :param draft_services: DraftServiceAggregate for the framework, to save finding each supplier's draft services
         """
         super(GenerateFrameworkApplicationsCSV, self).__init__(client)
         self.target_framework_slug = target_framework_slug
+        self.draft_services = draft_services
         self.framework = self.client.get_framework(target_framework_slug)['frameworks']
         self.lot_slugs = tuple(i['slug'] for i in self.framework['lots'])
         self.excluded_supplier_ids = []
@@ -57,8 +59,13 @@ class GenerateFrameworkApplicationsCSV(GenerateCSVFromAPI):
         self._update_with_supplier_data(self.output)
 
     def get_supplier_service_data(self, supplier_id):
-        """Given a supplier ID return a list of dictionaries for services related to framework."""
-        return self.client.find_draft_services_iter(supplier_id, framework=self.target_framework_slug)
+        """Given a supplier ID return a counter of (lot slug, status) for their draft services on the framework."""
+        if self.draft_services is not None:
+            return self.draft_services.for_supplier(supplier_id).counts
+        return Counter(
+            (service['lotSlug'], service['status'])
+            for service in self.client.find_draft_services_iter(supplier_id, framework=self.target_framework_slug)
+        )
 
     def get_supplier_frameworks(self):
         """Return supplier frameworks."""
@@ -92,9 +99,9 @@ class GenerateFrameworkApplicationsCSV(GenerateCSVFromAPI):
             lot_placeholders = [0 for i in self._get_dynamic_field_names()]
             supplier_dict = dict(zip(field_names, supplier_info + lot_placeholders))
             # Get service data and process dynamic lot values
-            service_data = self.get_supplier_service_data(supplier_id)
-            for service in service_data:
-                # Calculate the status of each service an what lot it is in then +1 to the corresponding column.
-                column_name = self.get_column_name(service['status'], service['lotSlug'])
-                supplier_dict[column_name] += 1
+            service_counts = self.get_supplier_service_data(supplier_id)
+            for (lot_slug, status), count in service_counts.items():
+                # Add the number of services with each status in each lot to the corresponding column.
+                column_name = self.get_column_name(status, lot_slug)
+                supplier_dict[column_name] += count
             output.append(supplier_dict)
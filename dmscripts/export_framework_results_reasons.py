@@ -8,7 +8,7 @@ import os
 from dmutils.env_helpers import get_web_url_from_stage
 
 from dmscripts.helpers.csv_helpers import MultiCSVWriter
-from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_service_counts
+from dmscripts.helpers.framework_helpers import CONCURRENCY, find_suppliers_with_details_and_draft_service_counts
 
 
 DRAFT_STATUSES = [
@@ -76,13 +76,13 @@ def find_suppliers_with_details(client,
                                 declaration_definite_pass_schema,
                                 declaration_discretionary_pass_schema,
                                 supplier_ids=None,
-                                map_impl=map,
+                                concurrency=CONCURRENCY,
                                 ):
     records = find_suppliers_with_details_and_draft_service_counts(
         client,
         framework_slug,
         supplier_ids,
-        map_impl=map_impl,
+        concurrency=concurrency,
     )
     records = list(map(add_failed_questions(questions_numbers,
                                             declaration_definite_pass_schema,
@@ -223,7 +223,7 @@ def export_suppliers(
     declaration_definite_pass_schema,
     declaration_discretionary_pass_schema=None,
     supplier_ids=None,
-    map_impl=map,
+    concurrency=CONCURRENCY,
 ):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -237,7 +237,7 @@ def export_suppliers(
         declaration_definite_pass_schema,
         declaration_discretionary_pass_schema,
         supplier_ids,
-        map_impl=map_impl,
+        concurrency=concurrency,
     )
 
     now = datetime.utcnow().strftime("%Y-%m-%d-%H-%M")
@@ -0,0 +1,228 @@
+"""Download everything about a framework from the API once, and run exporters against the local copy.
+
+`take_snapshot()` writes the framework, its supplier frameworks (with declarations), the suppliers that applied, their
+draft services, published services, framework agreements, and the supplier and user exports for the framework to a
+sqlite file. Each record is stored as compressed JSON, indexed by kind and supplier ID.
+
+`SnapshotDataAPIClient` reads a snapshot and has the same methods as DataAPIClient for reading those things, so the
+exporters that take a client (applicant details, results reasons, supplier and user CSVs, the DOS exports) can run
+against it without any network requests. Scripts get one from `data_api_client()` when `DM_API_SNAPSHOT` is set to the
+path of a snapshot. Methods the snapshot can't answer (including anything that writes) raise AttributeError.
+"""
+import json
+import os
+import sqlite3
+import zlib
+
+from dmapiclient import HTTPError
+import requests
+
+from dmscripts.helpers.logging_helpers import get_logger
+
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE records (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    supplier_id INTEGER,
+    data BLOB NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX records_supplier_id ON records (kind, supplier_id);
+"""
+
+
+def _pack(record):
+    return zlib.compress(json.dumps(record, separators=(',', ':')).encode())
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _exported(client, method_name, framework_slug, model_name, logger):
+    # the export endpoints return 400 Bad Request for frameworks that aren't open yet
+    try:
+        return getattr(client, method_name)(framework_slug)[model_name]
+    except HTTPError as e:
+        if e.status_code != 400:
+            raise
+        logger.warning(f"{method_name} is not available for framework '{framework_slug}'")
+        return []
+
+
+def take_snapshot(client, framework_slug, path, logger=None):
+    """Download a framework's data from the API into a snapshot file at `path`
+
+    The snapshot is written to a temporary file and moved into place when it's complete, so an interrupted crawl
+    never leaves a partial snapshot behind.
+    """
+    logger = logger or get_logger()
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        db.executescript(SCHEMA)
+
+        def save(kind, records, id_key='id', supplier_id_key='supplierId'):
+            rows = [
+                (kind, str(record[id_key] if id_key else i), record.get(supplier_id_key), _pack(record))
+                for i, record in enumerate(records)
+            ]
+            db.executemany("INSERT INTO records (kind, id, supplier_id, data) VALUES (?, ?, ?, ?)", rows)
+            logger.info(f"saved {len(rows)} {kind} records")
+            return rows
+
+        framework = client.get_framework(framework_slug)['frameworks']
+        save('framework', [framework], id_key='slug')
+
+        supplier_frameworks = list(client.find_framework_suppliers_iter(framework_slug, with_declarations=True))
+        save('supplier_framework', supplier_frameworks, id_key='supplierId')
+        supplier_ids = {supplier_framework['supplierId'] for supplier_framework in supplier_frameworks}
+
+        save('supplier', (supplier for supplier in client.find_suppliers_iter() if supplier['id'] in supplier_ids),
+             supplier_id_key='id')
+        save('draft_service', client.find_draft_services_by_framework_iter(framework_slug))
+        save('service', client.find_services_iter(framework=framework_slug))
+        save('agreement', (
+            client.get_framework_agreement(supplier_framework['agreementId'])['agreement']
+            for supplier_framework in supplier_frameworks
+            if supplier_framework.get('agreementId')
+        ))
+        save('supplier_export', _exported(client, 'export_suppliers', framework_slug, 'suppliers', logger),
+             id_key='supplier_id', supplier_id_key='supplier_id')
+        save('user_export', _exported(client, 'export_users', framework_slug, 'users', logger),
+             id_key=None, supplier_id_key='supplier_id')
+
+        db.execute("INSERT INTO meta (key, value) VALUES ('framework_slug', ?)", (framework_slug,))
+        db.commit()
+    finally:
+        db.close()
+
+    os.replace(tmp_path, path)
+    logger.info(f"saved snapshot of '{framework_slug}' to {path}")
+
+
+def _not_found(url):
+    response = requests.Response()
+    response.status_code = 404
+    response.url = url
+    return HTTPError(response, "Not found in snapshot")
+
+
+class SnapshotDataAPIClient(object):
+    """Reads a framework snapshot with the same methods (and responses) as DataAPIClient"""
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.framework_slug, = self._db.execute("SELECT value FROM meta WHERE key = 'framework_slug'").fetchone()
+
+    def _records(self, kind, supplier_id=None):
+        query, params = "SELECT data FROM records WHERE kind = ?", [kind]
+        if supplier_id is not None:
+            query, params = query + " AND supplier_id = ?", params + [int(supplier_id)]
+        return [_unpack(data) for data, in self._db.execute(query + " ORDER BY rowid", params)]
+
+    def _record(self, kind, id, url):
+        row = self._db.execute("SELECT data FROM records WHERE kind = ? AND id = ?", (kind, str(id))).fetchone()
+        if row is None:
+            raise _not_found(url)
+        return _unpack(row[0])
+
+    def _check_framework(self, framework_slug):
+        if framework_slug is not None and framework_slug != self.framework_slug:
+            raise ValueError(f"Snapshot {self.path} is of '{self.framework_slug}', not '{framework_slug}'")
+
+    # Frameworks
+
+    def get_framework(self, slug):
+        self._check_framework(slug)
+        return {'frameworks': self._record('framework', slug, f"/frameworks/{slug}")}
+
+    def get_interested_suppliers(self, framework_slug):
+        self._check_framework(framework_slug)
+        return {'interestedSuppliers': sorted(sf['supplierId'] for sf in self._records('supplier_framework'))}
+
+    def find_framework_suppliers_iter(self, framework_slug, agreement_returned=None, statuses=None,
+                                      with_declarations=True):
+        self._check_framework(framework_slug)
+        for supplier_framework in self._records('supplier_framework'):
+            if agreement_returned is not None:
+                if bool(supplier_framework.get('agreementReturned')) != bool(agreement_returned):
+                    continue
+            elif statuses is not None and supplier_framework.get('agreementStatus') not in statuses.split(','):
+                continue
+            if not with_declarations:
+                supplier_framework.pop('declaration', None)
+            yield supplier_framework
+
+    def find_framework_suppliers(self, framework_slug, agreement_returned=None, statuses=None, with_declarations=True):
+        return {'supplierFrameworks': list(self.find_framework_suppliers_iter(
+            framework_slug, agreement_returned=agreement_returned, statuses=statuses,
+            with_declarations=with_declarations,
+        ))}
+
+    def get_supplier_framework_info(self, supplier_id, framework_slug):
+        self._check_framework(framework_slug)
+        return {'frameworkInterest': self._record(
+            'supplier_framework', supplier_id, f"/suppliers/{supplier_id}/frameworks/{framework_slug}"
+        )}
+
+    def get_framework_agreement(self, framework_agreement_id):
+        return {'agreement': self._record('agreement', framework_agreement_id, f"/agreements/{framework_agreement_id}")}
+
+    # Suppliers
+
+    def get_supplier(self, supplier_id):
+        return {'suppliers': self._record('supplier', supplier_id, f"/suppliers/{supplier_id}")}
+
+    def find_suppliers_iter(self, framework=None):
+        # the snapshot only has the suppliers that applied to the framework
+        return iter(self._records('supplier'))
+
+    def export_suppliers(self, framework_slug):
+        self._check_framework(framework_slug)
+        return {'suppliers': self._records('supplier_export')}
+
+    def export_suppliers_iter(self, framework_slug):
+        return iter(self.export_suppliers(framework_slug)['suppliers'])
+
+    def export_users(self, framework_slug):
+        self._check_framework(framework_slug)
+        return {'users': self._records('user_export')}
+
+    def export_users_iter(self, framework_slug):
+        return iter(self.export_users(framework_slug)['users'])
+
+    # Draft services and services
+
+    def find_draft_services_by_framework_iter(self, framework_slug, status=None, supplier_id=None, lot=None):
+        self._check_framework(framework_slug)
+        return (
+            draft for draft in self._records('draft_service', supplier_id)
+            if (status is None or draft['status'] == status) and (lot is None or draft['lotSlug'] == lot)
+        )
+
+    def find_draft_services_iter(self, supplier_id, service_id=None, framework=None):
+        self._check_framework(framework)
+        return (
+            draft for draft in self._records('draft_service', supplier_id)
+            if service_id is None or draft.get('serviceId') == service_id
+        )
+
+    def find_draft_services(self, supplier_id, service_id=None, framework=None):
+        return {'services': list(self.find_draft_services_iter(supplier_id, service_id, framework))}
+
+    def find_services_iter(self, supplier_id=None, framework=None, status=None, lot=None):
+        self._check_framework(framework)
+        return (
+            service for service in self._records('service', supplier_id)
+            if (status is None or service['status'] == status) and (lot is None or service['lot'] == lot)
+        )
+
+    def find_services(self, supplier_id=None, framework=None, status=None, page=None, lot=None):
+        return {'services': list(self.find_services_iter(supplier_id, framework, status, lot)), 'links': {}}
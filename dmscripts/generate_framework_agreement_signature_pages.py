@@ -12,7 +12,9 @@ from PyPDF2 import PdfFileMerger
 from dmscripts.helpers.html_helpers import render_html
 from dmscripts.helpers.logging_helpers import get_logger
 from dmscripts.helpers.framework_helpers import (
+    CONCURRENCY,
     find_suppliers_with_details_and_draft_service_counts,
+    find_suppliers_with_details_and_draft_service_counts_in_bulk,
     framework_supports_e_signature
 )
 from dmscripts.export_framework_applicant_details import get_csv_rows
@@ -20,7 +22,7 @@ from dmscripts.export_framework_applicant_details import get_csv_rows
 logger = get_logger()
 
 
-def find_suppliers(client, framework, supplier_ids=None, map_impl=map, dry_run=False):
+def find_suppliers(client, framework, supplier_ids=None, concurrency=CONCURRENCY, dry_run=False):
     """Return supplier details for suppliers with framework interest
 
     :param client: data api client
@@ -31,12 +33,16 @@ def find_suppliers(client, framework, supplier_ids=None, map_impl=map, dry_run=F
     """
     # get supplier details (returns a lazy generator)
     logger.debug(f"fetching records for {len(supplier_ids) if supplier_ids else 'all'} suppliers")
-    records = find_suppliers_with_details_and_draft_service_counts(
-        client,
-        framework["slug"],
-        supplier_ids,
-        map_impl=map_impl,
-    )
+    if supplier_ids:
+        # for a handful of suppliers it's quicker to fetch each one than to list everything
+        records = find_suppliers_with_details_and_draft_service_counts(
+            client,
+            framework["slug"],
+            supplier_ids,
+            concurrency=concurrency,
+        )
+    else:
+        records = find_suppliers_with_details_and_draft_service_counts_in_bulk(client, framework["slug"])
     # we reuse code from another script to filter and flatten our supplier details
     _, rows = get_csv_rows(
         records,
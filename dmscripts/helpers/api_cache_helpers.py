@@ -0,0 +1,154 @@
+"""Cache responses from the Data API on disk, so scripts run one after another don't download the same things again.
+
+Lots of scripts for a framework (applicant details, results reasons, signature pages and so on) are run one after
+another and fetch the same suppliers, declarations and draft services. Caching is opt-in: set `DM_API_CACHE` to the
+path of a cache file and scripts that get their client from `data_api_client()` will keep GET responses in it.
+
+    DM_API_CACHE=/tmp/g-cloud-12.cache ./scripts/framework-applications/export-framework-applicant-details.py ...
+
+Responses are kept for `DM_API_CACHE_TTL` seconds (default one hour), and the least recently used responses are
+removed once the cache is bigger than `DM_API_CACHE_MAX_BYTES` (default 500MB). Any request that isn't a GET clears
+the cache, because it could change what the API returns.
+
+If `DM_API_SNAPSHOT` is set to the path of a framework snapshot (see `dmscripts.framework_snapshot`) scripts read
+from the snapshot instead, and don't use the API at all.
+"""
+import atexit
+import json
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from dmapiclient import DataAPIClient
+from dmutils.env_helpers import get_api_endpoint_from_stage
+
+from dmscripts.framework_snapshot import SnapshotDataAPIClient
+from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.logging_helpers import get_logger
+
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+
+
+class ResponseCache(object):
+    """Responses keyed by a string, kept in a sqlite database
+
+    Safe to use from several threads at once, and from several processes one after another.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+
+    def get(self, key):
+        """The cached value for `key`, or None if it isn't cached or has expired"""
+        now = self.clock()
+        with self._lock:
+            row = self._db.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now - self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        value = json.dumps(value, separators=(',', ':'))
+        now = self.clock()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total, = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY used_at").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+
+    def log_stats(self, logger=None):
+        (logger or get_logger()).info(
+            "API cache {path}: {hits} hits, {misses} misses, {evictions} evicted".format(
+                path=self.path, hits=self.hits, misses=self.misses, evictions=self.evictions,
+            )
+        )
+
+
+class CachingDataAPIClient(DataAPIClient):
+    """DataAPIClient that keeps GET responses in a ResponseCache"""
+
+    def __init__(self, base_url=None, auth_token=None, *, cache, **kwargs):
+        super().__init__(base_url, auth_token, **kwargs)
+        self.cache = cache
+
+    def _cache_key(self, url, params):
+        # the auth token isn't part of the key, so it isn't written to disk
+        key = json.dumps(["GET", self._base_url, url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _get(self, url, params=None, *, client_wait_for_response=True):
+        key = self._cache_key(url, params)
+        response = self.cache.get(key)
+        if response is None:
+            response = super()._get(url, params=params, client_wait_for_response=client_wait_for_response)
+            self.cache.set(key, response)
+        return response
+
+    def _request(self, method, url, data=None, params=None, *, client_wait_for_response=True):
+        if method != "GET":
+            self.cache.clear()
+        return super()._request(
+            method, url, data=data, params=params, client_wait_for_response=client_wait_for_response
+        )
+
+
+def data_api_client(stage, environ=os.environ):
+    """A DataAPIClient for `stage`, which caches responses if `DM_API_CACHE` is set
+
+    If `DM_API_SNAPSHOT` is set, returns a client that reads from that snapshot file instead.
+    """
+    if environ.get('DM_API_SNAPSHOT'):
+        return SnapshotDataAPIClient(environ['DM_API_SNAPSHOT'])
+
+    base_url = get_api_endpoint_from_stage(stage)
+    auth_token = get_auth_token('api', stage)
+
+    if not environ.get('DM_API_CACHE'):
+        return DataAPIClient(base_url, auth_token)
+
+    cache = ResponseCache(
+        environ['DM_API_CACHE'],
+        ttl=float(environ.get('DM_API_CACHE_TTL', DEFAULT_TTL)),
+        max_bytes=int(environ.get('DM_API_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+    )
+    atexit.register(cache.log_stats)
+    return CachingDataAPIClient(base_url, auth_token, cache=cache)
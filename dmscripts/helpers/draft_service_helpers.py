@@ -0,0 +1,101 @@
+"""Summarise each supplier's draft services on a framework from one pass over the framework's drafts.
+
+Lots of scripts need to know what each supplier has drafted on a framework - how many services in each lot with
+each status - and find each supplier's draft services separately to work it out, which is one request (or more) per
+supplier. `DraftServiceAggregate.from_api()` lists all of the framework's draft services once and keeps a small
+summary for each supplier, which those scripts can take instead.
+
+    draft_services = DraftServiceAggregate.from_api(client, 'g-cloud-12')
+    draft_services.for_supplier(123456).count(status='submitted', lot='cloud-hosting')
+"""
+from collections import Counter, defaultdict
+import logging
+
+
+logger = logging.getLogger("draft_service_helpers")
+
+
+class SupplierDraftServices(object):
+    """A summary of one supplier's draft services on a framework"""
+
+    __slots__ = ('counts', 'ids', 'copied_ids')
+
+    def __init__(self, drafts=()):
+        # a counter of (lotSlug, status) tuples
+        self.counts = Counter()
+        self.ids = []
+        # drafts that were copied from one of the supplier's services on a previous framework
+        self.copied_ids = []
+        for draft in drafts:
+            self.add(draft)
+
+    def add(self, draft):
+        self.counts[(draft['lotSlug'], draft['status'])] += 1
+        self.ids.append(draft['id'])
+        if draft.get('copiedFromServiceId'):
+            self.copied_ids.append(draft['id'])
+
+    def count(self, status=None, lot=None):
+        """The number of draft services, optionally only those with `status` and/or in `lot`"""
+        return sum(
+            n for (lot_slug, draft_status), n in self.counts.items()
+            if (status is None or draft_status == status) and (lot is None or lot_slug == lot)
+        )
+
+    def status_counts(self):
+        """A counter of statuses"""
+        counter = Counter()
+        for (lot_slug, status), n in self.counts.items():
+            counter[status] += n
+        return counter
+
+    def statuses_by_lot(self):
+        """Return {lot slug: set of statuses} for the lots the supplier has draft services in"""
+        statuses = defaultdict(set)
+        for lot_slug, status in self.counts:
+            statuses[lot_slug].add(status)
+        return dict(statuses)
+
+
+class DraftServiceAggregate(object):
+    """Summaries of a framework's draft services, for each supplier"""
+
+    def __init__(self, framework_slug):
+        self.framework_slug = framework_slug
+        self._suppliers = defaultdict(SupplierDraftServices)
+
+    @classmethod
+    def from_api(cls, client, framework_slug, supplier_ids=None):
+        """Summarise all the framework's draft services, or only those of `supplier_ids` if given"""
+        if supplier_ids is not None:
+            supplier_ids = set(supplier_ids)
+
+        aggregate = cls(framework_slug)
+        for draft in client.find_draft_services_by_framework_iter(framework_slug):
+            if supplier_ids is None or draft['supplierId'] in supplier_ids:
+                aggregate.add(draft)
+
+        logger.info(
+            f"summarised {sum(len(s.ids) for s in aggregate._suppliers.values())} draft services "
+            f"from {len(aggregate)} suppliers on '{framework_slug}'"
+        )
+        return aggregate
+
+    def add(self, draft):
+        self._suppliers[draft['supplierId']].add(draft)
+
+    def for_supplier(self, supplier_id):
+        """The summary of the supplier's draft services, which is empty if they don't have any"""
+        supplier_id = int(supplier_id)
+        if supplier_id in self._suppliers:
+            return self._suppliers[supplier_id]
+        return SupplierDraftServices()
+
+    def supplier_ids(self):
+        return list(self._suppliers)
+
+    def __len__(self):
+        return len(self._suppliers)
+
+    def __contains__(self, supplier_id):
+        return int(supplier_id) in self._suppliers
@@ -7,8 +7,14 @@ import re
 
 from dmapiclient import DataAPIClient, HTTPError
 
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
+from dmscripts.helpers.pipeline_helpers import Pipeline, Stage
+
 logger = logging.getLogger("framework_helpers")
 
+# number of threads making requests to the API for each step of building supplier records
+CONCURRENCY = 3
+
 
 def set_framework_result(client, framework_slug, supplier_id, result, user):
     """
@@ -35,14 +41,16 @@ def find_suppliers_with_details_and_draft_services(
     supplier_ids=None,
     lot=None,
     statuses=None,
-    map_impl=map,
+    concurrency=CONCURRENCY,
 ):
     records = find_suppliers(client, framework_slug, supplier_ids)
-    records = map_impl(partial(add_supplier_info, client), records)
-    records = map_impl(partial(add_framework_info, client, framework_slug), records)
-    records = map_impl(partial(add_draft_services, client, framework_slug, lot=lot, statuses=statuses), records)
-    records = [record for record in records if len(record["services"]) > 0]
-    return records
+    records = Pipeline([
+        Stage(partial(add_supplier_info, client), concurrency),
+        Stage(partial(add_framework_info, client, framework_slug), concurrency),
+        Stage(partial(add_draft_services, client, framework_slug, lot=lot, statuses=statuses), concurrency),
+        Stage.filter(lambda record: len(record["services"]) > 0, name="has_draft_services"),
+    ], logger=logger).run(records)
+    return list(records)
 
 
 def framework_supports_e_signature(framework):
@@ -57,13 +65,16 @@ def find_suppliers_with_details_and_draft_service_counts(
     client,
     framework_slug,
     supplier_ids=None,
-    map_impl=map,
+    concurrency=CONCURRENCY,
+    draft_services=None,
 ):
     records = find_suppliers(client, framework_slug, supplier_ids)
     length = len(records)
-    records = map_impl(partial(add_supplier_info, client), records)
-    records = map_impl(partial(add_framework_info, client, framework_slug), records)
-    records = map_impl(partial(add_draft_counts, client, framework_slug), records)
+    records = Pipeline([
+        Stage(partial(add_supplier_info, client), concurrency),
+        Stage(partial(add_framework_info, client, framework_slug), concurrency),
+        Stage(partial(add_draft_counts, client, framework_slug, draft_services=draft_services), concurrency),
+    ], logger=logger).run(records)
     records = map_watch(
         records,
         f"fetched details and draft counts for supplier {{count}}/{length}"
@@ -71,19 +82,55 @@ def find_suppliers_with_details_and_draft_service_counts(
     return records
 
 
+def find_suppliers_with_details_and_draft_service_counts_in_bulk(
+    client,
+    framework_slug,
+    supplier_ids=None,
+):
+    """Find the same records as `find_suppliers_with_details_and_draft_service_counts` with a few bulk requests
+
+    Rather than making three requests for each supplier, this lists the framework's suppliers (with declarations),
+    the framework's draft services and all suppliers once each, and joins them by supplier ID.
+    """
+    supplier_frameworks = [
+        supplier_framework
+        for supplier_framework in client.find_framework_suppliers_iter(framework_slug, with_declarations=True)
+        if (supplier_ids is None) or (supplier_framework['supplierId'] in supplier_ids)
+    ]
+    wanted_ids = {supplier_framework['supplierId'] for supplier_framework in supplier_frameworks}
+    logger.debug(f"found {len(wanted_ids)} suppliers interested in '{framework_slug}'")
+
+    draft_services = DraftServiceAggregate.from_api(client, framework_slug, supplier_ids=wanted_ids)
+
+    suppliers = {supplier['id']: supplier for supplier in client.find_suppliers_iter() if supplier['id'] in wanted_ids}
+    logger.debug(f"fetched {len(suppliers)} suppliers and draft counts for '{framework_slug}'")
+
+    for supplier_framework in supplier_frameworks:
+        supplier_id = supplier_framework['supplierId']
+        if supplier_id not in suppliers:
+            # shouldn't happen, but don't leave the supplier out if it does
+            suppliers[supplier_id] = client.get_supplier(supplier_id)['suppliers']
+        record = {'supplier_id': supplier_id, 'supplier': suppliers[supplier_id]}
+        # "counts" is a counter of (lotSlug, status) tuples
+        counts = Counter(draft_services.for_supplier(supplier_id).counts)
+        yield dict(framework_info(supplier_framework, record), counts=counts)
+
+
 def find_suppliers_with_signed_framework_agreements(
     client,
     framework_slug,
     supplier_ids=None,
-    map_impl=map,
+    concurrency=CONCURRENCY,
 ):
     records = find_suppliers(client, framework_slug, supplier_ids)
     length = len(records)
-    records = map_impl(partial(add_supplier_info, client), records)
-    records = map_impl(partial(add_framework_info, client, framework_slug), records)
-    records = filter(lambda record: bool(record['agreementId']), records)
-    records = map_impl(partial(add_draft_counts, client, framework_slug), records)
-    records = map_impl(partial(add_agreement_info, client), records)
+    records = Pipeline([
+        Stage(partial(add_supplier_info, client), concurrency),
+        Stage(partial(add_framework_info, client, framework_slug), concurrency),
+        Stage.filter(lambda record: bool(record['agreementId']), name="has_agreement"),
+        Stage(partial(add_draft_counts, client, framework_slug), concurrency),
+        Stage(partial(add_agreement_info, client), concurrency),
+    ], logger=logger).run(records)
     records = map_watch(
         records,
         f"fetched signed framework agreement for supplier {{count}}/{length}"
@@ -122,6 +169,10 @@ def add_supplier_info(client, record):
 
 def add_framework_info(client, framework_slug, record):
     supplier_framework = client.get_supplier_framework_info(record['supplier_id'], framework_slug)['frameworkInterest']
+    return framework_info(supplier_framework, record)
+
+
+def framework_info(supplier_framework, record):
     return dict(record,
                 onFramework=supplier_framework['onFramework'],
                 frameworkSlug=supplier_framework['frameworkSlug'],
@@ -152,12 +203,15 @@ def add_draft_services(client, framework_slug, record, lot=None, statuses=None):
     return dict(record, services=drafts)
 
 
-def add_draft_counts(client, framework_slug, record):
+def add_draft_counts(client, framework_slug, record, draft_services=None):
     # "counts" is a counter of (lotSlug, status) tuples
-    counts = Counter(
-        (ds['lotSlug'], ds['status'])
-        for ds in client.find_draft_services_iter(record['supplier']['id'], framework=framework_slug)
-    )
+    if draft_services is not None:
+        counts = Counter(draft_services.for_supplier(record['supplier']['id']).counts)
+    else:
+        counts = Counter(
+            (ds['lotSlug'], ds['status'])
+            for ds in client.find_draft_services_iter(record['supplier']['id'], framework=framework_slug)
+        )
     return dict(record, counts=counts)
 
 
@@ -0,0 +1,75 @@
+"""Helpers for fetching paginated results from the Digital Marketplace API."""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+
+
+PREFETCH_WINDOW = 4
+
+
+def _page_number(url):
+    return int(parse_qs(urlparse(url).query)['page'][0])
+
+
+def _page_url(url, page):
+    parts = urlparse(url)
+    query = parse_qs(parts.query)
+    query['page'] = [str(page)]
+    return urlunparse(parts._replace(query=urlencode(query, doseq=True)))
+
+
+def _model_name(result):
+    # the same as dmapiclient's `make_iter_method`, but without having to say which key has the results
+    return next((key for key, value in result.items() if key not in ('links', 'meta') and isinstance(value, list)),
+                None)
+
+
+def prefetch_iter(client, method_name, *args, window=PREFETCH_WINDOW, model_name=None, **kwargs):
+    """Iterate over every page of results from a paginated find method, fetching pages in parallel
+
+    This is a drop-in replacement for the `*_iter` methods on DataAPIClient; for instance
+    `prefetch_iter(client, 'find_services', framework='g-cloud-12')` yields the same services in the same order as
+    `client.find_services_iter(framework='g-cloud-12')`.
+
+    The first page is fetched as usual. If it has a link to the last page then the pages in between are fetched with
+    up to `window` requests in flight at once, and results are yielded in page order. Otherwise we fall back to
+    following the `next` links one at a time.
+
+    :param client: a DataAPIClient
+    :param method_name: name of the find method on `client`, e.g. 'find_services'
+    :param window: maximum number of pages to fetch ahead of the page being yielded
+    :param model_name: key with the results in each page, if None the first key with a list value is used
+    """
+    result = getattr(client, method_name)(*args, **kwargs)
+    model_name = model_name or _model_name(result)
+    if not model_name:
+        return
+
+    yield from result[model_name]
+
+    links = result.get('links', {})
+    if 'next' not in links:
+        return
+
+    if 'last' not in links:
+        while 'next' in result.get('links', {}):
+            result = client._get(result['links']['next'])
+            yield from result[model_name]
+        return
+
+    urls = (_page_url(links['next'], page)
+            for page in range(_page_number(links['next']), _page_number(links['last']) + 1))
+
+    with ThreadPoolExecutor(max_workers=window, thread_name_prefix="prefetch_iter") as executor:
+        pending = deque()
+        try:
+            for url in urls:
+                pending.append(executor.submit(client._get, url))
+                if len(pending) >= window:
+                    yield from pending.popleft().result()[model_name]
+            while pending:
+                yield from pending.popleft().result()[model_name]
+        finally:
+            # if we stop early, don't wait for pages that nobody wants
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,214 @@
+"""Run records through a series of steps, each step with its own pool of threads.
+
+Lots of our scripts build a record for each supplier in a few steps, each of which calls the API: fetch the
+supplier, then their framework interest, then their draft services. Chaining `ThreadPool.imap`s runs each step in
+parallel, but the steps share the pool and each script picks its own pool size.
+
+A `Pipeline` runs each step (a `Stage`) in its own threads with its own concurrency, with a bounded buffer in front of
+each stage so a fast stage can't get too far ahead of a slow one. Records come out in the order they went in, unless
+`ordered=False`. Each stage keeps count of the records it has processed and the time spent processing them, which is
+logged at the end of the run.
+
+    records = Pipeline([
+        Stage(partial(add_supplier_info, client), concurrency=3),
+        Stage.filter(lambda record: record['supplier']['active']),
+        Stage(partial(add_framework_info, client, framework_slug), concurrency=5),
+    ]).run(records)
+"""
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
+import threading
+import time
+
+
+BUFFER_SIZE = 100
+
+logger = logging.getLogger("pipeline_helpers")
+
+# returned by a stage to leave the record out of the pipeline's output
+DROP = object()
+
+
+def _name(func):
+    # functools.partial objects don't have a __name__
+    return getattr(getattr(func, 'func', func), '__name__', repr(func))
+
+
+class Stage(object):
+    """A step in a pipeline, calling `func` with each record using `concurrency` threads
+
+    `func` returns the record for the next stage, or `DROP` to leave the record out.
+    """
+
+    def __init__(self, func, concurrency=1, name=None):
+        self.func = func
+        self.concurrency = concurrency
+        self.name = name or _name(func)
+        self.count = 0
+        self.dropped = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def filter(cls, predicate, name=None):
+        """A stage that leaves out records for which `predicate` is false"""
+        return cls(lambda record: record if predicate(record) else DROP, name=name or _name(predicate))
+
+    def __call__(self, record):
+        start = time.monotonic()
+        result = self.func(record)
+        with self._lock:
+            self.count += 1
+            self.dropped += result is DROP
+            self.busy_seconds += time.monotonic() - start
+        return result
+
+    def stats(self, wall_seconds):
+        return {
+            'stage': self.name,
+            'concurrency': self.concurrency,
+            'count': self.count,
+            'dropped': self.dropped,
+            'busy_seconds': self.busy_seconds,
+            'seconds_per_record': self.busy_seconds / self.count if self.count else 0.0,
+            # how much of the time the stage's threads were busy; a stage near 1.0 is the bottleneck
+            'utilisation': self.busy_seconds / (wall_seconds * self.concurrency) if wall_seconds else 0.0,
+        }
+
+
+class Pipeline(object):
+    """Run records through `stages`, see the module docstring
+
+    If a stage raises an exception the pipeline stops and the exception is raised from `run()`.
+    """
+    _DONE = object()
+
+    def __init__(self, stages, ordered=True, buffer_size=BUFFER_SIZE, logger=logger):
+        self.stages = list(stages)
+        self.ordered = ordered
+        self.buffer_size = buffer_size
+        self.logger = logger
+        self.wall_seconds = 0.0
+
+    def stats(self):
+        return [stage.stats(self.wall_seconds) for stage in self.stages]
+
+    def log_stats(self):
+        for stats in self.stats():
+            self.logger.info(
+                "stage {stage}: {count} records ({dropped} dropped) with {concurrency} threads, "
+                "{busy_seconds:.1f}s busy, {seconds_per_record:.3f}s per record, {utilisation:.0%} utilisation"
+                .format(**stats)
+            )
+
+    def _put(self, q, value):
+        while not self._stopped.is_set():
+            try:
+                q.put(value, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q):
+        while not self._stopped.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return self._DONE
+
+    def _feed(self, records):
+        try:
+            for seq, record in enumerate(records):
+                while not self._in_flight.acquire(timeout=0.1):
+                    if self._stopped.is_set():
+                        return
+                if not self._put(self._queues[0], (seq, record)):
+                    return
+            for _ in range(self.stages[0].concurrency):
+                self._put(self._queues[0], self._DONE)
+        except BaseException:
+            self._stopped.set()
+            raise
+
+    def _work(self, i):
+        stage = self.stages[i]
+        try:
+            while True:
+                item = self._get(self._queues[i])
+                if item is self._DONE:
+                    break
+                seq, record = item
+                if record is not DROP:
+                    record = stage(record)
+                if not self._put(self._queues[i + 1], (seq, record)):
+                    return
+
+            # the last worker to finish tells the next stage there are no more records
+            with self._lock:
+                self._remaining_workers[i] -= 1
+                last = self._remaining_workers[i] == 0
+            if last:
+                workers = self.stages[i + 1].concurrency if i + 1 < len(self.stages) else 1
+                for _ in range(workers):
+                    self._put(self._queues[i + 1], self._DONE)
+        except BaseException:
+            self._stopped.set()
+            raise
+
+    def _output(self):
+        """Records from the last stage, in order if `ordered`, with DROPs left in"""
+        next_seq = 0
+        waiting = {}
+        while True:
+            item = self._get(self._queues[-1])
+            if item is self._DONE:
+                return
+            seq, record = item
+            if not self.ordered:
+                self._in_flight.release()
+                yield record
+                continue
+
+            waiting[seq] = record
+            while next_seq in waiting:
+                self._in_flight.release()
+                yield waiting.pop(next_seq)
+                next_seq += 1
+
+    def run(self, records):
+        """Yield each record after it has been through every stage
+
+        A pipeline can only run once at a time.
+        """
+        # the last queue is the pipeline's output, which is only bounded by the number of records in flight
+        self._queues = [queue.Queue(maxsize=self.buffer_size) for _ in self.stages] + [queue.Queue()]
+        # limits how far ahead of the next record to be yielded the other records can get, so with `ordered` one slow
+        # record can't leave an unbounded number of records waiting behind it
+        self._in_flight = threading.Semaphore(self.buffer_size * (len(self.stages) + 1))
+        self._stopped = threading.Event()
+        self._remaining_workers = [stage.concurrency for stage in self.stages]
+        self._lock = threading.Lock()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(
+            1 + sum(stage.concurrency for stage in self.stages), thread_name_prefix="pipeline"
+        ) as executor:
+            futures = [executor.submit(self._feed, records)] + [
+                executor.submit(self._work, i) for i, stage in enumerate(self.stages) for _ in range(stage.concurrency)
+            ]
+            try:
+                for record in self._output():
+                    if record is not DROP:
+                        yield record
+            finally:
+                # stop the threads if we're finished or the caller has stopped iterating
+                self._stopped.set()
+                self.wall_seconds = time.monotonic() - start
+
+            for future in futures:
+                future.result()
+
+        self.log_stats()
@@ -1,70 +1,97 @@
 # -*- coding: utf-8 -*-
 """Helper classes for fetching supplier data given a client."""
 import os
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
 from datetime import date, timedelta, datetime
 from functools import lru_cache
 
 from dmapiclient.audit import AuditTypes
-from itertools import groupby
-from operator import itemgetter
 
 import json
 
 from dmutils.dates import update_framework_with_formatted_dates
 from dmutils.formats import DISPLAY_DATE_FORMAT, DATETIME_FORMAT
 
+from dmscripts.helpers.draft_service_helpers import SupplierDraftServices
+
 
 class SupplierFrameworkData(object):
     """Class to get supplier data from the dmapiclient."""
 
     data = None
+    # whether populate_data should add a summary of each supplier's draft services
+    include_draft_services = True
 
-    def __init__(self, client, target_framework_slug, *, supplier_ids=None, logger=None):
+    def __init__(self, client, target_framework_slug, *, supplier_ids=None, logger=None, draft_services=None):
         """
         :param client: Client object for the Digital Marketplace API
         :param target_framework_slug str: Framework slug
         :param supplier_ids: List of supplier IDs to filter data by
+        :param draft_services: DraftServiceAggregate for the framework, to save finding each supplier's draft services
         """
         self.client = client
         self.target_framework_slug = target_framework_slug
         self.supplier_ids = supplier_ids
         self.logger = logger
+        self.draft_services = draft_services
 
-    def get_supplier_frameworks(self):
-        """Return supplier frameworks."""
+    def iter_supplier_frameworks(self):
+        """Yield supplier frameworks as they are fetched from the API."""
         framework_suppliers = self.client.find_framework_suppliers_iter(
             self.target_framework_slug, with_declarations=None
         )
         if self.supplier_ids:
-            framework_suppliers = (s for s in framework_suppliers if s["supplierId"] in self.supplier_ids)
-        return list(framework_suppliers)
+            supplier_ids = set(self.supplier_ids)
+            framework_suppliers = (s for s in framework_suppliers if s["supplierId"] in supplier_ids)
+        return framework_suppliers
+
+    def get_supplier_frameworks(self):
+        """Return supplier frameworks."""
+        return list(self.iter_supplier_frameworks())
 
     def get_supplier_users(self):
         """Return a dict, {supplier id: [users]}."""
         users = self.client.export_users(self.target_framework_slug).get('users', [])
 
-        keyfunc = itemgetter("supplier_id")
         if self.supplier_ids:
-            users = (u for u in users if u["supplier_id"] in self.supplier_ids)
-        users = sorted(users, key=keyfunc)
-        return {k: list(g) for k, g in groupby(users, key=keyfunc)}
+            supplier_ids = set(self.supplier_ids)
+            users = (u for u in users if u["supplier_id"] in supplier_ids)
+        users_by_supplier_id = defaultdict(list)
+        for user in users:
+            users_by_supplier_id[user["supplier_id"]].append(user)
+        return dict(users_by_supplier_id)
 
     def get_supplier_draft_service_data(self, supplier_id):
-        """Given a supplier ID return a list of dictionaries for services related to framework."""
-        return self.client.find_draft_services_iter(supplier_id, framework=self.target_framework_slug)
+        """Given a supplier ID return a SupplierDraftServices summary of their draft services on the framework."""
+        if self.draft_services is not None:
+            return self.draft_services.for_supplier(supplier_id)
+        return SupplierDraftServices(
+            self.client.find_draft_services_iter(supplier_id, framework=self.target_framework_slug)
+        )
 
-    def populate_data(self):
-        """Populate a dict with supplier data from the api."""
-        self.data = self.get_supplier_frameworks()
-        supplier_count = len(self.data)
+    def iter_data(self):
+        """Yield supplier frameworks with their users (and draft services) one at a time.
+
+        Only the users are fetched up front; each supplier framework is enriched as it is fetched, so nothing
+        else is held in memory unless the caller keeps it.
+        """
         users = self.get_supplier_users()
-        for supplier_number, supplier_framework in enumerate(self.data, start=1):
+        for supplier_number, supplier_framework in enumerate(self.iter_supplier_frameworks(), start=1):
             if self.logger:
-                self.logger.info(f"Populating data for supplier {supplier_number} of {supplier_count}")
+                self.logger.info(f"Populating data for supplier {supplier_number}: {supplier_framework['supplierId']}")
             supplier_id = supplier_framework['supplierId']
-            supplier_framework['users'] = users.get(supplier_id, [])
-            supplier_framework['draft_services'] = list(self.get_supplier_draft_service_data(supplier_id))
+            supplier_framework['users'] = users.pop(supplier_id, [])
+            if self.include_draft_services:
+                supplier_framework['draft_services'] = self.get_supplier_draft_service_data(supplier_id)
+            yield supplier_framework
+
+    def populate_data(self):
+        """Populate self.data with a list of supplier data from the api."""
+        self.data = list(self.iter_data())
+
+    def _supplier_data(self):
+        # use the data from populate_data() if it has been called, otherwise stream it from the api
+        return self.data if self.data is not None else self.iter_data()
 
 
 class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
@@ -72,42 +99,62 @@ class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
 
     STATUS_MAP = {'submitted': 'Successful', 'not-submitted': 'No application', 'failed': 'Unsuccessful'}
 
-    def __init__(self, client, target_framework_slug, *, supplier_ids=None, logger=None):
+    def __init__(self, client, target_framework_slug, *, supplier_ids=None, logger=None, draft_services=None):
         """Get the target framework to operate on and list the lots.
 
         :param client: Instantiated api client
         :param target_framework_slug: Framework to fetch data for
         :param supplier_ids: List of supplier IDs to filter data by
+        :param draft_services: DraftServiceAggregate for the framework
         """
         self.date_today = date.today().strftime(DISPLAY_DATE_FORMAT)
         super(SuccessfulSupplierContextForNotify, self).__init__(
-            client, target_framework_slug, supplier_ids=supplier_ids, logger=logger)
+            client, target_framework_slug, supplier_ids=supplier_ids, logger=logger, draft_services=draft_services)
 
         self.framework = client.get_framework(self.target_framework_slug)['frameworks']
         self.framework_lots = [i['name'] for i in self.framework['lots']]
+        self.framework_lot_names = {lot['slug']: lot['name'] for lot in self.framework['lots']}
+
+    def iter_users_personalisations(self):
+        """Yield (email_address, personalisation) for users eligible for the
+        'Your application result - if successful' email, one supplier at a time
+
+        Each email address is only yielded once, even if it belongs to a user (or primary contact) of more than one
+        supplier.
+        """
+        email_addresses = set()
+        for supplier_framework in self._supplier_data():
+            if not supplier_framework['onFramework']:
+                continue
+            if self.logger:
+                self.logger.info(f"Building user personalisations for supplier {supplier_framework['supplierId']}")
+            users = list(supplier_framework['users'])
+            primary_email_address = supplier_framework.get('declaration', {}).get('primaryContactEmail')
+            if primary_email_address:
+                users.append({'email address': primary_email_address})
+            for user in users:
+                for email_address, personalisation in self.get_user_personalisation(user, supplier_framework).items():
+                    if email_address in email_addresses:
+                        continue
+                    email_addresses.add(email_address)
+                    yield email_address, personalisation
 
     def get_users_personalisations(self):
         """Return {email_address: {personalisations}} for users eligible for the
         'Your application result - if successful' email
         """
-        suppliers_on_framework = list(filter(lambda i: i['onFramework'], self.data))
-        supplier_count = len(suppliers_on_framework)
-
-        output = {}
-        for supplier_number, supplier_framework in enumerate(suppliers_on_framework, start=1):
-            if self.logger:
-                self.logger.info(
-                    f"Building user personalisations for supplier {supplier_number} of {supplier_count}: "
-                    f"{supplier_framework['supplierId']}"
-                )
-            for user in supplier_framework['users']:
-                output.update(self.get_user_personalisation(user, supplier_framework))
-            primary_email_address = supplier_framework.get('declaration', {}).get('primaryContactEmail')
-            if primary_email_address and primary_email_address not in output:
-                output.update(
-                    self.get_user_personalisation({'email address': primary_email_address}, supplier_framework)
-                )
-        return output
+        return dict(self.iter_users_personalisations())
+
+    def iter_notifications(self, template_id, extra_personalisation=None):
+        """Yield notifications of the 'Your application result - if successful' email for email_engine"""
+        for email_address, personalisation in self.iter_users_personalisations():
+            if extra_personalisation:
+                personalisation.update(extra_personalisation)
+            yield {
+                "email_address": email_address,
+                "template_id": template_id,
+                "personalisation": personalisation,
+            }
 
     def get_lot_dict(self, supplier_framework):
         """Return a dict of lot status for each lot on the framework.
@@ -116,21 +163,23 @@ class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
 
         lot_dict = OrderedDict((lot_name, 'No application') for lot_name in self.framework_lots)
 
-        def sort_by_func(d):
-            return d['lotName']
-        sorted_draft_services = sorted(supplier_framework['draft_services'], key=sort_by_func)
-        grouped_draft_services = groupby(sorted_draft_services, key=sort_by_func)
-        for lotName, draft_services in grouped_draft_services:
-            draft_services = list(draft_services)
-            if any(draft_service['status'] == 'submitted' for draft_service in draft_services):
+        for lot_slug, statuses in supplier_framework['draft_services'].statuses_by_lot().items():
+            if lot_slug not in self.framework_lot_names:
+                if self.logger:
+                    self.logger.warning(
+                        f"Ignoring draft services for supplier {supplier_framework.get('supplierId')} "
+                        f"in lot '{lot_slug}', which is not a lot on {self.target_framework_slug}"
+                    )
+                continue
+            if 'submitted' in statuses:
                 status = 'submitted'
-            elif any(draft_service['status'] == 'failed' for draft_service in draft_services):
+            elif 'failed' in statuses:
                 status = 'failed'
             else:
                 status = 'not-submitted'
             if status == 'submitted':
                 valid_lots = True
-            lot_dict[lotName] = self.STATUS_MAP[status]
+            lot_dict[self.framework_lot_names[lot_slug]] = self.STATUS_MAP[status]
         if not valid_lots:
             return {}
         return lot_dict
@@ -158,6 +207,9 @@ class SuccessfulSupplierContextForNotify(SupplierFrameworkData):
 class AppliedToFrameworkSupplierContextForNotify(SupplierFrameworkData):
     """Get the personalisation/ context for 'You application result - if successful email'"""
 
+    # the email doesn't depend on suppliers' draft services
+    include_draft_services = False
+
     def __init__(self, client, target_framework_slug, *, intention_to_award_at=None, supplier_ids=None):
         """Get the target framework to operate on and list the lots.
 
@@ -175,14 +227,16 @@ class AppliedToFrameworkSupplierContextForNotify(SupplierFrameworkData):
         else:
             self.intention_to_award_at = intention_to_award_at
 
+    def iter_users_personalisations(self):
+        """Yield (email_address, personalisation) for all users who expressed interest in the framework"""
+        for supplier_id, users in self.get_suppliers_with_users_personalisations():
+            for user, personalisation in users:
+                yield user['email address'], personalisation
+
     def get_users_personalisations(self):
         """Return {email_address: {personalisations}} for all users who expressed interest in the framework
         """
-        output = {}
-        for supplier_framework in self.data:
-            for user in supplier_framework['users']:
-                output.update(self.get_user_personalisation(user))
-        return output
+        return dict(self.iter_users_personalisations())
 
     def get_suppliers_with_users_personalisations(self):
         """
@@ -195,9 +249,20 @@ class AppliedToFrameworkSupplierContextForNotify(SupplierFrameworkData):
                 (
                     (user, self.get_user_personalisation(user)[user["email address"]]) for user in supplier["users"]
                 ),
-            ) for supplier in self.data
+            ) for supplier in self._supplier_data()
         )
 
+    def iter_notifications(self, application_made_template_id, application_not_made_template_id):
+        """Yield notifications for email_engine, with a different template for users whose supplier applied"""
+        for email_address, personalisation in self.iter_users_personalisations():
+            yield {
+                "email_address": email_address,
+                "template_id": (
+                    application_made_template_id if personalisation['applied'] else application_not_made_template_id
+                ),
+                "personalisation": personalisation,
+            }
+
     def get_user_personalisation(self, user):
         """Get dict of all info required by template given a user and framework."""
         personalisation = {
@@ -1,7 +1,12 @@
 
+from collections import defaultdict
 import random
 
 
+# for fewer suppliers than this it's quicker to find each supplier's users than to list every supplier user
+SUPPLIER_USER_INDEX_THRESHOLD = 50
+
+
 def get_supplier_id(api_client, framework, lot):
     services = [
         s for s in api_client.find_services(framework=framework, lot=lot)['services']
@@ -48,3 +53,43 @@ def get_random_user(api_client, role, supplier_id=None):
         u for u in api_client.find_users(role=role, supplier_id=supplier_id)['users']
         if u['active'] and not u['locked']
     ])
+
+
+class SupplierUserIndex(object):
+    """Supplier users, looked up by supplier ID
+
+    Rather than calling `find_users` for each supplier, every supplier user is listed once with
+    `find_users_iter(role='supplier')` the first time they're needed. If `supplier_ids` are given and there are fewer
+    than SUPPLIER_USER_INDEX_THRESHOLD of them, each supplier's users are found separately instead.
+    """
+
+    def __init__(self, data_api_client, supplier_ids=None, threshold=SUPPLIER_USER_INDEX_THRESHOLD):
+        self.data_api_client = data_api_client
+        self.bulk = supplier_ids is None or len(supplier_ids) >= threshold
+        self._users = None
+
+    def _load(self):
+        self._users = defaultdict(list)
+        for user in self.data_api_client.find_users_iter(role='supplier'):
+            if user.get('supplier'):
+                self._users[user['supplier']['supplierId']].append(user)
+
+    def users(self, supplier_id, active=True):
+        """The supplier's users, or only their active users if `active`"""
+        supplier_id = int(supplier_id)
+        if self.bulk:
+            if self._users is None:
+                self._load()
+            users = self._users.get(supplier_id, [])
+        else:
+            if self._users is None:
+                self._users = {}
+            if supplier_id not in self._users:
+                self._users[supplier_id] = list(self.data_api_client.find_users_iter(supplier_id=supplier_id))
+            users = self._users[supplier_id]
+
+        return [user for user in users if user['active'] or not active]
+
+    def email_addresses(self, supplier_id):
+        """Email addresses of the supplier's active users"""
+        return [user['emailAddress'] for user in self.users(supplier_id)]
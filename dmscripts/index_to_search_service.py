@@ -1,25 +1,71 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
 from itertools import chain
-from multiprocessing.pool import ThreadPool
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
 
 import dmapiclient
+from dmutils.formats import DATETIME_FORMAT
 from six.moves import map
 
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.logging_helpers import logging
+from dmscripts.helpers.pagination_helpers import prefetch_iter
 
 logger = logging_helpers.configure_logger({"dmapiclient": logging.WARNING})
 
+# Defaults for the number of threads fetching items from the data API and
+# sending them to the search API, and how many items can be waiting between
+# the two
+FETCH_WORKERS = 1
+INDEX_WORKERS = 10
+QUEUE_SIZE = 100
+CHECKPOINT_EVERY = 1000
 
-def print_progress(counter, start_time):
+
+def print_progress(counter, start_time, pipeline=None):
     if counter % 100 == 0:
         time_delta = datetime.utcnow() - start_time
-        logger.info("{counter} in {time} ({rps}/s)", extra={
-            'counter': counter, 'time': time_delta, 'rps': counter / time_delta.total_seconds()
-        })
+        if pipeline is None:
+            logger.info("{counter} in {time} ({rps}/s)", extra={
+                'counter': counter, 'time': time_delta, 'rps': counter / time_delta.total_seconds()
+            })
+        else:
+            # if the queue is usually full then indexing is the bottleneck, if
+            # it is usually empty then fetching is
+            logger.info(
+                "{counter} indexed ({rps}/s), {fetched} fetched ({fetch_rps}/s), {queued} waiting in {time}",
+                extra={
+                    'counter': counter,
+                    'rps': counter / time_delta.total_seconds(),
+                    'fetched': pipeline.fetched,
+                    'fetch_rps': pipeline.fetched / time_delta.total_seconds(),
+                    'queued': pipeline.handoff.qsize(),
+                    'time': time_delta,
+                },
+            )
 
 
 class IndexerBase(object):
+    # timestamps that change when something about an item that affects the index changes
+    timestamp_fields = ('updatedAt',)
+
+    # if set to a HashManifest, items that haven't changed since they were last sent to the search API are skipped
+    manifest = None
+
+    # if set to a DocumentProjection, only the fields used by the search mapping are sent to the search API
+    projection = None
+
+    # if set to a Checkpoint, the result for each item is recorded so an interrupted run can be resumed
+    checkpoint = None
+
     def __init__(self, document_type, data_client, search_client, index):
         self.document_type = document_type
         self.index = index
@@ -38,39 +84,109 @@ class IndexerBase(object):
             else:
                 raise
 
-    def request_items(self, frameworks):
+    def request_items(self, frameworks, since=None):
+        """Items to index, or if `since` is given only those that have changed since then"""
+        raise NotImplementedError()
+
+    def request_item_sources(self, frameworks, since=None):
+        """Split `request_items()` into iterables that can be fetched at the same time"""
+        return [self.request_items(frameworks, since)]
+
+    def expected_count(self, frameworks):
+        """Number of documents the data API says should be in the index"""
         raise NotImplementedError()
 
+    def count_documents(self):
+        """Number of documents in the index according to the search API"""
+        return self.search_client.search(self.index, self.document_type)['meta']['total']
+
+    def changed_since(self, item, since):
+        # timestamps from the API are all in DATETIME_FORMAT, so compare as strings
+        return any(item.get(field) and item[field] > since for field in self.timestamp_fields)
+
+    def only_changed(self, items, since):
+        if since is None:
+            return items
+        return (item for item in items if self.changed_since(item, since))
+
     def __call__(self, item):
+        ok = self._index_or_skip(item)
+        if self.checkpoint is not None:
+            self.checkpoint.record(item['id'], ok)
+        return ok
+
+    def _index_or_skip(self, item):
+        content_hash = None
+        if self.manifest is not None:
+            content_hash = self.manifest.content_hash(self.action(item))
+            if self.manifest.unchanged(item['id'], content_hash):
+                return True
+
         try:
             self.index_item(item)
-            return True
         except dmapiclient.APIError:
             logger.exception("{id} not indexed", extra={'id': item.get('id')})
             return False
 
+        if content_hash:
+            self.manifest.record(item['id'], content_hash)
+        return True
+
     def include_in_index(self, item):
         raise NotImplementedError()
 
+    def document(self, item):
+        """The document to send to the search API for an item"""
+        if self.projection is None:
+            return item
+        return self.projection.project(item)
+
     def index_item(self, item):
         if self.include_in_index(item):
-            self.search_client.index(self.index, item['id'], item, self.document_type)
+            document = self.document(item)
+            if self.projection is not None:
+                self.projection.count(item, document)
+            self.search_client.index(self.index, item['id'], document, self.document_type)
         else:
             self.search_client.delete(self.index, item['id'])
 
+    def action(self, item):
+        """What indexing an item does, used to tell whether it has changed since it was last sent"""
+        if self.include_in_index(item):
+            return {'action': 'index', 'id': item['id'], 'document': self.document(item)}
+        else:
+            return {'action': 'delete', 'id': item['id']}
+
 
 class BriefIndexer(IndexerBase):
-    def request_items(self, frameworks):
+    # briefs also change status at set times, without being updated
+    timestamp_fields = (
+        'updatedAt', 'publishedAt', 'applicationsClosedAt', 'withdrawnAt', 'cancelledAt', 'unsuccessfulAt',
+    )
+
+    def request_items(self, frameworks, since=None):
+        return chain(*self.request_item_sources(frameworks, since))
+
+    def request_item_sources(self, frameworks, since=None):
         # this is done as two separate calls because the bulk of the results should be deliverable in a compressed
         # response (which we want as it tends to be more reliable), however we still need to send "withdrawn" briefs
         # to the search api as this is the only way such briefs get removed from the search results. the api will
         # likely refuse to compress these but that's fine as there aren't many of them.
-        return chain(
-            self.data_client.find_briefs_iter(
-                framework=frameworks,
-                status="live,cancelled,unsuccessful,awarded,closed",
+        return [
+            self.only_changed(
+                self.data_client.find_briefs_iter(
+                    framework=frameworks,
+                    status="live,cancelled,unsuccessful,awarded,closed",
+                ),
+                since,
             ),
-            self.data_client.find_briefs_iter(framework=frameworks, status="withdrawn"),
+            self.only_changed(self.data_client.find_briefs_iter(framework=frameworks, status="withdrawn"), since),
+        ]
+
+    def expected_count(self, frameworks):
+        return sum(
+            self.data_client.find_briefs(framework=frameworks, status=status)['meta']['total']
+            for status in ("live,cancelled,unsuccessful,awarded,closed", "withdrawn")
         )
 
     def include_in_index(self, item):
@@ -79,9 +195,18 @@ class BriefIndexer(IndexerBase):
 
 
 class ServiceIndexer(IndexerBase):
-    def request_items(self, frameworks):
+    def request_items(self, frameworks, since=None):
         # despite the name, frameworks takes a string containing a comma-separated list of framework slugs
-        return self.data_client.find_services_iter(framework=frameworks)
+        return self.only_changed(prefetch_iter(self.data_client, 'find_services', framework=frameworks), since)
+
+    def request_item_sources(self, frameworks, since=None):
+        return [
+            self.only_changed(prefetch_iter(self.data_client, 'find_services', framework=framework), since)
+            for framework in frameworks.split(',')
+        ]
+
+    def expected_count(self, frameworks):
+        return self.data_client.find_services(framework=frameworks, status='published')['meta']['total']
 
     def include_in_index(self, item):
         return item['status'] == 'published'
@@ -116,32 +241,594 @@ def search_mapping_matches_framework(mapping_name, frameworks):
     raise ValueError("Incorrect mapping '{}' for the supplied framework(s): {}".format(mapping_name, frameworks))
 
 
+def mapped_fields(mapping, doc_type):
+    """Names of the fields of an item that are used by a search API mapping
+
+    Fields in the mapping are named after the item's fields with a prefix saying how they are used, for instance
+    `dmtext_serviceName` and `dmfilter_serviceCategories`. The transformations in the mapping's `_meta` can also read
+    other fields (to set a field conditionally, for instance), so any name mentioned in a transformation counts as
+    used too.
+
+    :param mapping: mapping as found by the search-api in its digitalmarketplace-search-api/mappings directory
+    """
+    mappings = mapping['mappings']
+    # older mappings have the fields under the document type
+    mappings = mappings.get(doc_type, mappings)
+
+    fields = {'id'}
+    fields.update(re.sub(r'^dm[a-z]*_', '', name) for name in mappings.get('properties', {}))
+
+    def strings(value):
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            for v in value.values():
+                yield from strings(v)
+        elif isinstance(value, list):
+            for v in value:
+                yield from strings(v)
+
+    fields.update(strings(mappings.get('_meta', {}).get('transformations', [])))
+    return frozenset(fields)
+
+
+class DocumentProjection(object):
+    """Projects items down to the fields used by a search mapping, and keeps count of the bytes saved"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.documents = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_mapping_file(cls, mapping_file, doc_type, frameworks):
+        mapping_name = os.path.splitext(os.path.basename(mapping_file))[0]
+        search_mapping_matches_framework(mapping_name, frameworks)
+        with open(mapping_file) as f:
+            return cls(mapped_fields(json.load(f), doc_type))
+
+    def project(self, item):
+        return {key: value for key, value in item.items() if key in self.fields}
+
+    def count(self, item, document):
+        """Record the size of an item and the document sent for it"""
+        before = len(json.dumps(item, separators=(',', ':')))
+        after = len(json.dumps(document, separators=(',', ':')))
+        with self._lock:
+            self.documents += 1
+            self.bytes_before += before
+            self.bytes_after += after
+
+    def report(self):
+        if not self.documents:
+            return
+        logger.info(
+            "Sent {documents} documents averaging {before:.0f} bytes before and {after:.0f} bytes after "
+            "projecting to mapped fields",
+            extra={
+                'documents': self.documents,
+                'before': self.bytes_before / self.documents,
+                'after': self.bytes_after / self.documents,
+            },
+        )
+
+
+class HashManifest(object):
+    """Content hashes of the documents last sent to an index, keyed by item id
+
+    The manifest is kept in a JSON file along with the name of the index it is for, so a manifest for one index is
+    never used to skip items for another. With `force` the existing manifest is ignored, so every item is sent (and a
+    new manifest is saved).
+    """
+
+    def __init__(self, path, index, force=False):
+        self.path = path
+        self.index = index
+        self.hashes = {}
+        self.sent = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+        if not force and os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get('index') == index:
+                self.hashes = manifest['hashes']
+
+    @staticmethod
+    def content_hash(action):
+        """Hash of what would be sent to the search API for an item, including whether it is an index or delete"""
+        return hashlib.blake2b(
+            json.dumps(action, sort_keys=True, separators=(',', ':')).encode(), digest_size=16
+        ).hexdigest()
+
+    def unchanged(self, item_id, content_hash):
+        """Return True if `content_hash` is the same as last time, counting the item as sent or skipped"""
+        with self._lock:
+            if self.hashes.get(str(item_id)) == content_hash:
+                self.skipped += 1
+                return True
+            self.sent += 1
+            return False
+
+    def record(self, item_id, content_hash):
+        """Record that an item was sent successfully"""
+        with self._lock:
+            self.hashes[str(item_id)] = content_hash
+
+    def save(self):
+        tmp_file = "{}.tmp".format(self.path)
+        with open(tmp_file, "w") as f:
+            json.dump({'index': self.index, 'hashes': self.hashes}, f, separators=(',', ':'))
+        os.replace(tmp_file, self.path)
+
+
+class Checkpoint(object):
+    """Progress of a run of `do_index()`, saved to a file so the run can be resumed if it is interrupted
+
+    The file has the ids of items that have been indexed and the ids of items that failed, along with the time the
+    run started. Resuming skips the items that were indexed, so only failed items and items that weren't reached are
+    sent to the search API. The checkpoint is saved every `every` items and at the end of the run, and is deleted once
+    a run finishes without any failures.
+    """
+
+    def __init__(self, path, key, resume=False, every=CHECKPOINT_EVERY):
+        self.path = path
+        self.key = key
+        self.every = every
+        self.done = set()
+        self.failed = set()
+        self.started_at = None
+        self.resumed = False
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('key') == key:
+                self.done = set(checkpoint['done'])
+                self.failed = set(checkpoint['failed'])
+                self.started_at = checkpoint['startedAt']
+                self.resumed = True
+                logger.info(
+                    "Resuming from checkpoint: {done} items already indexed, retrying {failed} failed",
+                    extra={'done': len(self.done), 'failed': len(self.failed)},
+                )
+            else:
+                logger.warning(
+                    "Not resuming from checkpoint for {checkpoint_key}, expected {key}",
+                    extra={'checkpoint_key': checkpoint.get('key'), 'key': key},
+                )
+
+    def start(self, started_at):
+        """Returns the time the run started, which is earlier than `started_at` if we're resuming"""
+        # items indexed before the run was interrupted may have changed since it started
+        if not self.resumed:
+            self.started_at = started_at
+        return self.started_at
+
+    def pending(self, items):
+        """Items that haven't been indexed yet"""
+        return (item for item in items if str(item['id']) not in self.done)
+
+    def record(self, item_id, ok):
+        with self._lock:
+            if ok:
+                self.done.add(str(item_id))
+                self.failed.discard(str(item_id))
+            else:
+                self.failed.add(str(item_id))
+            self._unsaved += 1
+            if self._unsaved >= self.every:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        tmp_file = "{}.tmp".format(self.path)
+        with open(tmp_file, "w") as f:
+            json.dump(
+                {
+                    'key': self.key,
+                    'startedAt': self.started_at,
+                    'done': sorted(self.done),
+                    'failed': sorted(self.failed),
+                },
+                f,
+                separators=(',', ':'),
+            )
+        os.replace(tmp_file, self.path)
+        self._unsaved = 0
+
+    def finish(self, status):
+        """Delete the checkpoint if every item was indexed, otherwise save it so failed items can be retried"""
+        if status:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+
+        self.save()
+        logger.info(
+            "Saved checkpoint with {failed} failed items, run again with --resume to retry them",
+            extra={'failed': len(self.failed)},
+        )
+
+
+def read_watermark(state_file, key):
+    """Get the time of the last successful incremental run for `key` from `state_file`, or None"""
+    if not os.path.exists(state_file):
+        return None
+    with open(state_file) as f:
+        return json.load(f).get(key)
+
+
+def write_watermark(state_file, key, watermark):
+    state = {}
+    if os.path.exists(state_file):
+        with open(state_file) as f:
+            state = json.load(f)
+    state[key] = watermark
+
+    # write to a temporary file first so the state file is never left half-written
+    tmp_file = "{}.tmp".format(state_file)
+    with open(tmp_file, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, state_file)
+
+
+class IndexPipeline(object):
+    """Fetch items and index them using separate pools of threads
+
+    Each fetch worker takes one of `sources` at a time and puts its items on a
+    bounded handoff queue, which index workers take them from. When the queue is full the fetch workers wait, so
+    fetching can't get too far ahead of indexing.
+
+    `run()` yields True or False for each item, the same as calling `indexer`
+    with each item. If a worker raises an exception the other workers stop, and
+    the exception is raised from `run()`.
+    """
+    _DONE = object()
+
+    def __init__(self, indexer, sources, fetch_workers=FETCH_WORKERS, index_workers=INDEX_WORKERS,
+                 queue_size=QUEUE_SIZE):
+        self.indexer = indexer
+        self.fetch_workers = fetch_workers
+        self.index_workers = index_workers
+
+        self.fetched = 0
+        self.handoff = queue.Queue(maxsize=queue_size)
+
+        self._sources = queue.Queue()
+        for source in sources:
+            self._sources.put(source)
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                self.handoff.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _fetch(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    source = self._sources.get_nowait()
+                except queue.Empty:
+                    return
+
+                for item in source:
+                    with self._lock:
+                        self.fetched += 1
+                    self._put(item)
+                    if self._stopped.is_set():
+                        return
+        except BaseException:
+            self._stopped.set()
+            raise
+
+    def _index(self):
+        try:
+            while not self._stopped.is_set():
+                try:
+                    item = self.handoff.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is self._DONE:
+                    return
+                self._results.put(self.indexer(item))
+        except BaseException:
+            self._stopped.set()
+            raise
+
+    def _drain(self):
+        # throw away anything left in the handoff queue, so nothing else is indexed
+        while True:
+            try:
+                self.handoff.get_nowait()
+            except queue.Empty:
+                return
+
+    def run(self):
+        with ThreadPoolExecutor(
+            self.fetch_workers + self.index_workers + 1, thread_name_prefix="do_index"
+        ) as executor:
+            fetchers = [executor.submit(self._fetch) for _ in range(self.fetch_workers)]
+            index_workers = [executor.submit(self._index) for _ in range(self.index_workers)]
+
+            def finish():
+                wait(fetchers)
+                for _ in index_workers:
+                    self._put(self._DONE)
+                wait(index_workers)
+                self._results.put(self._DONE)
+
+            executor.submit(finish)
+
+            try:
+                while True:
+                    result = self._results.get()
+                    if result is self._DONE:
+                        break
+                    yield result
+            finally:
+                # stop the workers if we're finished or the caller has stopped iterating
+                self._stopped.set()
+                self._drain()
+
+            for future in fetchers + index_workers:
+                future.result()
+
+
+def index_results(indexer, frameworks, request_kwargs, serial, fetch_workers, index_workers, queue_size, skip_done):
+    """Start indexing items, returning the pipeline (None if `serial`) and an iterator of results
+
+    With `skip_done` items that the indexer's checkpoint says have already been indexed are skipped.
+    """
+    if serial:
+        items = indexer.request_items(frameworks, **request_kwargs)
+        if skip_done:
+            items = indexer.checkpoint.pending(items)
+        return None, map(indexer, items)
+
+    sources = indexer.request_item_sources(frameworks, **request_kwargs)
+    if skip_done:
+        sources = [indexer.checkpoint.pending(source) for source in sources]
+    pipeline = IndexPipeline(
+        indexer,
+        sources,
+        fetch_workers=fetch_workers,
+        index_workers=index_workers,
+        queue_size=queue_size,
+    )
+    return pipeline, pipeline.run()
+
+
 def do_index(doc_type, search_api_url, search_api_access_token, data_api_url, data_api_access_token, mapping, serial,
-             index, frameworks):
+             index, frameworks, fetch_workers=FETCH_WORKERS, index_workers=INDEX_WORKERS, queue_size=QUEUE_SIZE,
+             state_file=None, manifest_file=None, force=False, mapping_file=None, checkpoint_file=None, resume=False):
+    """Index items from the data API into the search API
+
+    If `state_file` is given then only items that have changed since the last successful run with the same state
+    file, index and frameworks are indexed (or deleted from the index, if their status means they should no longer be
+    in it). The first run, or a run that creates a new index, indexes everything.
+
+    If `manifest_file` is given then items are not sent to the search API if they are exactly the same as the last
+    time they were sent to this index, unless `force` is true.
+
+    If `mapping_file` is given (a copy of the mapping used by the index, from the search-api's mappings directory) then
+    each document is projected down to the fields the mapping uses before it is sent, which makes requests to the
+    search API smaller.
+
+    If `checkpoint_file` is given then progress is saved to it as items are indexed, and with `resume` a run that was
+    interrupted (or had failures) carries on from the checkpoint, only indexing items that failed or weren't reached.
+
+    Returns False if any item was not indexed.
+    """
     logger.info("Search API URL: {search_api_url}", extra={'search_api_url': search_api_url})
     logger.info("Data API URL: {data_api_url}", extra={'data_api_url': data_api_url})
 
-    if serial:
-        mapper = map
-    else:
-        pool = ThreadPool(10)
-        mapper = pool.imap_unordered
-
     indexer = indexers[doc_type](
         doc_type,
         dmapiclient.DataAPIClient(data_api_url, data_api_access_token),
         dmapiclient.SearchAPIClient(search_api_url, search_api_access_token),
         index)
-    if mapping and search_mapping_matches_framework(mapping, frameworks):
+
+    watermark_key = "{}/{}/{}".format(doc_type, index, frameworks)
+    if checkpoint_file:
+        indexer.checkpoint = Checkpoint(checkpoint_file, watermark_key, resume=resume)
+
+    resuming = indexer.checkpoint is not None and indexer.checkpoint.resumed
+    # the index was created by the run we're resuming
+    if mapping and search_mapping_matches_framework(mapping, frameworks) and not resuming:
         indexer.create_index(mapping=mapping)
 
+    if manifest_file:
+        # a new index is empty, so nothing in it can be unchanged
+        indexer.manifest = HashManifest(manifest_file, index, force=force or bool(mapping))
+
+    if mapping_file:
+        indexer.projection = DocumentProjection.from_mapping_file(mapping_file, doc_type, frameworks)
+
     counter = 0
     start_time = datetime.utcnow()
     status = True
-    items = indexer.request_items(frameworks)
-    for result in mapper(indexer, items):
-        counter += 1
-        status = status and result
-        print_progress(counter, start_time)
+
+    watermark = start_time.strftime(DATETIME_FORMAT)
+    if indexer.checkpoint is not None:
+        watermark = indexer.checkpoint.start(watermark)
+
+    request_kwargs = {}
+    if state_file and not mapping:
+        since = read_watermark(state_file, watermark_key)
+        if since:
+            logger.info("Indexing {doc_type} changed since {since}", extra={'doc_type': doc_type, 'since': since})
+            request_kwargs['since'] = since
+
+    pipeline, results = index_results(
+        indexer, frameworks, request_kwargs, serial=serial, fetch_workers=fetch_workers, index_workers=index_workers,
+        queue_size=queue_size, skip_done=resuming,
+    )
+
+    try:
+        for result in results:
+            counter += 1
+            status = status and result
+            print_progress(counter, start_time, pipeline)
+    except BaseException:
+        if indexer.checkpoint is not None:
+            indexer.checkpoint.save()
+        raise
+
+    logger.info("Indexed {counter} {doc_type}", extra={'counter': counter, 'doc_type': doc_type})
+
+    if indexer.manifest is not None:
+        # hashes are only recorded for items that were sent successfully, so it's fine to save even if some failed
+        indexer.manifest.save()
+        logger.info(
+            "Sent {sent} {doc_type} to the search API, skipped {skipped} unchanged",
+            extra={'sent': indexer.manifest.sent, 'skipped': indexer.manifest.skipped, 'doc_type': doc_type},
+        )
+
+    if indexer.projection is not None:
+        indexer.projection.report()
+
+    if indexer.checkpoint is not None:
+        indexer.checkpoint.finish(status)
+
+    # Items that change while we are indexing may or may not have been picked up, so the next run should look at
+    # everything that changed after this run started. If anything failed we keep the old watermark so those items
+    # are tried again next time.
+    if state_file and status:
+        write_watermark(state_file, watermark_key, watermark)
 
     return status
+
+
+@contextmanager
+def timed_stage(name, timings):
+    """Log how long the code inside the context takes, and record it in `timings`"""
+    logger.info("Starting {stage}", extra={'stage': name})
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[name] = time.monotonic() - start
+        logger.info("Finished {stage} in {seconds:.1f}s", extra={'stage': name, 'seconds': timings[name]})
+
+
+def get_index_for_alias(search_client, alias):
+    """Name of the index with alias `alias`, or None"""
+    # get_status() returns the error response rather than raising if the search API can't be reached
+    response = search_client.get_status()
+    if 'es_status' not in response:
+        raise RuntimeError("Could not get indexes from the search API: {}".format(response.get('message', response)))
+    indexes = response['es_status']
+    return next((index for index, status in indexes.items() if alias in status.get('aliases', [])), None)
+
+
+def move_alias(search_client, alias, index):
+    """Point `alias` at `index`, and `<alias>-old` at the index that had `alias` before
+
+    The search API moves one alias at a time (atomically), so `<alias>-old` is moved first as it isn't used for
+    searches. If moving `alias` then fails, `<alias>-old` is put back where it was and nothing has changed.
+    """
+    old_alias = "{}-old".format(alias)
+    current_index = get_index_for_alias(search_client, alias)
+    previous_old_index = get_index_for_alias(search_client, old_alias)
+
+    if current_index:
+        search_client.set_alias(old_alias, current_index)
+    try:
+        search_client.set_alias(alias, index)
+    except Exception:
+        if current_index and previous_old_index:
+            logger.info(
+                "Moving {old_alias} back to {index}", extra={'old_alias': old_alias, 'index': previous_old_index}
+            )
+            search_client.set_alias(old_alias, previous_old_index)
+        raise
+
+
+def verify_index(indexer, frameworks, attempts=10, delay=1):
+    """Check that the index has the number of documents the data API says it should have
+
+    New documents only show up in search results once the index has been refreshed (every second by default), so the
+    count is checked a few times before giving up.
+    """
+    expected = indexer.expected_count(frameworks)
+    for attempt in range(attempts):
+        actual = indexer.count_documents()
+        if actual == expected:
+            logger.info("{index} has {count} documents", extra={'index': indexer.index, 'count': actual})
+            return True
+        if attempt < attempts - 1:
+            time.sleep(delay)
+
+    logger.error(
+        "{index} has {actual} documents, but the data API has {expected}",
+        extra={'index': indexer.index, 'actual': actual, 'expected': expected},
+    )
+    return False
+
+
+def build_index(doc_type, search_api_url, search_api_access_token, data_api_url, data_api_access_token, mapping,
+                alias, frameworks, verify_attempts=10, **index_kwargs):
+    """Build a new index from scratch and move `alias` to it once it is complete
+
+    1. create a new index named after `alias` and the current time using `mapping`
+    2. load every item into it (any `index_kwargs` are passed to `do_index()`)
+    3. check the number of documents in the new index against the data API
+    4. point `alias` at the new index, and `<alias>-old` at the index that had `alias` before (the same as
+       scripts/update-index-alias.py)
+
+    If loading or verification fails the alias isn't changed, so searches keep using the old index, and the new
+    index is left in place to investigate. If moving the alias fails both aliases are left where they were (see
+    `move_alias()`).
+
+    Returns the name of the new index if the alias was moved, otherwise None.
+    """
+    search_mapping_matches_framework(mapping, frameworks)
+
+    index = "{}-{}".format(alias, datetime.utcnow().strftime("%Y-%m-%d-%H%M%S"))
+    indexer = indexers[doc_type](
+        doc_type,
+        dmapiclient.DataAPIClient(data_api_url, data_api_access_token),
+        dmapiclient.SearchAPIClient(search_api_url, search_api_access_token),
+        index)
+
+    timings = OrderedDict()
+    try:
+        with timed_stage("create {}".format(index), timings):
+            indexer.create_index(mapping=mapping)
+
+        with timed_stage("load {}".format(index), timings):
+            loaded = do_index(doc_type, search_api_url, search_api_access_token, data_api_url, data_api_access_token,
+                              mapping=None, serial=False, index=index, frameworks=frameworks, **index_kwargs)
+        if not loaded:
+            logger.error("Some items were not indexed, not moving alias {alias}", extra={'alias': alias})
+            return None
+
+        with timed_stage("verify {}".format(index), timings):
+            verified = verify_index(indexer, frameworks, attempts=verify_attempts)
+        if not verified:
+            logger.error("Not moving alias {alias}", extra={'alias': alias})
+            return None
+
+        with timed_stage("move alias {}".format(alias), timings):
+            move_alias(indexer.search_client, alias, index)
+
+        return index
+    finally:
+        logger.info("Timings: {timings}", extra={
+            'timings': ", ".join("{} {:.1f}s".format(stage, seconds) for stage, seconds in timings.items())
+        })
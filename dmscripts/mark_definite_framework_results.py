@@ -22,11 +22,15 @@ def _assess_draft_services(
     framework_slug,
     supplier_id,
     logger=logging.getLogger("script"),
+    draft_services=None,
 ):
     # A supplier must have at least 1 submitted service
-    counter = Counter()
-    for draft_service in client.find_draft_services_by_framework_iter(framework_slug, supplier_id=supplier_id):
-        counter[draft_service["status"]] += 1
+    if draft_services is not None:
+        counter = draft_services.for_supplier(supplier_id).status_counts()
+    else:
+        counter = Counter()
+        for draft_service in client.find_draft_services_by_framework_iter(framework_slug, supplier_id=supplier_id):
+            counter[draft_service["status"]] += 1
 
     logger.info(
         "\tDraft services:  %s submitted, %s not-submitted",
@@ -48,6 +52,7 @@ def mark_definite_framework_results(
     supplier_ids=None,
     logger=logging.getLogger("script"),
     excluded_supplier_ids=None,
+    draft_services=None,
 ):
     interested_supplier_ids = supplier_ids or client.get_interested_suppliers(
         framework_slug
@@ -85,7 +90,8 @@ def mark_definite_framework_results(
             client,
             framework_slug,
             supplier_id,
-            logger=logger
+            logger=logger,
+            draft_services=draft_services,
         )
         if not service_counter["submitted"]:
             fail_supplier(supplier_id, framework_slug, updated_by, supplier_framework, client, logger, dry_run=dry_run)
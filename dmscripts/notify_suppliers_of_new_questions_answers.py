@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.logging_helpers import logging
+from dmscripts.helpers.user_helpers import SupplierUserIndex
 from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmutils.email.dm_notify import DMNotifyClient
 from dmutils.formats import DATETIME_FORMAT
@@ -60,9 +61,8 @@ def invert_a_dictionary_so_supplier_id_is_key_and_brief_id_is_value(dictionary_t
     return inverted_dic
 
 
-def get_supplier_email_addresses_by_supplier_id(data_api_client, supplier_id):
-    response = data_api_client.find_users(supplier_id=supplier_id)
-    return [user['emailAddress'] for user in response['users'] if user['active']]
+def get_supplier_email_addresses_by_supplier_id(supplier_users, supplier_id):
+    return supplier_users.email_addresses(supplier_id)
 
 
 def create_context_for_supplier(stage, supplier_briefs):
@@ -129,6 +129,7 @@ def main(data_api_url, data_api_token, email_api_key, stage, dry_run, supplier_i
         )
     )
 
+    supplier_users = SupplierUserIndex(data_api_client, supplier_ids=list(interested_suppliers))
     failed_supplier_ids = []
 
     for supplier_id, brief_ids in interested_suppliers.items():
@@ -136,7 +137,7 @@ def main(data_api_url, data_api_token, email_api_key, stage, dry_run, supplier_i
         supplier_briefs = [b for b in briefs if b['id'] in brief_ids]
         # get a context for each supplier email
         supplier_context = create_context_for_supplier(stage, supplier_briefs)
-        email_addresses = get_supplier_email_addresses_by_supplier_id(data_api_client, supplier_id)
+        email_addresses = get_supplier_email_addresses_by_supplier_id(supplier_users, supplier_id)
         if not email_addresses:
             logger.info(
                 "Email not sent for the following supplier ID due to no active users: {supplier_id}",
@@ -13,8 +13,8 @@ def notify_suppliers_whether_application_made(
     api_client, mail_client, framework_slug, logger, dry_run=False, supplier_ids=None
 ):
 
+    # users are emailed as each supplier is fetched, rather than after fetching all of them
     context_helper = AppliedToFrameworkSupplierContextForNotify(api_client, framework_slug, supplier_ids=supplier_ids)
-    context_helper.populate_data()
     prefix = "[Dry Run] " if dry_run else ""
     error_count = 0
     for supplier_id, users in context_helper.get_suppliers_with_users_personalisations():
@@ -42,3 +42,11 @@ def notify_suppliers_whether_application_made(
                 error_count += 1
 
     return error_count
+
+
+def notifications(api_client, framework_slug, supplier_ids=None):
+    """Yield the notifications to send, for scripts that send them with email_engine"""
+    context_helper = AppliedToFrameworkSupplierContextForNotify(api_client, framework_slug, supplier_ids=supplier_ids)
+    yield from context_helper.iter_notifications(
+        NOTIFY_TEMPLATES['application_made'], NOTIFY_TEMPLATES['application_not_made']
+    )
@@ -1,4 +1,7 @@
+from collections import Counter
+
 from dmscripts.helpers.email_helpers import scripts_notify_client
+from dmscripts.helpers.user_helpers import SupplierUserIndex
 from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmutils.email.helpers import hash_string
 from dmutils.formats import utctoshorttimelongdateformat
@@ -47,19 +50,22 @@ def send_notification(mail_client, message, framework, email, supplier_id, dry_r
     return 0
 
 
-def build_message(sf, framework_slug, data_api_client):
+def build_message(sf, framework_slug, data_api_client, draft_services=None):
     message = ''
     if not sf.get('applicationCompanyDetailsConfirmed', None):
         message += MESSAGES['unconfirmed_company_details']
     if not sf.get('declaration', {'status': None}).get('status', None) == 'complete':
         message += MESSAGES['incomplete_declaration']
 
-    submitted_draft_services, unsubmitted_draft_services = 0, 0
-    for service in data_api_client.find_draft_services_iter(sf['supplierId'], framework=framework_slug):
-        if service.get('status') == 'not-submitted':
-            unsubmitted_draft_services += 1
-        if service.get('status') == 'submitted':
-            submitted_draft_services += 1
+    if draft_services is not None:
+        status_counts = draft_services.for_supplier(sf['supplierId']).status_counts()
+    else:
+        status_counts = Counter(
+            service.get('status')
+            for service in data_api_client.find_draft_services_iter(sf['supplierId'], framework=framework_slug)
+        )
+    submitted_draft_services = status_counts['submitted']
+    unsubmitted_draft_services = status_counts['not-submitted']
     if submitted_draft_services == 0:
         message += MESSAGES['no_services']
     elif unsubmitted_draft_services > 0:
@@ -68,13 +74,14 @@ def build_message(sf, framework_slug, data_api_client):
 
 
 def notify_suppliers_with_incomplete_applications(
-    framework_slug, data_api_client, notify_api_key, dry_run, logger, supplier_ids=None
+    framework_slug, data_api_client, notify_api_key, dry_run, logger, supplier_ids=None, draft_services=None
 ):
     framework = data_api_client.get_framework(framework_slug)['frameworks']
     if framework['status'] != 'open':
         raise ValueError("Suppliers cannot amend applications unless the framework is open.")
 
     mail_client = scripts_notify_client(notify_api_key, logger=logger)
+    supplier_users = SupplierUserIndex(data_api_client, supplier_ids=supplier_ids)
     error_count = 0
 
     for sf in data_api_client.find_framework_suppliers_iter(framework_slug):
@@ -85,7 +92,7 @@ def notify_suppliers_with_incomplete_applications(
             if sf['supplierId'] not in supplier_ids:
                 continue
 
-        message = build_message(sf, framework_slug, data_api_client)
+        message = build_message(sf, framework_slug, data_api_client, draft_services=draft_services)
 
         if message:
             primary_email = sf.get('declaration', {'primaryContactEmail': None}).get('primaryContactEmail', None)
@@ -98,15 +105,14 @@ def notify_suppliers_with_incomplete_applications(
                     sf['supplierId'],
                     dry_run
                 )
-            for user in data_api_client.find_users(supplier_id=sf['supplierId']).get('users', []):
-                if user['active']:
-                    error_count += send_notification(
-                        mail_client,
-                        message,
-                        framework,
-                        user['emailAddress'],
-                        sf['supplierId'],
-                        dry_run
-                    )
+            for email_address in supplier_users.email_addresses(sf['supplierId']):
+                error_count += send_notification(
+                    mail_client,
+                    message,
+                    framework,
+                    email_address,
+                    sf['supplierId'],
+                    dry_run
+                )
 
     return error_count
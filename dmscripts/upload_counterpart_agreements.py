@@ -12,6 +12,7 @@ from dmutils.email.exceptions import EmailError, EmailTemplateError
 
 from dmscripts.bulk_upload_documents import get_supplier_id_from_framework_file_path
 from dmscripts.helpers import logging_helpers
+from dmscripts.helpers.user_helpers import SupplierUserIndex
 
 
 def upload_counterpart_file(
@@ -25,11 +26,14 @@ def upload_counterpart_file(
     notify_template_id=None,
     notify_fail_early=True,
     logger=None,
+    supplier_users=None,
 ):
     if bool(dm_notify_client) != bool(notify_template_id):
         raise TypeError("Either specify both dm_notify_client and notify_template_id or neither")
 
     logger = logger or logging_helpers.getLogger()
+    # without a SupplierUserIndex shared between files, find the users for just this supplier
+    supplier_users = supplier_users or SupplierUserIndex(data_api_client, supplier_ids=[])
 
     supplier_id = get_supplier_id_from_framework_file_path(file_path)
     supplier_framework = data_api_client.get_supplier_framework_info(supplier_id, framework["slug"])
@@ -43,10 +47,7 @@ def upload_counterpart_file(
 
     email_addresses_to_notify = dm_notify_client and frozenset(chain(
         (supplier_framework["declaration"]["primaryContactEmail"],),
-        (
-            user["emailAddress"]
-            for user in data_api_client.find_users_iter(supplier_id=int(supplier_id)) if user["active"]
-        ),
+        supplier_users.email_addresses(supplier_id),
     ))
 
     upload_path = generate_timestamped_document_upload_path(
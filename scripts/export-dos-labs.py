@@ -11,20 +11,17 @@ Options:
     --output-dir=<output_dir>   Directory to write csv files to [default: output]
 """
 import itertools
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 sys.path.insert(0, '.')
 
 import logging
 from docopt import docopt
-from dmapiclient import DataAPIClient
 
-from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.api_cache_helpers import data_api_client
 from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_services
 from dmscripts.helpers import logging_helpers
 from dmscripts.export_dos_labs import append_contact_information_to_services
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 if sys.version_info[0] < 3:
     import unicodecsv as csv
@@ -34,12 +31,11 @@ else:
 REQUIRED_CONTACT_DETAILS_KEYS = ['email', 'contactName', 'phoneNumber']
 
 
-def find_all_labs(client, map_impl=map):
+def find_all_labs(client):
     records = find_suppliers_with_details_and_draft_services(client,
                                                              FRAMEWORK_SLUG,
                                                              lot="user-research-studios",
                                                              statuses="submitted",
-                                                             map_impl=map_impl,
                                                              )
     records = list(filter(lambda record: record['onFramework'], records))
     records = append_contact_information_to_services(records, REQUIRED_CONTACT_DETAILS_KEYS)
@@ -77,13 +73,11 @@ if __name__ == '__main__':
         logger.info("Creating {} directory".format(OUTPUT_DIR))
         os.makedirs(OUTPUT_DIR)
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
-
-    pool = ThreadPool(3)
+    client = data_api_client(STAGE)
 
     logger.info(f"Finding suppliers for User Research Studios on {FRAMEWORK_SLUG}")
     write_labs_csv(
-        find_all_labs(client, map_impl=pool.imap),
+        find_all_labs(client),
         os.path.join(OUTPUT_DIR, "user-research-studios.csv"),
         logger=logger
     )
@@ -11,7 +11,6 @@ Options:
     -v --verbose                Print INFO level messages.
     --output-dir=<output_dir>   Directory to write csv files to [default: output]
 """
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 sys.path.insert(0, '.')
@@ -19,22 +18,19 @@ sys.path.insert(0, '.')
 import logging
 from docopt import docopt
 
-from dmapiclient import DataAPIClient
 from dmcontent.content_loader import ContentLoader
 
-from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.api_cache_helpers import data_api_client
 from dmscripts.helpers.csv_helpers import make_fields_from_content_questions, write_csv_with_make_row
 from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_draft_services
 from dmscripts.helpers import logging_helpers
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 
-def find_all_outcomes(client, map_impl=map):
+def find_all_outcomes(client):
     return find_suppliers_with_details_and_draft_services(client,
                                                           FRAMEWORK_SLUG,
                                                           lot="digital-outcomes",
                                                           statuses="submitted",
-                                                          map_impl=map_impl,
                                                           )
 
 
@@ -83,7 +79,7 @@ if __name__ == '__main__':
         logger.info("Creating {} directory".format(OUTPUT_DIR))
         os.makedirs(OUTPUT_DIR)
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+    client = data_api_client(STAGE)
 
     content_loader = ContentLoader(CONTENT_PATH)
     content_loader.load_manifest(FRAMEWORK_SLUG, "services", "edit_submission")
@@ -92,10 +88,8 @@ if __name__ == '__main__':
     capabilities = get_team_capabilities(content_manifest)
     locations = get_outcomes_locations(content_manifest)
 
-    pool = ThreadPool(3)
-
     logger.info(f"Finding suppliers for Digital Outcomes on {FRAMEWORK_SLUG}")
-    suppliers = find_all_outcomes(client, map_impl=pool.imap)
+    suppliers = find_all_outcomes(client)
 
     logger.info(f"Building CSV for {len(suppliers)} Digital Outcomes suppliers")
     write_csv_with_make_row(
@@ -12,7 +12,6 @@ Options:
     --output-dir=<output_dir>   Directory to write csv files to [default: output]
 
 """
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 sys.path.insert(0, '.')
@@ -23,19 +22,16 @@ from dmscripts.helpers.framework_helpers import find_suppliers_with_details_and_
 
 from docopt import docopt
 from dmscripts.helpers.csv_helpers import write_csv_with_make_row
-from dmscripts.helpers.auth_helpers import get_auth_token
-from dmapiclient import DataAPIClient
+from dmscripts.helpers.api_cache_helpers import data_api_client
 from dmcontent.content_loader import ContentLoader
 from dmscripts.helpers import logging_helpers
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 
-def find_all_participants(client, map_impl=map):
+def find_all_participants(client):
     return find_suppliers_with_details_and_draft_services(client,
                                                           FRAMEWORK_SLUG,
                                                           lot="user-research-participants",
                                                           statuses="submitted",
-                                                          map_impl=map_impl,
                                                           )
 
 
@@ -72,16 +68,14 @@ if __name__ == '__main__':
         logger.info("Creating {} directory".format(OUTPUT_DIR))
         os.makedirs(OUTPUT_DIR)
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+    client = data_api_client(STAGE)
 
     content_loader = ContentLoader(CONTENT_PATH)
     content_loader.load_manifest(FRAMEWORK_SLUG, "services", "edit_submission")
     content_manifest = content_loader.get_manifest(FRAMEWORK_SLUG, "edit_submission")
 
-    pool = ThreadPool(3)
-
     logger.info(f'Finding User Research Participants suppliers for {FRAMEWORK_SLUG}')
-    records = find_all_participants(client, map_impl=pool.imap)
+    records = find_all_participants(client)
 
     logger.info(f"Building CSV for {len(records)} User Research Participants suppliers")
     write_csv_with_make_row(
@@ -15,19 +15,16 @@ Example:
 """
 import datetime
 import errno
-from multiprocessing.pool import ThreadPool
 import os
 import sys
 
 sys.path.insert(0, '.')
 
 from docopt import docopt
-from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.api_cache_helpers import data_api_client
 from dmscripts.helpers.logging_helpers import configure_logger, get_logger
 from dmscripts.helpers.logging_helpers import INFO as loglevel_INFO, DEBUG as loglevel_DEBUG
 from dmscripts.export_framework_applicant_details import export_supplier_details
-from dmapiclient import DataAPIClient
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 
 if __name__ == '__main__':
@@ -40,7 +37,7 @@ if __name__ == '__main__':
     configure_logger({"script": loglevel_DEBUG if arguments["--verbose"] else loglevel_INFO})
     logger = get_logger()
 
-    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+    client = data_api_client(STAGE)
     now = datetime.datetime.now()
 
     filename = FRAMEWORK + "-supplier-about-you-data-" + now.strftime("%Y-%m-%d_%H.%M-") + STAGE + ".csv"
@@ -56,8 +53,4 @@ if __name__ == '__main__':
 
     framework_lot_slugs = tuple([lot['slug'] for lot in client.get_framework(FRAMEWORK)['frameworks']['lots']])
 
-    pool = ThreadPool(3)
-
-    export_supplier_details(
-        client, FRAMEWORK, filepath, framework_lot_slugs=framework_lot_slugs, map_impl=pool.imap, logger=logger
-    )
+    export_supplier_details(client, FRAMEWORK, filepath, framework_lot_slugs=framework_lot_slugs, logger=logger)
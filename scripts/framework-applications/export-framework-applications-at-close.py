@@ -31,6 +31,7 @@ from docopt import docopt
 sys.path.insert(0, '.')
 
 from dmscripts.export_framework_applications_at_close import GenerateFrameworkApplicationsCSV
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 from dmutils.env_helpers import get_api_endpoint_from_stage
 
 if __name__ == "__main__":
@@ -55,7 +56,8 @@ if __name__ == "__main__":
     )
     csv_builder = GenerateFrameworkApplicationsCSV(
         client=client,
-        target_framework_slug=framework_slug
+        target_framework_slug=framework_slug,
+        draft_services=DraftServiceAggregate.from_api(client, framework_slug),
     )
 
     if arguments.get('<exclude_suppliers>') is not None:  # updates the generator with any IDs the user wants excluded
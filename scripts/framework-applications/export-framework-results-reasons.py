@@ -20,23 +20,20 @@ Options:
     -h --help
 """
 import json
-from multiprocessing.pool import ThreadPool
 import sys
 sys.path.insert(0, '.')
 
 from docopt import docopt
-from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.api_cache_helpers import data_api_client
 from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_file
 from dmscripts.export_framework_results_reasons import export_suppliers
-from dmapiclient import DataAPIClient
 from dmcontent.content_loader import ContentLoader
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 
 if __name__ == '__main__':
     args = docopt(__doc__)
 
-    client = DataAPIClient(get_api_endpoint_from_stage(args['<stage>']), get_auth_token('api', args['<stage>']))
+    client = data_api_client(args['<stage>'])
     content_loader = ContentLoader(args['<content_path>'])
 
     declaration_definite_pass_schema = json.load(open(args["<declaration_schema_path>"], "r"))
@@ -48,8 +45,6 @@ if __name__ == '__main__':
     if args['<excluded_supplier_ids>'] is not None and supplier_ids is not None:
         supplier_ids = list(set(supplier_ids) - set([int(n) for n in args['<excluded_supplier_ids>'].split(',')]))
 
-    pool = ThreadPool(3)
-
     export_suppliers(
         client,
         args['<framework_slug>'],
@@ -58,5 +53,4 @@ if __name__ == '__main__':
         declaration_definite_pass_schema,
         declaration_discretionary_pass_schema,
         supplier_ids,
-        map_impl=pool.imap,
     )
@@ -22,8 +22,9 @@ Options:
     -h, --help                  Show this help message
 
     -n, --dry-run               Run script without generating files.
-    -t <n>, --threads=<n>       Number of threads to use, if not supplied the
-                                script will be run without threading.
+    -t <n>, --threads=<n>       Number of threads to use for each step of fetching
+                                supplier details, if not supplied one thread is
+                                used for each step.
     -v, --verbose               Show debug log messages.
 
     If neither `--supplier-ids-from` or `--supplier-id` are provided then
@@ -38,7 +39,6 @@ online countries register.
 PDF signature pages are generated for all suppliers that have a framework
 interest and at least one completed draft service.
 """
-from multiprocessing.pool import ThreadPool
 import os
 import pathlib
 import sys
@@ -48,15 +48,13 @@ sys.path.insert(0, ".")
 
 from docopt import docopt
 
-from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.api_cache_helpers import data_api_client
 from dmscripts.helpers.logging_helpers import (
     configure_logger,
     logging,
 )
 from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_file
 
-from dmapiclient import DataAPIClient
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 from dmscripts.generate_framework_agreement_signature_pages import (
     find_suppliers,
@@ -86,10 +84,7 @@ if __name__ == "__main__":
 
     dry_run = args["--dry-run"]
     verbose = args["--verbose"]
-    if args["--threads"]:
-        map_impl = ThreadPool(int(args["--threads"])).imap
-    else:
-        map_impl = map
+    concurrency = int(args["--threads"]) if args["--threads"] else 1
 
     logger = configure_logger({
         "dmapiclient.base": logging.WARNING,
@@ -98,15 +93,12 @@ if __name__ == "__main__":
     })
 
     logger.debug(f"connecting to api on {stage}")
-    client = DataAPIClient(
-        get_api_endpoint_from_stage(args["<stage>"]),
-        get_auth_token("api", args["<stage>"]),
-    )
+    client = data_api_client(args["<stage>"])
 
     logger.debug(f"fetching lots for framework '{framework_slug}'")
     framework = client.get_framework(framework_slug)["frameworks"]
 
-    suppliers = find_suppliers(client, framework, supplier_ids, map_impl, dry_run)
+    suppliers = find_suppliers(client, framework, supplier_ids, concurrency, dry_run)
 
     # create a temporary directory for the HTML files
     with tempfile.TemporaryDirectory() as html_dir:
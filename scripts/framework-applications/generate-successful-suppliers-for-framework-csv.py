@@ -20,13 +20,10 @@ import argparse
 import csv
 import sys
 
-from dmapiclient import DataAPIClient
-
 sys.path.insert(0, '.')
 
 from dmscripts.helpers import logging_helpers
-from dmscripts.helpers.auth_helpers import get_auth_token
-from dmutils.env_helpers import get_api_endpoint_from_stage
+from dmscripts.helpers.api_cache_helpers import data_api_client
 
 if __name__ == "__main__":
     logger = logging_helpers.configure_logger()
@@ -40,10 +37,7 @@ if __name__ == "__main__":
 
     FILENAME = f'{args.framework_slug}-all-successful-suppliers.csv'
 
-    client = DataAPIClient(
-        base_url=get_api_endpoint_from_stage(args.stage),
-        auth_token=get_auth_token('api', args.stage)
-    )
+    client = data_api_client(args.stage)
 
     logger.info('Retrieving framework ...')
     all_lot_names = [lot['name'] for lot in client.get_framework(args.framework_slug)['frameworks']['lots']]
@@ -37,6 +37,7 @@ import json
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmapiclient import DataAPIClient
 from dmscripts.mark_definite_framework_results import mark_definite_framework_results
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 from dmscripts.helpers.logging_helpers import configure_logger
 from dmscripts.helpers.logging_helpers import INFO as loglevel_INFO, DEBUG as loglevel_DEBUG
 from dmscripts.helpers.supplier_data_helpers import get_supplier_ids_from_file
@@ -60,10 +61,13 @@ if __name__ == "__main__":
 
     configure_logger({"script": loglevel_DEBUG if args["--verbose"] else loglevel_INFO})
 
+    framework_slug = args["<framework_slug>"]
+    draft_services = DraftServiceAggregate.from_api(client, framework_slug, supplier_ids=supplier_ids)
+
     mark_definite_framework_results(
         client,
         updated_by,
-        args["<framework_slug>"],
+        framework_slug,
         declaration_definite_pass_schema,
         declaration_discretionary_pass_schema=declaration_discretionary_pass_schema,
         reassess_passed_suppliers=args["--reassess-passed-sf"],
@@ -71,4 +75,5 @@ if __name__ == "__main__":
         dry_run=args["--dry-run"],
         supplier_ids=supplier_ids,
         excluded_supplier_ids=args["--excluded-supplier-ids"],
+        draft_services=draft_services,
     )
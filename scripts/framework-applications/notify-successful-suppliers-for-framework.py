@@ -43,6 +43,7 @@ from dmcontent.content_loader import ContentLoader
 from dmutils.formats import nodaydateformat
 from dmscripts.helpers.email_helpers import scripts_notify_client
 from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.supplier_data_helpers import (
     SuccessfulSupplierContextForNotify,
@@ -70,10 +71,9 @@ if __name__ == '__main__':
     api_client = DataAPIClient(base_url=get_api_endpoint_from_stage(STAGE), auth_token=get_auth_token('api', STAGE))
 
     context_helper = SuccessfulSupplierContextForNotify(
-        api_client, FRAMEWORK_SLUG, supplier_ids=supplier_ids, logger=logger
+        api_client, FRAMEWORK_SLUG, supplier_ids=supplier_ids, logger=logger,
+        draft_services=DraftServiceAggregate.from_api(api_client, FRAMEWORK_SLUG, supplier_ids=supplier_ids),
     )
-    context_helper.populate_data()
-    context_data = context_helper.get_users_personalisations()
     framework = api_client.get_framework(FRAMEWORK_SLUG).get('frameworks')
 
     prefix = "[Dry Run] " if DRY_RUN else ""
@@ -85,9 +85,10 @@ if __name__ == '__main__':
         "frameworkLiveAt_dateformat": nodaydateformat(framework['frameworkLiveAtUTC'])
     }
 
-    user_count = len(context_data)
-    for user_number, (user_email, personalisation) in enumerate(context_data.items(), start=1):
-        logger.info(f"{prefix}Sending email to supplier user {user_number} of {user_count} '{hash_string(user_email)}'")
+    # users are emailed as each supplier is fetched, rather than after fetching all of them
+    context_data = context_helper.iter_users_personalisations()
+    for user_number, (user_email, personalisation) in enumerate(context_data, start=1):
+        logger.info(f"{prefix}Sending email to supplier user {user_number} '{hash_string(user_email)}'")
 
         personalisation.update(extra_template_context)
 
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""Download a framework's supplier frameworks, declarations, suppliers, draft services, services, agreements and user
+   and supplier exports into a local snapshot file.
+
+   Export scripts that get their API client from `data_api_client()` (applicant details, results reasons, supplier
+   and user CSVs and the DOS exports) will read from the snapshot instead of the API if DM_API_SNAPSHOT is set to its
+   path.
+
+Usage:
+    scripts/framework-applications/snapshot-framework.py <stage> <framework_slug> <snapshot_file> [options]
+
+Options:
+    --verbose                   Show debug log messages
+    -h, --help                  Show this screen
+
+Example:
+    scripts/framework-applications/snapshot-framework.py preview g-cloud-12 g-cloud-12.snapshot
+    DM_API_SNAPSHOT=g-cloud-12.snapshot \\
+        scripts/framework-applications/export-framework-applicant-details.py preview g-cloud-12 SCRIPT_OUTPUTS
+
+"""
+import sys
+
+sys.path.insert(0, '.')
+
+from docopt import docopt
+from dmapiclient import DataAPIClient
+from dmutils.env_helpers import get_api_endpoint_from_stage
+
+from dmscripts.framework_snapshot import take_snapshot
+from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.logging_helpers import configure_logger, get_logger
+from dmscripts.helpers.logging_helpers import INFO as loglevel_INFO, DEBUG as loglevel_DEBUG
+
+
+if __name__ == '__main__':
+    arguments = docopt(__doc__)
+
+    STAGE = arguments['<stage>']
+
+    configure_logger({"script": loglevel_DEBUG if arguments["--verbose"] else loglevel_INFO})
+
+    # always snapshot from the API, even if DM_API_SNAPSHOT or DM_API_CACHE are set
+    client = DataAPIClient(get_api_endpoint_from_stage(STAGE), get_auth_token('api', STAGE))
+
+    take_snapshot(client, arguments['<framework_slug>'], arguments['<snapshot_file>'], logger=get_logger())
@@ -31,15 +31,13 @@ import os
 import sys
 sys.path.insert(0, '.')
 
-from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.api_cache_helpers import data_api_client as get_data_api_client
 from dmscripts.generate_supplier_user_csv import generate_csv_and_upload_to_s3
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.logging_helpers import logging
 from dmscripts.helpers.s3_helpers import get_bucket_name
-from dmutils.env_helpers import get_api_endpoint_from_stage
 
 from docopt import docopt
-from dmapiclient import DataAPIClient
 
 from dmutils.s3 import S3
 
@@ -53,7 +51,7 @@ if __name__ == '__main__':
     arguments = docopt(__doc__)
 
     stage = arguments['<stage>']
-    data_api_client = DataAPIClient(get_api_endpoint_from_stage(stage), get_auth_token('api', stage))
+    data_api_client = get_data_api_client(stage)
     report_type = arguments['<report_type>']
     framework_slug = arguments['<framework_slug>']
     output_dir = arguments['--output-dir']
@@ -17,6 +17,23 @@ Options:
                                                   .json suffix) as would be found by the search-api in its
                                                   digitalmarketplace-search-api/mappings directory.
     --serial                                      Do not run in parallel (useful for debugging)
+    --fetch-workers=<n>                           Number of threads fetching items from the API [default: 1]
+                                                  (more than one only helps when indexing several frameworks)
+    --index-workers=<n>                           Number of threads sending items to the search API [default: 10]
+    --queue-size=<n>                              Maximum number of items waiting to be indexed [default: 100]
+    --incremental=<state-file>                    Only index items that have changed since the last successful run
+                                                  with the same state file (and index and frameworks). The time of
+                                                  each run is saved in the state file, which is created if needed.
+    --manifest=<manifest-file>                    Keep a hash of each document sent to the index in this file, and
+                                                  skip documents that haven't changed since they were last sent
+    --force                                       Send every document, even if it is in the manifest and unchanged
+    --project-to-mapping=<mapping-file>           Only send the fields of each document that are used by this mapping
+                                                  file (a copy of the mapping used by the index, from the search-api's
+                                                  mappings directory), to make requests to the search API smaller
+    --checkpoint=<checkpoint-file>                Save progress to this file as items are indexed, so that if the run
+                                                  is interrupted it can be resumed with --resume
+    --resume                                      Carry on from the checkpoint file, only indexing items that failed
+                                                  or weren't reached
     --api-url=<api-url>                           Override API URL (otherwise automatically populated)
     --api-token=<api_access_token>                Override API token (otherwise automatically populated)
     --search-api-url=<search-api-url>             Override search API URL (otherwise automatically populated)
@@ -51,6 +68,15 @@ if __name__ == "__main__":
         serial=arguments['--serial'],
         index=arguments['--index'],
         frameworks=arguments['--frameworks'],
+        fetch_workers=int(arguments['--fetch-workers']),
+        index_workers=int(arguments['--index-workers']),
+        queue_size=int(arguments['--queue-size']),
+        state_file=arguments['--incremental'],
+        manifest_file=arguments['--manifest'],
+        force=arguments['--force'],
+        mapping_file=arguments['--project-to-mapping'],
+        checkpoint_file=arguments['--checkpoint'],
+        resume=arguments['--resume'],
     )
 
     if not ok:
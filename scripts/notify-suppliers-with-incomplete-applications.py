@@ -36,6 +36,7 @@ import logging
 from dmscripts.helpers import logging_helpers
 from dmapiclient import DataAPIClient
 from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 from dmutils.env_helpers import get_api_endpoint_from_stage
 from dmscripts.notify_suppliers_with_incomplete_applications import notify_suppliers_with_incomplete_applications
 
@@ -54,13 +55,19 @@ if __name__ == '__main__':
         base_url=get_api_endpoint_from_stage(stage), auth_token=get_auth_token('api', stage)
     )
 
+    framework_slug = doc_opt_arguments['<framework>']
+    draft_services = DraftServiceAggregate.from_api(
+        data_api_client, framework_slug, supplier_ids=list_of_supplier_ids or None
+    )
+
     sys.exit(
         notify_suppliers_with_incomplete_applications(
-            doc_opt_arguments['<framework>'],
+            framework_slug,
             data_api_client,
             doc_opt_arguments['<notify_api_key>'],
             doc_opt_arguments['--dry-run'],
             logger,
             supplier_ids=list_of_supplier_ids,
+            draft_services=draft_services,
         )
     )
@@ -30,6 +30,7 @@ from dmapiclient.data import DataAPIClient
 sys.path.insert(0, '.')
 
 from dmscripts.helpers.auth_helpers import get_auth_token
+from dmscripts.helpers.pagination_helpers import prefetch_iter
 from dmutils.env_helpers import get_api_endpoint_from_stage
 from docopt import docopt
 
@@ -51,7 +52,7 @@ if __name__ == "__main__":
         auth_token=get_auth_token('api', stage)
     )
 
-    services = data_api_client.find_services_iter(framework=f'{framework_slug}', status='published')
+    services = prefetch_iter(data_api_client, 'find_services', framework=f'{framework_slug}', status='published')
 
     headers = [
         'Supplier ID', 'Supplier Name', 'Service ID', 'Service Name', 'Lot', 'Free trial link'
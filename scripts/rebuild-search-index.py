@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Build a new search index from scratch, check it is complete, then move an alias to it.
+
+This does the same as running index-to-search-service.py with --create-with-mapping and then update-index-alias.py,
+but the alias is only moved if every item was indexed and the number of documents in the new index matches the number
+of items in the API. The new index is named after the alias and the current time, e.g. g-cloud-12-2021-06-01-020000.
+
+Usage:
+    rebuild-search-index.py <doc-type> <stage> --alias=<alias> --frameworks=<frameworks> --mapping=<mapping> [options]
+
+    <doc-type>                                    One of briefs or services
+    <stage>                                       One of dev, preview, staging or production
+    --alias=<alias>                               Alias to move to the new index, e.g. g-cloud-12
+    --frameworks=<frameworks>                     Comma-separated list of framework slugs that should be indexed
+    --mapping=<mapping>                           Mapping to create the new index with, as found by the search-api in
+                                                  its digitalmarketplace-search-api/mappings directory.
+
+Options:
+    -h --help                                     Show this screen.
+    --fetch-workers=<n>                           Number of threads fetching items from the API [default: 1]
+    --index-workers=<n>                           Number of threads sending items to the search API [default: 10]
+    --api-url=<api-url>                           Override API URL (otherwise automatically populated)
+    --api-token=<api_access_token>                Override API token (otherwise automatically populated)
+    --search-api-url=<search-api-url>             Override search API URL (otherwise automatically populated)
+    --search-api-token=<search_api_access_token>  Override search API token (otherwise automatically populated)
+
+Example:
+    ./scripts/rebuild-search-index.py services dev --alias=g-cloud-12 --frameworks=g-cloud-12 \
+--mapping=services-g-cloud-12
+"""
+
+import sys
+from docopt import docopt
+
+sys.path.insert(0, '.')
+from dmscripts.index_to_search_service import build_index
+from dmscripts.helpers.auth_helpers import get_auth_token
+from dmutils.env_helpers import get_api_endpoint_from_stage
+
+
+if __name__ == "__main__":
+    arguments = docopt(__doc__)
+    new_index = build_index(
+        doc_type=arguments['<doc-type>'],
+        data_api_url=arguments['--api-url'] or get_api_endpoint_from_stage(arguments['<stage>'], 'api'),
+        data_api_access_token=arguments['--api-token'] or get_auth_token('api', arguments['<stage>']),
+        search_api_url=arguments['--search-api-url'] or get_api_endpoint_from_stage(arguments['<stage>'], 'search-api'),
+        search_api_access_token=arguments['--search-api-token'] or get_auth_token('search_api', arguments['<stage>']),
+        mapping=arguments['--mapping'],
+        alias=arguments['--alias'],
+        frameworks=arguments['--frameworks'],
+        fetch_workers=int(arguments['--fetch-workers']),
+        index_workers=int(arguments['--index-workers']),
+    )
+
+    if not new_index:
+        sys.exit(1)
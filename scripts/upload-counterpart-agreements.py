@@ -41,12 +41,14 @@ Options:
 import sys
 sys.path.insert(0, '.')
 
+from dmscripts.bulk_upload_documents import get_supplier_id_from_framework_file_path
 from dmscripts.helpers.auth_helpers import get_auth_token
 from dmscripts.helpers.file_helpers import get_all_files_of_type
 from dmscripts.upload_counterpart_agreements import upload_counterpart_file
 from dmscripts.helpers import logging_helpers
 from dmscripts.helpers.logging_helpers import logging
 from dmscripts.helpers.s3_helpers import get_bucket_name
+from dmscripts.helpers.user_helpers import SupplierUserIndex
 from dmutils.env_helpers import get_api_endpoint_from_stage
 from dmcontent.content_loader import ContentLoader
 
@@ -93,8 +95,12 @@ if __name__ == '__main__':
         bucket = S3(get_bucket_name(stage, "agreements"))
 
     failure_count = 0
+    file_paths = list(get_all_files_of_type(document_directory, "pdf"))
+    supplier_users = SupplierUserIndex(
+        data_api_client, supplier_ids=[get_supplier_id_from_framework_file_path(path) for path in file_paths]
+    )
 
-    for file_path in get_all_files_of_type(document_directory, "pdf"):
+    for file_path in file_paths:
         try:
             upload_counterpart_file(
                 bucket,
@@ -107,6 +113,7 @@ if __name__ == '__main__':
                 notify_template_id=arguments.get("--notify-template-id"),
                 notify_fail_early=False,
                 logger=logger,
+                supplier_users=supplier_users,
             )
         except (OSError, IOError, S3ResponseError, EmailError, APIError):
             # upload_counterpart_file should have already logged these so no need here
@@ -65,3 +65,19 @@ def crashing_send_notification(send_notification):
         return crasher
 
     return factory
+
+
+@pytest.fixture
+def bulk_backend():
+    """Local stand-in for Notify's bulk sending API"""
+
+    class FakeBulkBackend:
+        def __init__(self):
+            self.batches = []
+
+        def send_batch(self, template_id, notifications):
+            self.batches.append((template_id, list(notifications)))
+            job_id = f"job-{len(self.batches)}"
+            return [{"job_id": job_id, "row_number": i} for i in range(len(notifications))]
+
+    return FakeBulkBackend()
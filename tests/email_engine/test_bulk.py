@@ -0,0 +1,111 @@
+from unittest import mock
+
+import pytest
+from notifications_python_client.errors import APIError, HTTPError
+
+from dmscripts.email_engine.bulk import LoopingBulkBackend, NotifyBulkBackend, RateLimitedBulkBackend
+from dmscripts.email_engine.ratelimit import RateLimitedSender
+from dmscripts.email_engine.typing import EmailNotification
+
+
+class TestNotifyBulkBackend:
+    def test_send_batch(self):
+        notify_client = mock.Mock()
+        notify_client.post.return_value = {"data": {"id": "1234-abcd"}}
+        notifications = [
+            EmailNotification(
+                email_address="hello@example.com",
+                template_id="0000-0000",
+                personalisation={"name": "Hello", "lot": "Cloud support"},
+            ),
+            EmailNotification(
+                email_address="test@example.com",
+                template_id="0000-0000",
+                personalisation={"name": "Test", "lot": "Cloud hosting"},
+            ),
+        ]
+
+        responses = NotifyBulkBackend(notify_client, "my-reference").send_batch("0000-0000", notifications)
+
+        assert notify_client.post.call_args_list == [
+            mock.call(
+                "/v2/notifications/bulk",
+                data={
+                    "name": "my-reference",
+                    "template_id": "0000-0000",
+                    "rows": [
+                        ["email address", "lot", "name", "reference"],
+                        ["hello@example.com", "Cloud support", "Hello", f"my-reference-{notifications[0].sha256_hash}"],
+                        ["test@example.com", "Cloud hosting", "Test", f"my-reference-{notifications[1].sha256_hash}"],
+                    ],
+                },
+            )
+        ]
+        assert responses == [
+            {"job_id": "1234-abcd", "row_number": 0},
+            {"job_id": "1234-abcd", "row_number": 1},
+        ]
+
+    def test_send_batch_raises_if_personalisation_is_missing(self):
+        notify_client = mock.Mock()
+        notifications = [
+            EmailNotification(
+                email_address="hello@example.com", template_id="0000-0000", personalisation={"name": "Hello"}
+            ),
+            EmailNotification(
+                email_address="test@example.com", template_id="0000-0000", personalisation={"lot": "Cloud hosting"}
+            ),
+        ]
+
+        with pytest.raises(ValueError) as e:
+            NotifyBulkBackend(notify_client, "my-reference").send_batch("0000-0000", notifications)
+
+        assert str(e.value) == (
+            f"notification {notifications[0].sha256_hash} is missing personalisation lot"
+            " needed by other notifications in the batch for template 0000-0000"
+        )
+        assert notify_client.post.called is False
+
+
+class TestLoopingBulkBackend:
+    def test_send_batch(self, send_notification):
+        notifications = [
+            EmailNotification(email_address=f"{i}@example.com", template_id="0000-0000") for i in range(3)
+        ]
+
+        responses = LoopingBulkBackend(send_notification).send_batch("0000-0000", notifications)
+
+        assert send_notification.call_args_list == [mock.call(n) for n in notifications]
+        assert len(responses) == 3
+
+
+class TestRateLimitedBulkBackend:
+    @pytest.fixture
+    def notifications(self):
+        return [EmailNotification(email_address=f"{i}@example.com", template_id="0000-0000") for i in range(3)]
+
+    def test_send_batch_takes_a_token_for_each_attempt_and_retries_errors(self, notifications):
+        backend = mock.Mock()
+        backend.send_batch.side_effect = [
+            HTTPError(response=mock.Mock(status_code=429, json=mock.Mock(return_value={}))),
+            [{"job_id": "1234"}] * 3,
+        ]
+        sender = RateLimitedSender(mock.Mock(), rate=10, max_tries=2, sleep=mock.Mock())
+        sender.bucket = mock.Mock(wraps=sender.bucket)
+
+        responses = RateLimitedBulkBackend(backend, sender).send_batch("0000-0000", notifications)
+
+        assert responses == [{"job_id": "1234"}] * 3
+        assert backend.send_batch.call_args_list == [mock.call("0000-0000", notifications)] * 2
+        assert sender.bucket.acquire.call_count == 2
+        assert (sender.stats.requests, sender.stats.errors, sender.stats.retries) == (2, 1, 1)
+
+    def test_send_batch_does_not_retry_client_errors(self, notifications):
+        backend = mock.Mock()
+        backend.send_batch.side_effect = HTTPError(response=mock.Mock(status_code=400, json=mock.Mock(return_value={})))
+        sender = RateLimitedSender(mock.Mock(), max_tries=5, sleep=mock.Mock())
+
+        with pytest.raises(APIError):
+            RateLimitedBulkBackend(backend, sender).send_batch("0000-0000", notifications)
+
+        assert backend.send_batch.call_count == 1
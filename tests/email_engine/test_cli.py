@@ -60,6 +60,20 @@ class TestArgumentParser:
 
         assert args1.reference == args2.reference
 
+    @pytest.mark.parametrize("tuning_args", (
+        ["--concurrency", "10"],
+        ["--concurrency=10", "--pipeline", "--max-queued", "50"],
+        ["--bulk", "--batch-size=10", "--rate-limit", "5", "--rate-limit-burst=1", "--max-retries", "0"],
+    ))
+    def test_reference_default_suffix_does_not_depend_on_tuning_args(self, argument_parser_factory, tuning_args):
+        with mock.patch("sys.argv", ["foobar", "-n", "--notify-api-key=0000"]):
+            args1 = argument_parser_factory().parse_args()
+
+        with mock.patch("sys.argv", ["foobar", "-n", *tuning_args, "--notify-api-key=0000"]):
+            args2 = argument_parser_factory().parse_args()
+
+        assert args1.reference == args2.reference == "foobar-3c3adfeb"
+
     def test_reference_default_removes_suffix_dot_py(self, argument_parser_factory):
         with mock.patch("sys.argv", ["foobar.py"]):
             args = argument_parser_factory().parse_args([])
@@ -96,3 +110,34 @@ class TestArgumentParser:
             args = argument_parser_factory(reference="bar").parse_args([])
 
         assert args.logfile == Path("/tmp/bar.log")
+
+    def test_concurrency(self, argument_parser_factory):
+        argument_parser = argument_parser_factory()
+        assert argument_parser.parse_args([]).concurrency == 1
+        assert argument_parser.parse_args(["--concurrency=10"]).concurrency == 10
+
+    def test_concurrency_must_be_positive(self, argument_parser_factory):
+        with pytest.raises(SystemExit):
+            argument_parser_factory().parse_args(["--concurrency=0"])
+
+    def test_max_retries(self, argument_parser_factory):
+        argument_parser = argument_parser_factory()
+        assert argument_parser.parse_args([]).max_retries == 5
+        assert argument_parser.parse_args(["--max-retries=0"]).max_retries == 0
+
+    def test_max_retries_must_not_be_negative(self, argument_parser_factory):
+        with pytest.raises(SystemExit):
+            argument_parser_factory().parse_args(["--max-retries=-1"])
+
+    def test_simulate_latency(self, argument_parser_factory):
+        argument_parser = argument_parser_factory()
+        assert argument_parser.parse_args([]).simulate_latency is None
+
+        profile = argument_parser.parse_args(["--simulate-latency=uniform:0.1,0.5;errors=0.01"]).simulate_latency
+        assert profile.distribution == "uniform"
+        assert profile.params == (0.1, 0.5)
+        assert profile.error_rate == 0.01
+
+    def test_simulate_latency_must_be_valid(self, argument_parser_factory):
+        with pytest.raises(SystemExit):
+            argument_parser_factory().parse_args(["--simulate-latency=gaussian:0.1"])
@@ -5,6 +5,8 @@ from unittest import mock
 
 import pytest
 
+from notifications_python_client.errors import APIError
+
 from dmscripts.email_engine import EmailNotification, email_engine
 
 
@@ -107,6 +109,27 @@ class TestEmailEngine:
             -1
         ] == "sent 10 email notifications with reference test_email_engine"
 
+    def test_email_engine_retries_if_notify_is_rate_limiting(
+        self, notifications_api_client, logfile, notifications_generator, send_notification
+    ):
+        rate_limited = APIError(response=mock.Mock(status_code=429))
+        notifications_api_client(
+            "test_api_key"
+        ).send_email_notification.side_effect = [rate_limited, *(send_notification() for _ in range(10))]
+
+        with mock.patch("dmscripts.email_engine.ratelimit.backoff.full_jitter", return_value=0):
+            email_engine(
+                notifications_generator,
+                argv=[],
+                reference="test_email_engine_rate_limited",
+                logfile=logfile,
+            )
+
+        assert notifications_api_client("test_api_key").send_email_notification.call_count == 11
+        log = logfile.read_text()
+        assert "rate limiter: retrying notification " in log
+        assert "with 1 errors and 1 retries" in log
+
     def test_email_engine_logfile(self, notifications_api_client, logfile):
         def notifications_generator(**args):
             yield EmailNotification(
@@ -133,7 +156,8 @@ class TestEmailEngine:
             )
 
         loglines = logfile.read_text().splitlines()
-        assert loglines == [
+        assert loglines.pop(-3).startswith("first notification was sent after ")
+        assert loglines[:-1] == [
             "OFFICIAL SENSITIVE - do not distribute - this file contains email addresses and other PII",
             "getting notifications to send from API",
             "queue update: queued notification {'email_address': 'test1@example.com', 'template_id': '000-001', 'personalisation': {'name': 'test1'}}",
@@ -143,3 +167,63 @@ class TestEmailEngine:
             "queue update: send notification {'email_address': 'test2@example.com', 'template_id': '000-001', 'personalisation': {'name': 'test2'}} response {}",
             "sent 2 email notifications with reference test_email_engine_logfile",
         ]
+        assert loglines[-1].startswith("made 2 requests to Notify in ")
+
+    def test_email_engine_bulk(self, notifications_api_client, logfile, notifications_generator, bulk_backend):
+        with mock.patch.object(sys, 'argv', ['--reference=test_email_engine_bulk', '--bulk', '--batch-size=3']):
+            email_engine(
+                notifications_generator,
+                bulk_backend=bulk_backend,
+                reference="test_email_engine_bulk",
+                logfile=logfile,
+            )
+
+        assert not notifications_api_client("test_api_key").send_email_notification.called
+        assert [len(batch) for _, batch in bulk_backend.batches] == [3, 3, 3, 1]
+        assert logfile.read_text().count("queue update: send notification") == 10
+
+    def test_email_engine_bulk_uses_notify_bulk_api_by_default(
+        self, notifications_api_client, logfile, notifications_generator
+    ):
+        notifications_api_client("test_api_key").post.return_value = {"data": {"id": "1234-abcd"}}
+
+        with mock.patch.object(sys, 'argv', ['--reference=test_email_engine_bulk', '--bulk']):
+            email_engine(
+                notifications_generator,
+                reference="test_email_engine_bulk",
+                logfile=logfile,
+            )
+
+        assert notifications_api_client("test_api_key").post.call_count == 1
+        assert notifications_api_client("test_api_key").post.call_args[0][0] == "/v2/notifications/bulk"
+
+    def test_email_engine_simulate_latency(self, caplog, notifications_api_client, logfile, notifications_generator):
+        with mock.patch.object(
+            sys,
+            'argv',
+            [
+                '--reference=test_email_engine_simulate',
+                '--simulate-latency=fixed:10',
+                '--simulate-speedup=100',
+                '--concurrency=5',
+                '--rate-limit=1000',
+            ],
+        ):
+            email_engine(
+                notifications_generator,
+                reference="test_email_engine_simulate",
+                logfile=logfile,
+            )
+
+        assert not notifications_api_client("test_api_key").send_email_notification.called
+        assert logfile.read_text().count("queue update: send notification") == 10
+
+        summary = next(m for m in caplog.messages if m.startswith("made 10 requests to Notify"))
+        assert "response time p50 10." in summary
+        assert "max 5 requests in flight" in summary
+
+        # 10 notifications taking 10 seconds each, 5 at a time
+        projection = caplog.messages[-1]
+        assert projection.startswith("[SIMULATION] with latency profile fixed:10.0")
+        assert "sending 10 email notifications would take about " in projection
+        assert 20 <= int(projection.split()[-1].rstrip("s")) < 25
@@ -3,12 +3,32 @@
 
 from textwrap import dedent
 from unittest import mock
+import json
+import threading
+import time
+import tracemalloc
 
 import pytest
 
 from notifications_python_client.errors import APIError
 
-from dmscripts.email_engine.queue import EmailNotification, LoggingQueue, run
+from dmscripts.email_engine.journal import journal_handler, journal_path
+from dmscripts.email_engine.logger import journal_logger
+from dmscripts.email_engine.queue import EmailNotification, LoggingQueue, _read_lines, run
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = journal_path(tmp_path / "log.txt")
+    handler = journal_handler(journal)
+    journal_logger.logger.addHandler(handler)
+    yield journal
+    journal_logger.logger.removeHandler(handler)
+    handler.close()
+
+
+def journal_records(journal):
+    return [json.loads(line) for line in journal.read_text().splitlines()]
 
 
 class TestRun:
@@ -80,6 +100,398 @@ class TestRun:
             == "sending emails was stopped by APIError with 7 notifications left to send"
         )
 
+    def test_run_with_concurrency(self, notifications_generator, send_notification, logfile, queue):
+        run(send_notification, notifications=notifications_generator(), logfile=logfile, concurrency=4)
+
+        assert len(queue.todo) == 0
+        assert len(queue.sending) == 0
+        assert len(queue.done) == 10
+        assert send_notification.call_count == 10
+
+    def test_run_with_concurrency_logs_remaining_todo_if_interrupted_by_exception(
+        self, caplog, notifications_generator, logfile, crashing_send_notification
+    ):
+        send_notification = crashing_send_notification(
+            crash_after=3, crash_with=APIError(message="woops")
+        )
+
+        with pytest.raises(APIError):
+            run(
+                send_notification,
+                notifications=notifications_generator(),
+                logfile=logfile,
+                concurrency=2,
+            )
+
+        assert caplog.messages[-1].startswith("sending emails was stopped by APIError with ")
+
+    def test_run_with_concurrency_can_be_resumed_from_log(
+        self, caplog, notifications_generator, logfile, crashing_send_notification, send_notification
+    ):
+        with pytest.raises(RuntimeError):
+            run(
+                crashing_send_notification(crash_after=5),
+                notifications=notifications_generator(),
+                logfile=logfile,
+                concurrency=3,
+            )
+
+        logfile.write_text(caplog.text)
+        sent_before_crash = caplog.text.count("queue update: send notification")
+        send_notification.reset_mock()
+
+        done = run(send_notification, notifications=[], logfile=logfile, concurrency=3)
+
+        assert len(done) == 10
+        # notifications sent before the crash are not sent again
+        assert 4 <= sent_before_crash < 10
+        assert send_notification.call_count == 10 - sent_before_crash
+
+    def test_run_writes_journal(self, notifications_generator, send_notification, logfile, journal):
+        run(send_notification, notifications=notifications_generator(), logfile=logfile, journal=journal)
+
+        records = journal_records(journal)
+        assert [r["op"] for r in records] == ["queued"] * 10 + ["exhausted"] + ["sent"] * 10
+        assert records[0] == {
+            "op": "queued",
+            "hash": EmailNotification(email_address="0@example.com", template_id="0000-0003").sha256_hash,
+            "notification": {"email_address": "0@example.com", "template_id": "0000-0003", "personalisation": None},
+        }
+        assert records[10] == {"op": "exhausted", "count": 10}
+
+    def test_run_resumes_from_journal_instead_of_logfile(
+        self, caplog, notifications_generator, logfile, journal, crashing_send_notification, send_notification
+    ):
+        with pytest.raises(RuntimeError):
+            run(
+                crashing_send_notification(crash_after=4),
+                notifications=notifications_generator(),
+                logfile=logfile,
+                journal=journal,
+            )
+        send_notification.reset_mock()
+
+        # the logfile isn't attached to a handler, so the journal is the only place the state is recorded
+        done = run(send_notification, notifications=[], logfile=logfile, journal=journal)
+
+        assert len(done) == 10
+        assert send_notification.call_count == 7
+        assert f"logging queue reading from journal {journal}" in caplog.messages
+
+    def test_run_migrates_logfile_to_journal(self, send_notification, logfile, journal, queue):
+        logfile.write_text(
+            dedent(
+                """\
+                queue update: queued notification {"email_address": "hello@example.com", "template_id": "0000-0001"}
+                queue update: queued notification {"email_address": "test@example.com", "template_id": "0000-0002"}
+                queue update: generator is exhausted, read 2 notifications into queue
+                queue update: send notification {"email_address": "hello@example.com", "template_id": "0000-0001"} response {"id": "1001-1000"}
+                """
+            )
+        )
+
+        run(send_notification, notifications=[], logfile=logfile, journal=journal)
+
+        assert [(r["op"], r.get("notification", {}).get("email_address")) for r in journal_records(journal)] == [
+            ("queued", "hello@example.com"),
+            ("queued", "test@example.com"),
+            ("exhausted", None),
+            ("sent", None),
+            ("sent", None),
+        ]
+
+        resumed_queue = LoggingQueue()
+        assert resumed_queue.put_from_journal(journal) == (2, True)
+        assert resumed_queue.done == queue.done
+
+    def test_run_with_bulk_backend(self, notifications_generator, send_notification, logfile, queue, bulk_backend):
+        done = run(
+            send_notification,
+            notifications=notifications_generator(),
+            logfile=logfile,
+            bulk_backend=bulk_backend,
+            batch_size=4,
+        )
+
+        assert not send_notification.called
+        assert [(template_id, len(batch)) for template_id, batch in bulk_backend.batches] == [
+            ("0000-0003", 4), ("0000-0003", 4), ("0000-0003", 2),
+        ]
+        assert len(done) == 10
+        assert done[EmailNotification(email_address="5@example.com", template_id="0000-0003")] == {
+            "job_id": "job-2", "row_number": 1,
+        }
+
+    def test_run_with_bulk_backend_can_be_resumed_from_journal(
+        self, notifications_generator, logfile, journal, bulk_backend
+    ):
+        crashing_send_batch = mock.Mock(side_effect=[bulk_backend.send_batch, RuntimeError])
+
+        def send_batch(template_id, notifications):
+            f = crashing_send_batch()
+            return f(template_id, notifications)
+
+        with pytest.raises(RuntimeError):
+            run(
+                mock.Mock(),
+                notifications=notifications_generator(),
+                logfile=logfile,
+                journal=journal,
+                bulk_backend=mock.Mock(send_batch=send_batch),
+                batch_size=3,
+            )
+
+        bulk_backend.batches.clear()
+        done = run(mock.Mock(), notifications=[], logfile=logfile, journal=journal, bulk_backend=bulk_backend)
+
+        assert len(done) == 10
+        # only the first batch was sent before the crash, the rest are sent together
+        assert [len(batch) for _, batch in bulk_backend.batches] == [7]
+
+    @pytest.fixture
+    def slow_notifications_generator(self):
+        """Notifications from a fake API that takes `latency` seconds per notification"""
+        def g(count, latency):
+            for i in range(count):
+                time.sleep(latency)
+                yield EmailNotification(email_address=f"{i}@example.com", template_id="0000-0007")
+
+        return g
+
+    @pytest.mark.parametrize("concurrency", (1, 3))
+    def test_run_with_pipeline(self, slow_notifications_generator, send_notification, logfile, queue, concurrency):
+        done = run(
+            send_notification,
+            notifications=slow_notifications_generator(10, 0.001),
+            logfile=logfile,
+            pipeline=True,
+            concurrency=concurrency,
+        )
+
+        assert len(done) == 10
+        assert send_notification.call_count == 10
+
+    def test_run_with_pipeline_waits_for_producer_to_start(self, notifications_generator, logfile, queue):
+        # make sure the sender gets to the queue before the producer puts anything in it
+        sender_waiting = threading.Event()
+        wait_for_todo, put_from = queue._wait_for_todo, queue.put_from
+
+        def wait_for_todo_after_setting_event():
+            sender_waiting.set()
+            return wait_for_todo()
+
+        def put_from_after_sender_is_waiting(notifications, **kwargs):
+            assert sender_waiting.wait(timeout=5)
+            return put_from(notifications, **kwargs)
+
+        send_notification = mock.Mock(return_value={})
+        with mock.patch.object(queue, "_wait_for_todo", wait_for_todo_after_setting_event), \
+                mock.patch.object(queue, "put_from", put_from_after_sender_is_waiting):
+            done = run(send_notification, notifications=notifications_generator(), logfile=logfile, pipeline=True)
+
+        assert len(done) == 10
+        assert send_notification.call_count == 10
+
+    def test_run_with_pipeline_sends_before_generator_is_exhausted(
+        self, caplog, slow_notifications_generator, logfile, queue
+    ):
+        # the generator stops half way until something has been sent, so this
+        # would time out if sending waited for the generator to be exhausted
+        count = 20
+        first_sent, generated = None, 0
+        sent = threading.Event()
+
+        def generator():
+            nonlocal generated
+            for notification in slow_notifications_generator(count, 0.001):
+                generated += 1
+                yield notification
+                if generated == count // 2:
+                    assert sent.wait(timeout=10)
+
+        def send_notification(notification):
+            nonlocal first_sent
+            if first_sent is None:
+                first_sent = generated
+            sent.set()
+            return {}
+
+        run(send_notification, notifications=generator(), logfile=logfile, pipeline=True)
+
+        # generating and sending overlap, so the first notification is sent
+        # while the generator is still running
+        assert first_sent <= count // 2
+        assert queue.first_sent_at is not None
+        assert any(m.startswith("first notification was sent after ") for m in caplog.messages)
+
+    def test_pipelined_run_can_be_resumed_if_generator_fails_after_some_sends(
+        self, caplog, notifications_generator, logfile, send_notification
+    ):
+        sent = threading.Event()
+        sent_addresses = []
+
+        def failing_generator():
+            for i, notification in enumerate(notifications_generator()):
+                if i == 5:
+                    assert sent.wait(timeout=10)
+                    raise RuntimeError("API went away")
+                yield notification
+
+        def send_and_signal(notification):
+            sent.set()
+            sent_addresses.append(notification["email_address"])
+            return send_notification(notification)
+
+        with pytest.raises(RuntimeError, match="API went away"):
+            run(send_and_signal, notifications=failing_generator(), logfile=logfile, pipeline=True)
+
+        logfile.write_text(caplog.text)
+        assert "generator is exhausted" not in caplog.text
+        assert 1 <= caplog.text.count("queue update: send notification") == len(sent_addresses) <= 5
+        resumed_send_notification = mock.Mock(wraps=send_notification)
+
+        done = run(resumed_send_notification, notifications=notifications_generator(), logfile=logfile, pipeline=True)
+
+        assert len(done) == 10
+        # only the notifications the first run didn't get to are sent
+        assert sorted(c.args[0]["email_address"] for c in resumed_send_notification.call_args_list) == sorted(
+            f"{i}@example.com" for i in range(10) if f"{i}@example.com" not in sent_addresses
+        )
+
+        # and the log of the resumed run is complete, so running again has nothing to do
+        logfile.write_text(caplog.text)
+        queue = LoggingQueue()
+        assert queue.put_from_logfile(logfile) == (10, True)
+        assert len(queue.done) == 10 and not queue.todo
+
+    def test_pipelined_run_interrupted_after_some_sends_can_be_resumed_from_journal(
+        self, notifications_generator, logfile, journal, send_notification
+    ):
+        resume_generating = threading.Event()
+        sends = 0
+
+        def slow_generator():
+            for i, notification in enumerate(notifications_generator()):
+                if i == 5:
+                    # the user presses ctrl-C before we get any further
+                    resume_generating.wait(timeout=10)
+                yield notification
+
+        def interrupted_send_notification(notification):
+            nonlocal sends
+            sends += 1
+            if sends == 4:
+                raise KeyboardInterrupt
+            return send_notification(notification)
+
+        with pytest.raises(KeyboardInterrupt):
+            run(interrupted_send_notification, notifications=slow_generator(), logfile=logfile, journal=journal,
+                pipeline=True)
+        # let the producer thread see the run was aborted
+        resume_generating.set()
+        for thread in threading.enumerate():
+            if thread.name.startswith("email_engine_producer"):
+                thread.join(timeout=10)
+
+        records = journal_records(journal)
+        assert "exhausted" not in [r["op"] for r in records]
+        assert [r["op"] for r in records].count("sent") == 3
+        resumed_send_notification = mock.Mock(wraps=send_notification)
+
+        done = run(
+            resumed_send_notification, notifications=notifications_generator(), logfile=logfile, journal=journal,
+            pipeline=True,
+        )
+
+        assert len(done) == 10
+        assert sorted(c.args[0]["email_address"] for c in resumed_send_notification.call_args_list) == [
+            f"{i}@example.com" for i in range(3, 10)
+        ]
+        queue = LoggingQueue()
+        assert queue.put_from_journal(journal) == (10, True)
+        assert len(queue.done) == 10 and not queue.todo
+
+    def test_run_with_pipeline_limits_number_of_notifications_waiting(
+        self, slow_notifications_generator, logfile, queue
+    ):
+        queue_lengths = []
+
+        def send_notification(notification):
+            queue_lengths.append(len(queue.todo))
+            time.sleep(0.001)
+            return {}
+
+        run(
+            send_notification,
+            notifications=slow_notifications_generator(50, 0),
+            logfile=logfile,
+            pipeline=True,
+            max_queued=5,
+        )
+
+        assert len(queue.done) == 50
+        assert max(queue_lengths) <= 5
+
+    def test_run_with_pipeline_stops_if_generator_fails(self, caplog, logfile, send_notification):
+        def generator():
+            yield EmailNotification(email_address="0@example.com", template_id="0000-0007")
+            raise ValueError("API error")
+
+        with pytest.raises(ValueError):
+            run(send_notification, notifications=generator(), logfile=logfile, pipeline=True)
+
+        assert "sending emails was stopped by ValueError" in caplog.messages[-1]
+        assert "generator is exhausted" not in caplog.text
+
+    def test_run_with_pipeline_can_be_resumed_from_log(
+        self, caplog, slow_notifications_generator, logfile, crashing_send_notification, send_notification
+    ):
+        with pytest.raises(RuntimeError):
+            run(
+                crashing_send_notification(crash_after=8),
+                notifications=slow_notifications_generator(10, 0.001),
+                logfile=logfile,
+                pipeline=True,
+                max_queued=2,
+            )
+
+        logfile.write_text(caplog.text)
+        sent_before_crash = caplog.text.count("queue update: send notification")
+        send_notification.reset_mock()
+
+        done = run(send_notification, notifications=[], logfile=logfile)
+
+        assert len(done) == 10
+        assert send_notification.call_count == 10 - sent_before_crash
+
+    @pytest.mark.parametrize("concurrency", (1, 2, 5))
+    def test_run_sends_up_to_concurrency_notifications_at_once(self, logfile, concurrency):
+        # each request to the stub Notify client waits until `concurrency`
+        # requests are in flight, so this only finishes if they overlap
+        count = 20
+        in_flight, max_in_flight = 0, 0
+        lock = threading.Lock()
+        barrier = threading.Barrier(concurrency, timeout=10)
+
+        def slow_send_notification(notification):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(in_flight, max_in_flight)
+            barrier.wait()
+            with lock:
+                in_flight -= 1
+            return {"id": notification["email_address"]}
+
+        notifications = (
+            EmailNotification(email_address=f"{i}@example.com", template_id="0000-0004") for i in range(count)
+        )
+
+        done = run(slow_send_notification, notifications=notifications, logfile=logfile, concurrency=concurrency)
+
+        assert len(done) == count
+        assert max_in_flight == concurrency
+
 
 class TestLoggingQueue:
     def test_put(self):
@@ -134,11 +546,28 @@ class TestLoggingQueue:
             )
         )
 
-        queue.send_next(send_notification)
+        assert queue.send_next(send_notification) is True
 
         assert len(queue.todo) == 0
         assert len(queue.done) == 1
 
+    def test_send_next_returns_false_if_queue_is_empty(self, send_notification):
+        queue = LoggingQueue()
+
+        assert queue.send_next(send_notification) is False
+        assert not send_notification.called
+
+    def test_put_ignores_notification_that_is_being_sent(self, caplog):
+        queue = LoggingQueue()
+        notification = EmailNotification(email_address="hello@example.com", template_id="0000-000a")
+
+        queue.put(notification)
+        queue.send_next(lambda n: queue.put(n) or {"id": "cafe"})
+
+        assert caplog.messages[-2] == f"ignoring duplicate notification {notification}"
+        assert len(queue.todo) == 0
+        assert len(queue.done) == 1
+
     def test_send_next_logs_notification_and_response(self, caplog, send_notification):
         queue = LoggingQueue()
 
@@ -229,6 +658,212 @@ class TestLoggingQueue:
             )
         ]
 
+    def test_put_from_logfile_does_not_read_lines_written_after_opening(self, tmp_path):
+        log_file = tmp_path / "log.txt"
+        log_file.write_text("first line\nsecond line\n")
+
+        with log_file.open("rb") as fp:
+            size = log_file.stat().st_size
+            with log_file.open("a") as f:
+                f.write("our own tail\n")
+            assert list(_read_lines(fp, size)) == ["first line", "second line"]
+
+    def test_put_from_logfile_drops_a_line_that_was_not_finished_when_opening(self, tmp_path):
+        log_file = tmp_path / "log.txt"
+        log_file.write_text("first line\nsecond l")
+
+        with log_file.open("rb") as fp:
+            size = log_file.stat().st_size
+            with log_file.open("a") as f:
+                f.write("ine\nour own tail\n")
+            assert list(_read_lines(fp, size)) == ["first line"]
+
+    def test_put_from_logfile_drops_a_line_without_a_newline(self, tmp_path):
+        log_file = tmp_path / "log.txt"
+        log_file.write_bytes("first line\nsecond line \N{EURO SIGN}".encode("utf-8")[:-1])
+
+        with log_file.open("rb") as fp:
+            assert list(_read_lines(fp, log_file.stat().st_size)) == ["first line"]
+
+    def test_put_from_logfile_memory_usage_does_not_grow_with_logfile_size(self, tmp_path):
+        # a large logfile where most lines are not queue updates, which is what
+        # the logfile for a big run looks like with --verbose
+        log_file = tmp_path / "log.txt"
+        with log_file.open("w") as f:
+            f.write(
+                """queue update: queued notification {"email_address": "hello@example.com", "template_id": "0000-0001"}\n"""
+                """queue update: generator is exhausted, read 1 notifications into queue\n"""
+            )
+            boring_line = "2021-04-08T10:43:05Z boring log line about things not queue related " + "x" * 100 + "\n"
+            f.writelines(boring_line for _ in range(100_000))
+        size = log_file.stat().st_size
+        assert size > 15_000_000
+
+        queue = LoggingQueue()
+        tracemalloc.start()
+        try:
+            assert queue.put_from_logfile(log_file) == (1, True)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert len(queue.todo) == 1
+        assert peak < size / 100
+
+    def test_put_from_journal(self, tmp_path):
+        hello = EmailNotification(email_address="hello@example.com", template_id="0000-0001")
+        test = EmailNotification(email_address="test@example.com", template_id="0000-0002")
+        journal = tmp_path / "log.txt.jsonl"
+        journal.write_text(
+            "\n".join(
+                json.dumps(record) for record in (
+                    {"op": "queued", "hash": hello.sha256_hash, "notification": hello},
+                    {"op": "queued", "hash": test.sha256_hash, "notification": test},
+                    {"op": "exhausted", "count": 2},
+                    {"op": "sent", "hash": hello.sha256_hash, "response": {"id": "1001-1000"}},
+                )
+            )
+        )
+
+        queue = LoggingQueue()
+
+        assert queue.put_from_journal(journal) == (2, True)
+        assert list(queue.todo) == [test]
+        assert queue.done == {hello: {"id": "1001-1000"}}
+
+    @pytest.mark.parametrize(
+        "records",
+        (
+            # sent before queued
+            [{"op": "sent", "hash": "abc", "response": {}}],
+            # count doesn't match
+            [{"op": "queued", "hash": "abc", "notification": {"email_address": "a", "template_id": "b"}},
+             {"op": "exhausted", "count": 2}],
+            # unknown op
+            [{"op": "sned", "hash": "abc", "response": {}}],
+        ),
+    )
+    def test_put_from_journal_raises_error_if_journal_is_invalid(self, tmp_path, records):
+        journal = tmp_path / "log.txt.jsonl"
+        journal.write_text("\n".join(json.dumps(record) for record in records))
+
+        with pytest.raises(RuntimeError):
+            LoggingQueue().put_from_journal(journal)
+
+    def test_put_from_journal_roundtrip(self, journal, send_notification, notifications_generator):
+        queue_a = LoggingQueue()
+        queue_a.put_from(notifications_generator())
+        for _ in range(4):
+            queue_a.send_next(send_notification)
+
+        queue_b = LoggingQueue()
+        queue_b.put_from_journal(journal)
+
+        assert queue_b.todo == queue_a.todo
+        assert queue_b.done == queue_a.done
+
+    def test_put_from_journal_with_many_notifications(self, tmp_path):
+        # resume from a synthetic journal of a run with 100k notifications, half of which were sent
+        count = 100_000
+        journal = tmp_path / "log.txt.jsonl"
+        with journal.open("w") as f:
+            for i in range(count):
+                notification = {"email_address": f"{i}@example.com", "template_id": "0000-0005", "personalisation": {"i": i}}
+                f.write(json.dumps({"op": "queued", "hash": str(i), "notification": notification}) + "\n")
+            f.write(json.dumps({"op": "exhausted", "count": count}) + "\n")
+            for i in range(0, count, 2):
+                f.write(json.dumps({"op": "sent", "hash": str(i), "response": {"id": str(i)}}) + "\n")
+
+        queue = LoggingQueue()
+        assert queue.put_from_journal(journal) == (count, True)
+
+        assert len(queue.todo) == len(queue.done) == count // 2
+        assert next(iter(queue.todo))["email_address"] == "1@example.com"
+
+    def test_queue_bookkeeping_is_constant_time(self):
+        # putting, checking membership and removing notifications should be
+        # O(1), so each lookup should only compare the notification with the
+        # one that has the same hash, rather than scanning the whole queue
+        count = 10_000
+        notifications = [
+            EmailNotification(email_address=f"{i}@example.com", template_id="0000-0006", personalisation={"i": i})
+            for i in range(count)
+        ]
+        # equal copies, so that lookups can't short-circuit on identity
+        copies = [EmailNotification(**notification) for notification in notifications[::2]]
+        queue = LoggingQueue()
+        comparisons = 0
+
+        def eq(self, other):
+            nonlocal comparisons
+            comparisons += 1
+            return dict.__eq__(self, other)
+
+        with mock.patch.object(EmailNotification, "__eq__", eq):
+            for notification in notifications:
+                queue.put(notification, log=False)
+            for notification in copies:
+                assert notification in queue
+                del queue.todo[notification]
+
+        assert len(queue.todo) == count // 2
+        # a deque would make about len(copies) * count / 2 comparisons
+        assert comparisons <= 5 * len(copies)
+
+    def test_send_next_batch_groups_notifications_by_template(self, bulk_backend):
+        notifications = [
+            EmailNotification(email_address=f"{i}@example.com", template_id=template_id)
+            for i, template_id in enumerate(["a", "b", "a", "a", "b", "c"])
+        ]
+        queue = LoggingQueue()
+        queue.put_from(notifications)
+
+        assert queue.send_next_batch(bulk_backend.send_batch, 5) is True
+
+        assert bulk_backend.batches == [
+            ("a", [notifications[0], notifications[2], notifications[3]]),
+            ("b", [notifications[1], notifications[4]]),
+        ]
+        assert list(queue.todo) == [notifications[5]]
+        assert len(queue.done) == 5
+        assert not queue.sending
+
+    def test_send_next_batch_logs_each_notification(self, caplog, bulk_backend):
+        queue = LoggingQueue()
+        queue.put(EmailNotification(email_address="hello@example.com", template_id="0000-000a"))
+        queue.put(EmailNotification(email_address="test@example.com", template_id="0000-000a"))
+
+        queue.send_next_batch(bulk_backend.send_batch, 10)
+
+        assert caplog.messages[-2:] == [
+            "queue update: send notification {'email_address': 'hello@example.com', 'template_id': '0000-000a', 'personalisation': None} response {'job_id': 'job-1', 'row_number': 0}",
+            "queue update: send notification {'email_address': 'test@example.com', 'template_id': '0000-000a', 'personalisation': None} response {'job_id': 'job-1', 'row_number': 1}",
+        ]
+
+    def test_send_next_batch_returns_false_if_queue_is_empty(self, bulk_backend):
+        assert LoggingQueue().send_next_batch(bulk_backend.send_batch, 10) is False
+        assert bulk_backend.batches == []
+
+    def test_send_next_batch_raises_error_if_responses_are_missing(self):
+        queue = LoggingQueue()
+        queue.put(EmailNotification(email_address="hello@example.com", template_id="0000-000a"))
+
+        with pytest.raises(RuntimeError):
+            queue.send_next_batch(lambda template_id, notifications: [], 10)
+
+        assert not queue.done
+        assert not queue.sending
+
+    def test_send_next_is_fifo(self, send_notification, notifications_generator):
+        notifications = list(notifications_generator())
+        queue = LoggingQueue()
+        queue.put_from(notifications)
+
+        while queue.send_next(send_notification):
+            pass
+
+        assert [c.args[0] for c in send_notification.call_args_list] == notifications
+
     def test_put_from_generator(self, notifications_generator):
         queue = LoggingQueue()
         queue.put_from(notifications_generator())
@@ -243,6 +878,14 @@ class TestLoggingQueue:
             "queue update: generator is exhausted, read 10 notifications into queue"
         )
 
+    def test_put_from_does_not_count_duplicates(self, caplog, notifications_generator):
+        queue = LoggingQueue()
+        assert queue.put_from([*notifications_generator(), *notifications_generator()]) == 10
+
+        assert caplog.messages[-1] == (
+            "queue update: generator is exhausted, read 10 notifications into queue"
+        )
+
     def test_put_from_logs_roundtrip_with_read_log(
         self, caplog, send_notification, notifications_generator
     ):
@@ -0,0 +1,184 @@
+from unittest import mock
+
+import pytest
+
+from notifications_python_client.errors import APIError, HTTPError
+
+from dmscripts.email_engine.ratelimit import RateLimitedSender, SendStats, TokenBucket
+from dmscripts.email_engine.typing import EmailNotification
+
+
+def api_error(status_code):
+    return HTTPError(response=mock.Mock(status_code=status_code, json=mock.Mock(return_value={})))
+
+
+@pytest.fixture
+def notification():
+    return EmailNotification(email_address="hello@example.com", template_id="0000-0000")
+
+
+@pytest.fixture
+def flaky_send_notification():
+    """Fake Notify client that fails with the given errors before succeeding"""
+
+    def factory(*errors):
+        errors = list(errors)
+
+        def send(notification):
+            if errors:
+                raise errors.pop(0)
+            return {"id": "cafe"}
+
+        return mock.Mock(wraps=send)
+
+    return factory
+
+
+class TestTokenBucket:
+    @pytest.fixture
+    def clock(self):
+        clock = mock.Mock(return_value=0.0)
+
+        def sleep(seconds):
+            clock.return_value += seconds
+
+        clock.sleep = sleep
+        return clock
+
+    def test_acquire_does_not_wait_for_burst(self, clock):
+        bucket = TokenBucket(10, burst=5, clock=clock, sleep=clock.sleep)
+
+        assert [bucket.acquire() for _ in range(5)] == [0, 0, 0, 0, 0]
+        assert clock() == 0
+
+    def test_acquire_waits_for_tokens_at_rate(self, clock):
+        bucket = TokenBucket(10, burst=1, clock=clock, sleep=clock.sleep)
+
+        for _ in range(11):
+            bucket.acquire()
+
+        assert clock() == pytest.approx(1.0)
+
+    def test_tokens_refill_up_to_burst(self, clock):
+        bucket = TokenBucket(10, burst=2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+
+        clock.return_value = 60.0
+
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == pytest.approx(0.1)
+
+    def test_rate_must_be_positive(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class TestSendStats:
+    def test_timing(self):
+        clock = mock.Mock(side_effect=[0.0, 1.0, 1.0, 3.0, 3.0, 3.5])
+        stats = SendStats(clock=clock)
+
+        with stats.timing():
+            pass
+        with stats.timing():
+            pass
+        with pytest.raises(RuntimeError):
+            with stats.timing():
+                raise RuntimeError
+
+        assert stats.requests == 3
+        assert stats.errors == 1
+        assert stats.latencies == [1.0, 2.0, 0.5]
+        assert stats.elapsed == 3.5
+        assert stats.throughput == pytest.approx(2 / 3.5)
+        assert stats.percentile(50) == 1.0
+        assert stats.percentile(95) == 2.0
+        assert stats.max_in_flight == 1
+
+    def test_summary(self):
+        stats = SendStats()
+        assert stats.summary() == (
+            "made 0 requests to Notify in 0.0s (0.0/s) with 0 errors and 0 retries;"
+            " response time p50 0.000s p95 0.000s; max 0 requests in flight"
+        )
+
+
+class TestRateLimitedSender:
+    def test_sends_notification(self, notification, flaky_send_notification):
+        send_notification = flaky_send_notification()
+        sender = RateLimitedSender(send_notification)
+
+        assert sender(notification) == {"id": "cafe"}
+        assert send_notification.call_args_list == [mock.call(notification)]
+        assert sender.stats.requests == 1
+
+    @pytest.mark.parametrize("status_code", (429, 500, 503))
+    def test_retries_if_notify_is_rate_limiting_or_has_an_error(
+        self, caplog, notification, flaky_send_notification, status_code
+    ):
+        send_notification = flaky_send_notification(api_error(status_code), api_error(status_code))
+        sleep = mock.Mock()
+        sender = RateLimitedSender(send_notification, sleep=sleep)
+
+        with caplog.at_level(15):
+            assert sender(notification) == {"id": "cafe"}
+
+        assert send_notification.call_count == 3
+        assert sender.stats.requests == 3
+        assert sender.stats.errors == 2
+        assert sender.stats.retries == 2
+        # waits are jittered exponential backoff
+        (first_wait,), (second_wait,) = (c.args for c in sleep.call_args_list)
+        assert 0 <= first_wait <= 1
+        assert 0 <= second_wait <= 2
+
+        retry_messages = [r.message for r in caplog.records if r.levelname == "STATE"]
+        assert len(retry_messages) == 2
+        assert retry_messages[0].startswith(
+            f"rate limiter: retrying notification {notification.sha256_hash}"
+            f" after {status_code} response from Notify (attempt 1 of 6, waiting "
+        )
+
+    def test_gives_up_after_max_tries(self, notification, flaky_send_notification):
+        send_notification = flaky_send_notification(*(api_error(429) for _ in range(3)))
+        sleep = mock.Mock()
+        sender = RateLimitedSender(send_notification, max_tries=3, sleep=sleep)
+
+        with pytest.raises(APIError):
+            sender(notification)
+
+        assert send_notification.call_count == 3
+        assert sleep.call_count == 2
+
+    @pytest.mark.parametrize("status_code", (400, 403))
+    def test_does_not_retry_client_errors(self, notification, flaky_send_notification, status_code):
+        send_notification = flaky_send_notification(api_error(status_code))
+        sleep = mock.Mock()
+        sender = RateLimitedSender(send_notification, sleep=sleep)
+
+        with pytest.raises(APIError):
+            sender(notification)
+
+        assert send_notification.call_count == 1
+        assert sender.stats.retries == 0
+        assert sleep.called is False
+
+    def test_each_attempt_takes_a_token(self, notification, flaky_send_notification):
+        sender = RateLimitedSender(flaky_send_notification(api_error(429)), rate=10, sleep=mock.Mock())
+
+        with mock.patch.object(sender.bucket, "acquire") as acquire:
+            sender(notification)
+
+        assert acquire.call_count == 2
+
+    def test_backoff_is_capped(self, notification, flaky_send_notification):
+        send_notification = flaky_send_notification(*(api_error(503) for _ in range(9)))
+        sleep = mock.Mock()
+        sender = RateLimitedSender(send_notification, max_tries=10, backoff_factor=1, backoff_max=4, sleep=sleep)
+
+        sender(notification)
+
+        assert sleep.call_count == 9
+        assert all(0 <= c.args[0] <= 4 for c in sleep.call_args_list)
@@ -0,0 +1,95 @@
+from unittest import mock
+
+import pytest
+
+from notifications_python_client.errors import APIError
+
+from dmscripts.email_engine.simulate import LatencyProfile, ScaledClock, SimulatedNotify
+from dmscripts.email_engine.typing import EmailNotification
+
+
+@pytest.fixture
+def notification():
+    return EmailNotification(email_address="hello@example.com", template_id="0000-0000")
+
+
+class TestLatencyProfile:
+    @pytest.mark.parametrize(
+        "s, distribution, params",
+        [
+            ("fixed:0.2", "fixed", (0.2,)),
+            ("uniform:0.1,0.5", "uniform", (0.1, 0.5)),
+            ("lognormal:0.2,0.5", "lognormal", (0.2, 0.5)),
+            ("exponential:0.3", "exponential", (0.3,)),
+        ],
+    )
+    def test_parse(self, s, distribution, params):
+        profile = LatencyProfile.parse(s)
+
+        assert profile.distribution == distribution
+        assert profile.params == params
+        assert profile.error_rate == 0
+        assert profile.rate_limited_rate == 0
+
+    def test_parse_error_rates(self):
+        profile = LatencyProfile.parse("fixed:0.2;errors=0.01;rate-limited=0.05")
+
+        assert profile.error_rate == 0.01
+        assert profile.rate_limited_rate == 0.05
+
+    @pytest.mark.parametrize(
+        "s",
+        ["gaussian:0.2", "fixed:0.1,0.2", "uniform:0.1", "fixed:-1", "fixed:0.1;timeouts=0.1", "fixed:0.1;errors=2"],
+    )
+    def test_parse_invalid(self, s):
+        with pytest.raises(ValueError):
+            LatencyProfile.parse(s)
+
+
+class TestSimulatedNotify:
+    def test_sleeps_for_latency(self, notification):
+        sleep = mock.Mock()
+
+        response = SimulatedNotify(LatencyProfile("fixed", 0.2), sleep=sleep)(notification)
+
+        assert sleep.call_args_list == [mock.call(0.2)]
+        assert response["id"].startswith("simulated-")
+
+    def test_latency_follows_distribution(self, notification):
+        sleep = mock.Mock()
+        send = SimulatedNotify(LatencyProfile("uniform", 0.1, 0.5), sleep=sleep, seed=1)
+
+        for _ in range(1000):
+            send(notification)
+
+        latencies = [c.args[0] for c in sleep.call_args_list]
+        assert min(latencies) >= 0.1
+        assert max(latencies) <= 0.5
+        assert sum(latencies) / len(latencies) == pytest.approx(0.3, abs=0.02)
+
+    def test_errors(self, notification):
+        send = SimulatedNotify(
+            LatencyProfile("fixed", 0, error_rate=0.1, rate_limited_rate=0.2), sleep=mock.Mock(), seed=1
+        )
+
+        status_codes = []
+        for _ in range(1000):
+            try:
+                send(notification)
+                status_codes.append(200)
+            except APIError as e:
+                status_codes.append(e.status_code)
+
+        assert status_codes.count(500) == pytest.approx(100, abs=30)
+        assert status_codes.count(429) == pytest.approx(200, abs=40)
+
+
+class TestScaledClock:
+    def test_speedup(self):
+        with mock.patch("dmscripts.email_engine.simulate.time") as time:
+            time.monotonic.return_value = 3.0
+            clock = ScaledClock(100)
+
+            assert clock.clock() == 300.0
+            clock.sleep(10)
+            assert time.sleep.call_args_list == [mock.call(0.1)]
@@ -0,0 +1,244 @@
+from unittest import mock
+import json
+import threading
+
+import pytest
+
+from notifications_python_client.errors import HTTPError
+
+from dmscripts.email_engine.journal import encode_record
+from dmscripts.email_engine.status import StatusCache, fetch_statuses, main, sent_notifications, summarise
+from dmscripts.email_engine.typing import EmailNotification
+
+
+@pytest.fixture
+def notifications():
+    return [
+        EmailNotification(email_address=f"{i}@example.com", template_id=f"0000-000{i % 2}")
+        for i in range(4)
+    ]
+
+
+@pytest.fixture
+def journal(tmp_path, notifications):
+    path = tmp_path / "my-reference.log.jsonl"
+    lines = [encode_record("queued", hash=n.sha256_hash, notification=dict(n)) for n in notifications]
+    lines += [
+        encode_record("sent", hash=n.sha256_hash, response={"id": f"id-{i}"})
+        for i, n in enumerate(notifications[:3])
+    ]
+    lines.append(encode_record("exhausted", count=4))
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.fixture
+def notify_client():
+    statuses = {"id-0": "delivered", "id-1": "permanent-failure", "id-2": "sending"}
+
+    client = mock.Mock()
+    client.get_notification_by_id.side_effect = lambda id: {"id": id, "status": statuses[id]}
+    return client
+
+
+def test_sent_notifications_only_yields_sent(journal, notifications):
+    sent = list(sent_notifications(journal))
+
+    assert [(h, t) for h, t, _ in sent] == [(n.sha256_hash, n["template_id"]) for n in notifications[:3]]
+    assert [r["id"] for _, _, r in sent] == ["id-0", "id-1", "id-2"]
+
+
+def test_fetch_statuses(journal, notify_client, notifications, tmp_path):
+    sent = list(sent_notifications(journal))
+    cache = StatusCache(tmp_path / "cache.json")
+
+    statuses = fetch_statuses(notify_client, sent, reference="my-reference", cache=cache)
+
+    assert statuses == {
+        notifications[0].sha256_hash: "delivered",
+        notifications[1].sha256_hash: "permanent-failure",
+        notifications[2].sha256_hash: "sending",
+    }
+    assert summarise(sent, statuses) == {
+        ("0000-0000", "delivered"): 1,
+        ("0000-0001", "permanent-failure"): 1,
+        ("0000-0000", "sending"): 1,
+    }
+
+
+def test_fetch_statuses_only_caches_final_statuses(journal, notify_client, notifications, tmp_path):
+    sent = list(sent_notifications(journal))
+    cache = StatusCache(tmp_path / "cache.json")
+    fetch_statuses(notify_client, sent, reference="my-reference", cache=cache)
+    cache.save()
+
+    cached = json.loads((tmp_path / "cache.json").read_text())
+    assert cached == {
+        notifications[0].sha256_hash: {"template_id": "0000-0000", "status": "delivered"},
+        notifications[1].sha256_hash: {"template_id": "0000-0001", "status": "permanent-failure"},
+    }
+    assert "example.com" not in (tmp_path / "cache.json").read_text()
+
+    notify_client.reset_mock()
+    statuses = fetch_statuses(
+        notify_client, sent, reference="my-reference", cache=StatusCache(tmp_path / "cache.json")
+    )
+
+    assert notify_client.get_notification_by_id.call_args_list == [mock.call("id-2")]
+    assert len(statuses) == 3
+
+
+def test_fetch_statuses_looks_up_by_reference_without_id(notify_client, notifications, tmp_path):
+    notify_client.get_all_notifications_iterator.side_effect = lambda reference: iter(
+        [{"status": "delivered", "reference": reference}]
+    )
+    sent = [(notifications[0].sha256_hash, "0000-0000", {})]
+
+    statuses = fetch_statuses(notify_client, sent, reference="my-reference", cache=StatusCache(tmp_path / "c.json"))
+
+    assert statuses == {notifications[0].sha256_hash: "delivered"}
+    assert notify_client.get_all_notifications_iterator.call_args_list == [
+        mock.call(reference=f"my-reference-{notifications[0].sha256_hash}")
+    ]
+
+
+def test_fetch_statuses_does_not_look_up_bulk_notifications(notify_client, notifications, tmp_path):
+    sent = [(notifications[0].sha256_hash, "0000-0000", {"job_id": "job-1", "row_number": 0})]
+
+    statuses = fetch_statuses(notify_client, sent, reference="my-reference", cache=StatusCache(tmp_path / "c.json"))
+
+    assert statuses == {notifications[0].sha256_hash: "bulk-unsupported"}
+    assert notify_client.get_all_notifications_iterator.called is False
+    assert notify_client.get_notification_by_id.called is False
+
+
+def test_fetch_statuses_is_concurrent(tmp_path):
+    # each request waits until 20 requests are in flight, so this only
+    # finishes if they are made concurrently
+    barrier = threading.Barrier(20, timeout=10)
+
+    def get_notification_by_id(id):
+        barrier.wait()
+        return {"status": "delivered"}
+
+    notify_client = mock.Mock()
+    notify_client.get_notification_by_id.side_effect = get_notification_by_id
+    sent = [(f"hash-{i}", "0000-0000", {"id": f"id-{i}"}) for i in range(100)]
+
+    statuses = fetch_statuses(
+        notify_client, sent, reference="my-reference", cache=StatusCache(tmp_path / "c.json"), concurrency=20,
+        rate=None,
+    )
+
+    assert statuses == {f"hash-{i}": "delivered" for i in range(100)}
+
+
+def api_error(status_code):
+    return HTTPError(response=mock.Mock(status_code=status_code, json=mock.Mock(return_value={})))
+
+
+def test_fetch_statuses_is_rate_limited(tmp_path):
+    clock = mock.Mock(return_value=0.0)
+
+    def sleep(seconds):
+        clock.return_value += seconds
+
+    notify_client = mock.Mock()
+    notify_client.get_notification_by_id.return_value = {"status": "delivered"}
+    sent = [(f"hash-{i}", "0000-0000", {"id": f"id-{i}"}) for i in range(21)]
+
+    fetch_statuses(
+        notify_client, sent, reference="my-reference", cache=StatusCache(tmp_path / "c.json"), concurrency=1,
+        rate=10, burst=1, clock=clock, sleep=sleep,
+    )
+
+    assert clock() == pytest.approx(2.0)
+
+
+def test_fetch_statuses_retries_if_notify_is_rate_limiting(notify_client, notifications, tmp_path):
+    notify_client.get_notification_by_id.side_effect = [api_error(429), api_error(502), {"status": "delivered"}]
+    sent = [(notifications[0].sha256_hash, "0000-0000", {"id": "id-0"})]
+
+    sleep = mock.Mock()
+
+    statuses = fetch_statuses(
+        notify_client, sent, reference="my-reference", cache=StatusCache(tmp_path / "c.json"), sleep=sleep
+    )
+
+    assert statuses == {notifications[0].sha256_hash: "delivered"}
+    assert notify_client.get_notification_by_id.call_count == 3
+    # waits are jittered exponential backoff
+    (first_wait,), (second_wait,) = (c.args for c in sleep.call_args_list)
+    assert 0 <= first_wait <= 1
+    assert 0 <= second_wait <= 2
+
+
+def test_fetch_statuses_reports_errors_for_each_notification(notify_client, notifications, tmp_path):
+    def get_notification_by_id(id):
+        if id == "id-1":
+            raise api_error(400)
+        if id == "id-2":
+            raise api_error(503)
+        return {"status": "delivered"}
+
+    notify_client.get_notification_by_id.side_effect = get_notification_by_id
+    sent = [(n.sha256_hash, "0000-0000", {"id": f"id-{i}"}) for i, n in enumerate(notifications[:3])]
+    cache = StatusCache(tmp_path / "c.json")
+
+    statuses = fetch_statuses(
+        notify_client, sent, reference="my-reference", cache=cache, max_tries=2, sleep=mock.Mock()
+    )
+
+    assert statuses == {
+        notifications[0].sha256_hash: "delivered",
+        notifications[1].sha256_hash: "error",
+        notifications[2].sha256_hash: "error",
+    }
+    # errors are tried again next time
+    assert notifications[1].sha256_hash not in cache
+    # only the server error is retried
+    assert notify_client.get_notification_by_id.call_count == 1 + 1 + 2
+
+
+def test_main(journal, notify_client, capsys):
+    with mock.patch("dmscripts.email_engine.status.NotificationsAPIClient", return_value=notify_client):
+        main([
+            "status",
+            "--reference=my-reference",
+            f"--logfile={journal.parent / 'my-reference.log'}",
+            "--notify-api-key=key",
+        ])
+
+    assert capsys.readouterr().out.splitlines() == [
+        "template_id,status,count",
+        "0000-0000,delivered,1",
+        "0000-0000,sending,1",
+        "0000-0001,permanent-failure,1",
+    ]
+    assert (journal.parent / "my-reference.log.jsonl.status.json").exists()
+
+
+def test_main_logs_summary(journal, notify_client, capsys):
+    with mock.patch("dmscripts.email_engine.status.NotificationsAPIClient", return_value=notify_client):
+        main([
+            "status",
+            "--reference=my-reference",
+            f"--logfile={journal.parent / 'my-reference.log'}",
+            "--notify-api-key=key",
+        ])
+
+    assert (
+        "3 notifications sent with reference my-reference: 1 delivered, 1 permanent-failure, 1 sending"
+        in capsys.readouterr().err
+    )
+
+
+def test_main_concurrency_must_be_positive(journal):
+    with pytest.raises(SystemExit):
+        main([
+            "status",
+            "--reference=my-reference",
+            f"--logfile={journal.parent / 'my-reference.log'}",
+            "--notify-api-key=key",
+            "--concurrency=0",
+        ])
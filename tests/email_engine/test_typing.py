@@ -1,7 +1,12 @@
+from collections import OrderedDict
 from collections.abc import Hashable
+from unittest import mock
+import time
 
 import pytest
 
+from dmutils.email.helpers import hash_string
+
 from dmscripts.email_engine.typing import EmailNotification
 
 
@@ -51,6 +56,41 @@ class TestEmailNotification:
         with pytest.raises(RuntimeError):
             a["email_address"] = "hello1@example.com"
 
+    @pytest.mark.parametrize("mutate", (
+        lambda d: d.__setitem__("name", "Goodbye"),
+        lambda d: d.update(name="Goodbye"),
+        lambda d: d.pop("name"),
+        lambda d: d.clear(),
+    ))
+    def test_personalisation_is_frozen(self, mutate):
+        a = EmailNotification(
+            email_address="hello@example.com",
+            template_id="0000-0000",
+            personalisation={"name": "Hello"},
+        )
+        representation, notification_hash = repr(a), a.sha256_hash
+
+        with pytest.raises(RuntimeError):
+            mutate(a["personalisation"])
+        with pytest.raises(RuntimeError):
+            mutate(a)
+
+        assert repr(a) == representation
+        assert a.sha256_hash == notification_hash
+
+    def test_personalisation_is_copied(self):
+        personalisation = {"name": "Hello"}
+        a = EmailNotification(
+            email_address="hello@example.com",
+            template_id="0000-0000",
+            personalisation=personalisation,
+        )
+
+        personalisation["name"] = "Goodbye"
+
+        assert a["personalisation"] == {"name": "Hello"}
+        assert a == EmailNotification.from_str(repr(a))
+
     def test_str_notification_can_be_parsed_using_from_str(self):
         a = EmailNotification(
             email_address="hello@example.com",
@@ -78,3 +118,70 @@ class TestEmailNotification:
         )
 
         assert a.sha256_hash == b.sha256_hash
+
+    def test_repr_and_sha256_hash_of_other_mappings_are_unchanged(self):
+        # references of notifications already sent must not change, or resuming
+        # a run would send them again
+        a = EmailNotification(
+            email_address="hello@example.com",
+            template_id="0000-0000",
+            personalisation=OrderedDict([("name", "Hello"), ("lot", "Cloud hosting")]),
+        )
+
+        assert repr(a) == (
+            "{'email_address': 'hello@example.com', 'template_id': '0000-0000',"
+            " 'personalisation': OrderedDict([('name', 'Hello'), ('lot', 'Cloud hosting')])}"
+        )
+        assert a.sha256_hash == "48K20PVzogBx3t41rN9yAkeUzOlDifB3TtbPwormNUs="
+
+    def test_hash_and_repr_do_not_depend_on_argument_order(self):
+        a = EmailNotification(
+            email_address="hello@example.com",
+            template_id="0000-0000",
+            personalisation={"name": "Hello"},
+        )
+        b = EmailNotification(
+            personalisation={"name": "Hello"},
+            template_id="0000-0000",
+            email_address="hello@example.com",
+        )
+
+        assert repr(a) == repr(b) == (
+            "{'email_address': 'hello@example.com', 'template_id': '0000-0000', 'personalisation': {'name': 'Hello'}}"
+        )
+        assert hash(a) == hash(b)
+
+    def test_sha256_hash_is_memoised(self):
+        a = EmailNotification(
+            email_address="hello@example.com",
+            template_id="0000-0000",
+            personalisation={"name": "Hello"},
+        )
+
+        with mock.patch("dmscripts.email_engine.typing.hash_string", wraps=hash_string) as hash_string_mock:
+            for _ in range(3):
+                assert a.sha256_hash == "Zx8N_Nk8MWw6EGGpYcY5JLLc4dwSBvfQDXu3rhYQx2c="
+
+        assert hash_string_mock.call_count == 1
+
+    def test_hash_benchmark(self):
+        # hashing a notification should be much quicker than working out its
+        # representation, which is what we had to do before it was memoised
+        a = EmailNotification(
+            email_address="hello@example.com",
+            template_id="0000-0000",
+            personalisation={"name": "Hello", "body": "lorem ipsum " * 100},
+        )
+
+        start = time.perf_counter()
+        for _ in range(100_000):
+            hash(a)
+            a.sha256_hash
+        memoised = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(100_000):
+            dict.__repr__(a)
+        unmemoised = time.perf_counter() - start
+
+        assert memoised < unmemoised
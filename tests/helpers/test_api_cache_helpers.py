@@ -0,0 +1,143 @@
+import mock
+import pytest
+
+from dmapiclient import DataAPIClient
+
+from dmscripts.helpers.api_cache_helpers import CachingDataAPIClient, ResponseCache, data_api_client
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResponseCache(str(tmp_path / "api.cache"), ttl=60, clock=clock)
+
+
+class TestResponseCache:
+    def test_get_and_set(self, cache):
+        assert cache.get("key") is None
+        cache.set("key", {"suppliers": [1, 2]})
+
+        assert cache.get("key") == {"suppliers": [1, 2]}
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_responses_expire(self, cache, clock):
+        cache.set("key", {"suppliers": []})
+        clock.now += 61
+
+        assert cache.get("key") is None
+
+    def test_cache_is_kept_on_disk(self, cache, tmp_path, clock):
+        cache.set("key", {"suppliers": []})
+
+        assert ResponseCache(str(tmp_path / "api.cache"), clock=clock).get("key") == {"suppliers": []}
+
+    def test_least_recently_used_responses_are_evicted(self, tmp_path, clock):
+        cache = ResponseCache(str(tmp_path / "api.cache"), max_bytes=30, clock=clock)
+        cache.set("a", "x" * 10)
+        clock.now += 1
+        cache.set("b", "x" * 10)
+        clock.now += 1
+        cache.get("a")
+        clock.now += 1
+
+        cache.set("c", "x" * 10)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == cache.get("c") == "x" * 10
+        assert cache.evictions == 1
+
+    def test_clear(self, cache):
+        cache.set("key", {"suppliers": []})
+        cache.clear()
+
+        assert cache.get("key") is None
+
+    def test_log_stats(self, cache):
+        cache.get("key")
+        logger = mock.Mock()
+
+        cache.log_stats(logger)
+
+        assert logger.info.call_args == mock.call(
+            "API cache {}: 0 hits, 1 misses, 0 evicted".format(cache.path)
+        )
+
+
+class TestCachingDataAPIClient:
+    @pytest.fixture
+    def client(self, cache):
+        return CachingDataAPIClient("http://baseurl", "auth-token", cache=cache)
+
+    def test_second_get_is_served_from_cache(self, client, rmock):
+        rmock.get("http://baseurl/suppliers/123", json={"suppliers": {"id": 123}})
+
+        assert client.get_supplier(123) == {"suppliers": {"id": 123}}
+        assert client.get_supplier(123) == {"suppliers": {"id": 123}}
+
+        assert rmock.call_count == 1
+        assert (client.cache.hits, client.cache.misses) == (1, 1)
+
+    def test_params_are_part_of_the_key(self, client, rmock):
+        rmock.get("http://baseurl/draft-services/framework/g-cloud-12?page=1", json={"services": [1]})
+        rmock.get("http://baseurl/draft-services/framework/g-cloud-12?page=2", json={"services": [2]})
+
+        assert list(client.find_draft_services_by_framework("g-cloud-12", page=1)["services"]) == [1]
+        assert list(client.find_draft_services_by_framework("g-cloud-12", page=2)["services"]) == [2]
+
+    def test_second_script_runs_from_cache(self, cache, rmock):
+        rmock.get(
+            "http://baseurl/frameworks/g-cloud-12/suppliers",
+            json={"supplierFrameworks": [{"supplierId": 1}], "links": {"next": "http://baseurl/next-page"}},
+        )
+        rmock.get("http://baseurl/next-page", json={"supplierFrameworks": [{"supplierId": 2}], "links": {}})
+
+        first = CachingDataAPIClient("http://baseurl", "auth-token", cache=cache)
+        second = CachingDataAPIClient("http://baseurl", "auth-token", cache=cache)
+
+        assert len(list(first.find_framework_suppliers_iter("g-cloud-12"))) == 2
+        assert len(list(second.find_framework_suppliers_iter("g-cloud-12"))) == 2
+        assert rmock.call_count == 2
+
+    def test_other_requests_clear_the_cache(self, client, rmock):
+        rmock.get("http://baseurl/suppliers/123", json={"suppliers": {"id": 123}})
+        rmock.post("http://baseurl/suppliers/123", json={"suppliers": {"id": 123}})
+
+        client.get_supplier(123)
+        client._post("/suppliers/123", data={})
+        client.get_supplier(123)
+
+        assert [request.method for request in rmock.request_history] == ["GET", "POST", "GET"]
+
+
+class TestDataAPIClient:
+    @mock.patch("dmscripts.helpers.api_cache_helpers.get_auth_token", return_value="auth-token")
+    def test_caching_is_opt_in(self, get_auth_token):
+        client = data_api_client("dev", environ={})
+
+        assert type(client) is DataAPIClient
+
+    @mock.patch("dmscripts.helpers.api_cache_helpers.atexit")
+    @mock.patch("dmscripts.helpers.api_cache_helpers.get_auth_token", return_value="auth-token")
+    def test_cache_from_environment(self, get_auth_token, atexit, tmp_path):
+        client = data_api_client("dev", environ={
+            "DM_API_CACHE": str(tmp_path / "api.cache"),
+            "DM_API_CACHE_TTL": "600",
+            "DM_API_CACHE_MAX_BYTES": "1000",
+        })
+
+        assert isinstance(client, CachingDataAPIClient)
+        assert client.cache.ttl == 600
+        assert client.cache.max_bytes == 1000
+        assert atexit.register.call_args == mock.call(client.cache.log_stats)
@@ -0,0 +1,75 @@
+from collections import Counter
+
+import mock
+import pytest
+
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate, SupplierDraftServices
+
+
+DRAFTS = [
+    {"id": 1, "supplierId": 100, "lotSlug": "cloud-hosting", "status": "submitted", "copiedFromServiceId": "123"},
+    {"id": 2, "supplierId": 100, "lotSlug": "cloud-hosting", "status": "not-submitted"},
+    {"id": 3, "supplierId": 100, "lotSlug": "cloud-support", "status": "failed", "copiedFromServiceId": None},
+    {"id": 4, "supplierId": 200, "lotSlug": "cloud-software", "status": "submitted"},
+]
+
+
+@pytest.fixture
+def data_api_client():
+    client = mock.Mock()
+    client.find_draft_services_by_framework_iter.side_effect = lambda framework_slug: iter(DRAFTS)
+    return client
+
+
+class TestSupplierDraftServices:
+    def test_summary(self):
+        summary = SupplierDraftServices(DRAFTS[:3])
+
+        assert summary.counts == Counter({
+            ("cloud-hosting", "submitted"): 1,
+            ("cloud-hosting", "not-submitted"): 1,
+            ("cloud-support", "failed"): 1,
+        })
+        assert summary.ids == [1, 2, 3]
+        assert summary.copied_ids == [1]
+
+    def test_count(self):
+        summary = SupplierDraftServices(DRAFTS[:3])
+
+        assert summary.count() == 3
+        assert summary.count(status="submitted") == 1
+        assert summary.count(lot="cloud-hosting") == 2
+        assert summary.count(status="failed", lot="cloud-hosting") == 0
+
+    def test_status_counts(self):
+        assert SupplierDraftServices(DRAFTS[:3]).status_counts() == Counter(
+            {"submitted": 1, "not-submitted": 1, "failed": 1}
+        )
+
+    def test_statuses_by_lot(self):
+        assert SupplierDraftServices(DRAFTS[:3]).statuses_by_lot() == {
+            "cloud-hosting": {"submitted", "not-submitted"},
+            "cloud-support": {"failed"},
+        }
+
+
+class TestDraftServiceAggregate:
+    def test_from_api_lists_the_framework_drafts_once(self, data_api_client):
+        draft_services = DraftServiceAggregate.from_api(data_api_client, "g-cloud-12")
+
+        assert data_api_client.find_draft_services_by_framework_iter.call_args_list == [mock.call("g-cloud-12")]
+        assert draft_services.supplier_ids() == [100, 200]
+        assert draft_services.for_supplier(100).ids == [1, 2, 3]
+        assert draft_services.for_supplier("200").ids == [4]
+
+    def test_from_api_for_some_suppliers(self, data_api_client):
+        draft_services = DraftServiceAggregate.from_api(data_api_client, "g-cloud-12", supplier_ids=[200, 300])
+
+        assert draft_services.supplier_ids() == [200]
+        assert 100 not in draft_services
+
+    def test_suppliers_without_drafts_have_an_empty_summary(self, data_api_client):
+        draft_services = DraftServiceAggregate.from_api(data_api_client, "g-cloud-12")
+
+        assert draft_services.for_supplier(300).count() == 0
+        assert len(draft_services) == 2
@@ -1,4 +1,5 @@
 import pytest
+import time
 from collections import Counter
 from mock import Mock, call
 from dmapiclient import HTTPError
@@ -439,3 +440,171 @@ def test_add_draft_services_filtered_by_status(mock_data_client):
     mock_data_client.find_draft_services.assert_has_calls([
         call(123, framework='framework-slug'),
     ])
+
+
+def test_find_suppliers_with_details_and_draft_service_counts_in_bulk(mock_data_client):
+    mock_data_client.find_framework_suppliers_iter.return_value = [
+        {
+            'supplierId': 4,
+            'declaration': {'status': 'complete'},
+            'frameworkSlug': 'g-things-1',
+            'onFramework': True,
+            'countersignedPath': None,
+            'countersignedAt': None,
+            'agreementId': 31385,
+        },
+        {
+            'supplierId': 2,
+            'declaration': None,
+            'frameworkSlug': 'g-things-1',
+            'onFramework': None,
+            'countersignedPath': 'some/path',
+            'countersignedAt': '2017-01-02T03:04:05.000006Z',
+            'agreementId': None,
+        },
+    ]
+    mock_data_client.find_draft_services_by_framework_iter.return_value = [
+        {'id': 41, 'supplierId': 4, 'status': 'submitted', 'lotSlug': 'saas'},
+        {'id': 42, 'supplierId': 4, 'status': 'submitted', 'lotSlug': 'saas'},
+        {'id': 43, 'supplierId': 4, 'status': 'failed', 'lotSlug': 'iaas'},
+        {'id': 31, 'supplierId': 3, 'status': 'submitted', 'lotSlug': 'iaas'},
+    ]
+    mock_data_client.find_suppliers_iter.return_value = [
+        {'id': 1, 'name': 'supplier 1'}, {'id': 2, 'name': 'supplier 2'}, {'id': 4, 'name': 'supplier 4'},
+    ]
+
+    records = list(
+        framework_helpers.find_suppliers_with_details_and_draft_service_counts_in_bulk(mock_data_client, 'g-things-1')
+    )
+
+    assert mock_data_client.find_framework_suppliers_iter.call_args == call('g-things-1', with_declarations=True)
+    assert mock_data_client.find_draft_services_by_framework_iter.call_args == call('g-things-1')
+    assert mock_data_client.get_supplier.called is False
+    assert records == [
+        {
+            'supplier': {'id': 4, 'name': 'supplier 4'},
+            'supplier_id': 4,
+            'declaration': {'status': 'complete'},
+            'countersignedPath': '',
+            'counts': Counter({('saas', 'submitted'): 2, ('iaas', 'failed'): 1}),
+            'countersignedAt': '',
+            'onFramework': True,
+            'frameworkSlug': 'g-things-1',
+            'agreementId': 31385
+        },
+        {
+            'supplier': {'id': 2, 'name': 'supplier 2'},
+            'supplier_id': 2,
+            'declaration': {},
+            'countersignedPath': 'some/path',
+            'counts': Counter(),
+            'countersignedAt': '2017-01-02T03:04:05.000006Z',
+            'onFramework': None,
+            'frameworkSlug': 'g-things-1',
+            'agreementId': ''
+        },
+    ]
+
+
+def test_find_suppliers_with_details_and_draft_service_counts_in_bulk_filtered_by_ids(mock_data_client):
+    mock_data_client.find_framework_suppliers_iter.return_value = [
+        {'supplierId': supplier_id, 'declaration': {}, 'frameworkSlug': 'g-things-1', 'onFramework': True,
+         'countersignedPath': None, 'countersignedAt': None, 'agreementId': None}
+        for supplier_id in (4, 3, 2)
+    ]
+    mock_data_client.find_draft_services_by_framework_iter.return_value = []
+    # a supplier missing from the listing is fetched on its own
+    mock_data_client.find_suppliers_iter.return_value = [{'id': 4}]
+    mock_data_client.get_supplier.side_effect = lambda id: {'suppliers': {'id': id}}
+
+    records = list(framework_helpers.find_suppliers_with_details_and_draft_service_counts_in_bulk(
+        mock_data_client, 'g-things-1', supplier_ids=[2, 4]
+    ))
+
+    assert [record['supplier'] for record in records] == [{'id': 4}, {'id': 2}]
+    assert mock_data_client.get_supplier.call_args_list == [call(2)]
+
+
+class FakeFrameworkAPI:
+    """Data API client for a framework with `n` interested suppliers that takes `latency` seconds per request"""
+
+    PAGE_SIZE = 100
+
+    def __init__(self, n, latency):
+        self.latency = latency
+        self.calls = 0
+        self.supplier_ids = list(range(1, n + 1))
+
+    def _request(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def _pages(self, items):
+        # an empty result is still one request
+        for i in range(0, max(len(items), 1), self.PAGE_SIZE):
+            self._request()
+            yield from items[i:i + self.PAGE_SIZE]
+
+    def _supplier(self, supplier_id):
+        return {'id': supplier_id, 'name': f'supplier {supplier_id}'}
+
+    def _supplier_framework(self, supplier_id):
+        return {
+            'supplierId': supplier_id, 'declaration': {'status': 'complete'}, 'frameworkSlug': 'g-things-1',
+            'onFramework': supplier_id % 2 == 0, 'countersignedPath': None, 'countersignedAt': None,
+            'agreementId': supplier_id * 10,
+        }
+
+    def _drafts(self, supplier_id):
+        return [
+            {'id': supplier_id * 10 + i, 'supplierId': supplier_id, 'lotSlug': lot, 'status': 'submitted'}
+            for i, lot in enumerate(('saas', 'paas')[:supplier_id % 3])
+        ]
+
+    def get_interested_suppliers(self, framework_slug):
+        self._request()
+        return {'interestedSuppliers': self.supplier_ids}
+
+    def get_supplier(self, supplier_id):
+        self._request()
+        return {'suppliers': self._supplier(supplier_id)}
+
+    def get_supplier_framework_info(self, supplier_id, framework_slug):
+        self._request()
+        return {'frameworkInterest': self._supplier_framework(supplier_id)}
+
+    def find_draft_services_iter(self, supplier_id, framework):
+        return self._pages(self._drafts(supplier_id))
+
+    def find_framework_suppliers_iter(self, framework_slug, with_declarations):
+        return self._pages([self._supplier_framework(supplier_id) for supplier_id in self.supplier_ids])
+
+    def find_draft_services_by_framework_iter(self, framework_slug):
+        return self._pages([draft for supplier_id in self.supplier_ids for draft in self._drafts(supplier_id)])
+
+    def find_suppliers_iter(self):
+        # there are lots of suppliers who didn't apply to the framework
+        return self._pages([self._supplier(supplier_id) for supplier_id in range(1, len(self.supplier_ids) * 3)])
+
+
+def test_find_suppliers_with_details_and_draft_service_counts_in_bulk_makes_fewer_requests():
+    per_supplier_client = FakeFrameworkAPI(200, latency=0.0005)
+    start = time.monotonic()
+    per_supplier = list(
+        framework_helpers.find_suppliers_with_details_and_draft_service_counts(per_supplier_client, 'g-things-1')
+    )
+    per_supplier_time = time.monotonic() - start
+
+    bulk_client = FakeFrameworkAPI(200, latency=0.0005)
+    start = time.monotonic()
+    bulk = list(
+        framework_helpers.find_suppliers_with_details_and_draft_service_counts_in_bulk(bulk_client, 'g-things-1')
+    )
+    bulk_time = time.monotonic() - start
+
+    assert bulk == per_supplier
+    # one request for interested suppliers, then three for each supplier (drafts fit in a page)
+    assert per_supplier_client.calls == 1 + 3 * 200
+    # two pages of supplier frameworks, three of drafts and six of suppliers
+    assert bulk_client.calls == 2 + 3 + 6
+    assert bulk_time < per_supplier_time
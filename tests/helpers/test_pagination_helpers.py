@@ -0,0 +1,104 @@
+from urllib.parse import parse_qs, urlparse
+import re
+import threading
+import time
+
+import pytest
+
+from dmapiclient import DataAPIClient
+
+from dmscripts.helpers.pagination_helpers import prefetch_iter
+
+
+class FakeServicesAPI:
+    """Stand-in for the data API's /services endpoint with a delay for each page"""
+
+    def __init__(self, rmock, *, total, per_page=10, delay=0, last_link=True):
+        self.total = total
+        self.per_page = per_page
+        self.delay = delay
+        self.last_link = last_link
+        self.pages_fetched = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        rmock.get(re.compile(r"http://data-api/services"), json=self.services, complete_qs=False)
+
+    def services(self, request, context):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.in_flight, self.max_in_flight)
+        time.sleep(self.delay)
+
+        page = int(parse_qs(urlparse(request.url).query).get("page", ["1"])[0])
+        last_page = max(1, -(-self.total // self.per_page))
+        start = (page - 1) * self.per_page
+        links = {}
+        if page < last_page:
+            links["next"] = f"http://data-api/services?framework=g-cloud-12&page={page + 1}"
+            if self.last_link:
+                links["last"] = f"http://data-api/services?framework=g-cloud-12&page={last_page}"
+
+        with self._lock:
+            self.in_flight -= 1
+            self.pages_fetched.append(page)
+        return {
+            "services": [{"id": i} for i in range(start, min(start + self.per_page, self.total))],
+            "links": links,
+            "meta": {"total": self.total},
+        }
+
+
+@pytest.fixture
+def client():
+    return DataAPIClient("http://data-api", "token")
+
+
+@pytest.mark.parametrize("total", (0, 5, 10, 95))
+def test_prefetch_iter_yields_the_same_as_iter_method(rmock, client, total):
+    FakeServicesAPI(rmock, total=total)
+
+    assert list(prefetch_iter(client, "find_services", framework="g-cloud-12")) == \
+        list(client.find_services_iter(framework="g-cloud-12"))
+    assert [s["id"] for s in prefetch_iter(client, "find_services", framework="g-cloud-12")] == list(range(total))
+
+
+def test_prefetch_iter_follows_next_links_without_last_link(rmock, client):
+    api = FakeServicesAPI(rmock, total=35, last_link=False)
+
+    assert [s["id"] for s in prefetch_iter(client, "find_services", framework="g-cloud-12")] == list(range(35))
+    assert api.pages_fetched == [1, 2, 3, 4]
+
+
+def test_prefetch_iter_limits_pages_in_flight(rmock, client):
+    api = FakeServicesAPI(rmock, total=200, delay=0.01)
+
+    assert len(list(prefetch_iter(client, "find_services", framework="g-cloud-12", window=3))) == 200
+    assert api.max_in_flight == 3
+    assert sorted(api.pages_fetched) == list(range(1, 21))
+
+
+def test_prefetch_iter_stops_fetching_when_consumer_stops(rmock, client):
+    api = FakeServicesAPI(rmock, total=1000, delay=0.005)
+
+    services = prefetch_iter(client, "find_services", framework="g-cloud-12", window=2)
+    assert [next(services)["id"] for _ in range(25)] == list(range(25))
+    services.close()
+
+    assert len(api.pages_fetched) <= 6
+
+
+def test_prefetch_iter_benchmark(rmock, client):
+    # 20 pages with 20ms latency each
+    FakeServicesAPI(rmock, total=200, delay=0.02)
+
+    start = time.perf_counter()
+    sequential = list(client.find_services_iter(framework="g-cloud-12"))
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prefetched = list(prefetch_iter(client, "find_services", framework="g-cloud-12", window=8))
+    prefetched_time = time.perf_counter() - start
+
+    assert prefetched == sequential
+    assert prefetched_time < sequential_time / 2
@@ -0,0 +1,130 @@
+from functools import partial
+import random
+import threading
+import time
+
+import mock
+import pytest
+
+from dmscripts.helpers.pipeline_helpers import DROP, Pipeline, Stage
+
+
+def slow(func, max_delay=0.002):
+    rng = random.Random(1)
+
+    def inner(record):
+        time.sleep(rng.uniform(0, max_delay))
+        return func(record)
+    return inner
+
+
+class TestPipeline:
+    def test_records_go_through_every_stage_in_order(self):
+        pipeline = Pipeline([
+            Stage(slow(lambda n: n * 2), concurrency=4),
+            Stage(slow(lambda n: n + 1), concurrency=3),
+        ])
+
+        assert list(pipeline.run(range(100))) == [n * 2 + 1 for n in range(100)]
+
+    def test_unordered_output_has_every_record(self):
+        pipeline = Pipeline([Stage(slow(lambda n: n * 2), concurrency=4)], ordered=False)
+
+        assert sorted(pipeline.run(range(100))) == [n * 2 for n in range(100)]
+
+    def test_no_records(self):
+        assert list(Pipeline([Stage(lambda n: n)]).run([])) == []
+
+    def test_filter_stage_drops_records(self):
+        calls = []
+        pipeline = Pipeline([
+            Stage.filter(lambda n: n % 3 == 0),
+            Stage(lambda n: calls.append(n) or n, concurrency=2),
+            Stage(lambda n: DROP if n == 9 else n),
+        ])
+
+        assert list(pipeline.run(range(12))) == [0, 3, 6]
+        # dropped records don't go through later stages
+        assert sorted(calls) == [0, 3, 6, 9]
+
+    def test_stages_run_at_the_same_time(self):
+        pipeline = Pipeline([
+            Stage(slow(lambda n: n, max_delay=0.01), concurrency=5),
+            Stage(slow(lambda n: n, max_delay=0.01), concurrency=5),
+            Stage(slow(lambda n: n, max_delay=0.01), concurrency=5),
+        ])
+        start = time.monotonic()
+
+        assert len(list(pipeline.run(range(50)))) == 50
+
+        # running the stages one record at a time would take about 0.75s
+        assert time.monotonic() - start < 0.4
+
+    def test_buffers_are_bounded(self):
+        fed = []
+
+        def records():
+            for n in range(1000):
+                fed.append(n)
+                yield n
+
+        pipeline = Pipeline([Stage(lambda n: n), Stage(slow(lambda n: n))], buffer_size=5)
+        results = pipeline.run(records())
+        next(results)
+        time.sleep(0.05)
+
+        # buffer_size for each stage and the output, plus a record being fed
+        assert len(fed) <= 5 * 3 + 2
+        results.close()
+
+    def test_exceptions_in_stages_are_raised(self):
+        def fail(n):
+            if n == 50:
+                raise ValueError("oh no")
+            return n
+
+        pipeline = Pipeline([Stage(fail, concurrency=3), Stage(lambda n: n)])
+
+        with pytest.raises(ValueError, match="oh no"):
+            list(pipeline.run(range(1000)))
+
+    def test_exceptions_from_records_are_raised(self):
+        def records():
+            yield 1
+            raise ConnectionError("network blip")
+
+        with pytest.raises(ConnectionError):
+            list(Pipeline([Stage(lambda n: n)]).run(records()))
+
+    def test_stopping_early_stops_the_threads(self):
+        threads = threading.active_count()
+        results = Pipeline([Stage(lambda n: n, concurrency=5)]).run(range(1000))
+
+        assert next(results) == 0
+        results.close()
+
+        assert threading.active_count() == threads
+
+    def test_stats_for_each_stage(self):
+        pipeline = Pipeline([
+            Stage(slow(lambda n: n), concurrency=2, name="first"),
+            Stage.filter(lambda n: n % 2, name="odd"),
+        ], logger=mock.Mock())
+
+        list(pipeline.run(range(10)))
+
+        first, odd = pipeline.stats()
+        assert first["stage"] == "first"
+        assert first["concurrency"] == 2
+        assert first["count"] == 10
+        assert first["busy_seconds"] > 0
+        assert 0 < first["utilisation"] <= 1
+        assert odd["count"] == 10
+        assert odd["dropped"] == 5
+        assert pipeline.logger.info.call_count == 2
+
+    def test_stage_names_default_to_function_names(self):
+        def add_supplier_info(client, record):
+            pass
+
+        assert Stage(partial(add_supplier_info, None)).name == "add_supplier_info"
@@ -6,9 +6,11 @@ from dmscripts.helpers.supplier_data_helpers import (
     country_code_to_name,
     get_supplier_ids_from_args,
     AppliedToFrameworkSupplierContextForNotify,
+    SuccessfulSupplierContextForNotify,
     SupplierFrameworkData, unsuspend_suspended_supplier_services, RegisterKeyNotFound,
 )
 from dmscripts.data_retention_remove_supplier_declarations import SupplierFrameworkDeclarations
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate, SupplierDraftServices
 from tests.assessment_helpers import BaseAssessmentTest
 from mock import mock, call
 import json
@@ -165,11 +167,156 @@ class TestSupplierFrameworkData:
             {"id": 3, "supplier_id": 1},
         ]}
 
+        mock_data_client.find_draft_services_iter.return_value = [
+            {"id": 21, "supplierId": 2, "lotSlug": "cloud-hosting", "status": "submitted"},
+        ]
+
         data.populate_data()
 
-        assert data.data == [{"supplierId": 2, "users": [{"id": 2, "supplier_id": 2}], "draft_services": []}]
+        assert [sf["supplierId"] for sf in data.data] == [2]
+        assert data.data[0]["users"] == [{"id": 2, "supplier_id": 2}]
+        assert data.data[0]["draft_services"].ids == [21]
         assert mock_data_client.find_draft_services_iter.call_args_list == [mock.call(2, framework="g-cloud-11")]
 
+    def test_populate_data_with_draft_service_aggregate(self, mock_data_client):
+        draft_services = DraftServiceAggregate("g-cloud-11")
+        draft_services.add({"id": 21, "supplierId": 2, "lotSlug": "cloud-hosting", "status": "submitted"})
+        data = SupplierFrameworkData(mock_data_client, "g-cloud-11", draft_services=draft_services)
+
+        mock_data_client.find_framework_suppliers_iter.return_value = [
+            {"supplierId": 1},
+            {"supplierId": 2},
+        ]
+        mock_data_client.export_users.return_value = {"users": []}
+
+        data.populate_data()
+
+        assert [sf["draft_services"].ids for sf in data.data] == [[], [21]]
+        assert mock_data_client.find_draft_services_iter.called is False
+
+    def test_iter_data_yields_supplier_frameworks_as_they_are_fetched(self, mock_data_client):
+        data = SupplierFrameworkData(mock_data_client, "g-cloud-11", supplier_ids=[2, 3])
+
+        supplier_frameworks = iter([{"supplierId": 1}, {"supplierId": 2}, {"supplierId": 3}])
+        mock_data_client.find_framework_suppliers_iter.return_value = supplier_frameworks
+        mock_data_client.export_users.return_value = {"users": [{"id": 2, "supplier_id": 2}]}
+
+        records = data.iter_data()
+        assert next(records)["users"] == [{"id": 2, "supplier_id": 2}]
+        # the next supplier framework hasn't been fetched yet
+        assert next(supplier_frameworks) == {"supplierId": 3}
+        assert list(records) == []
+        assert data.data is None
+
+
+class TestSuccessfulSupplierContextForNotify:
+    def test_get_lot_dict_from_draft_service_summary(self, mock_data_client):
+        mock_data_client.get_framework.return_value = {"frameworks": {"lots": [
+            {"slug": "cloud-hosting", "name": "Cloud hosting"},
+            {"slug": "cloud-software", "name": "Cloud software"},
+            {"slug": "cloud-support", "name": "Cloud support"},
+        ]}}
+        draft_services = DraftServiceAggregate("g-cloud-11")
+        for i, (lot, status) in enumerate((
+            ("cloud-support", "failed"),
+            ("cloud-hosting", "not-submitted"),
+            ("cloud-hosting", "submitted"),
+        )):
+            draft_services.add({"id": i, "supplierId": 1, "lotSlug": lot, "status": status})
+        data = SuccessfulSupplierContextForNotify(mock_data_client, "g-cloud-11", draft_services=draft_services)
+
+        lot_dict = data.get_lot_dict({"draft_services": draft_services.for_supplier(1)})
+
+        assert list(lot_dict.items()) == [
+            ("Cloud hosting", "Successful"),
+            ("Cloud software", "No application"),
+            ("Cloud support", "Unsuccessful"),
+        ]
+
+    def test_get_lot_dict_ignores_lots_not_on_the_framework(self, mock_data_client):
+        mock_data_client.get_framework.return_value = {"frameworks": {"lots": [
+            {"slug": "cloud-hosting", "name": "Cloud hosting"},
+            {"slug": "cloud-software", "name": "Cloud software"},
+        ]}}
+        logger = mock.Mock()
+        data = SuccessfulSupplierContextForNotify(mock_data_client, "g-cloud-11", logger=logger)
+
+        lot_dict = data.get_lot_dict({"supplierId": 1, "draft_services": SupplierDraftServices([
+            {"id": 1, "supplierId": 1, "lotSlug": "cloud-hosting", "status": "submitted"},
+            {"id": 2, "supplierId": 1, "lotSlug": "old-lot", "status": "submitted"},
+        ])})
+
+        assert list(lot_dict.items()) == [("Cloud hosting", "Successful"), ("Cloud software", "No application")]
+        assert logger.warning.call_count == 1
+
+    def test_get_lot_dict_without_submitted_services_is_empty(self, mock_data_client):
+        data = SuccessfulSupplierContextForNotify(mock_data_client, "g-cloud-11")
+
+        assert data.get_lot_dict({"draft_services": SupplierDraftServices([
+            {"id": 1, "supplierId": 1, "lotSlug": "test_lot_slug_1", "status": "failed"},
+        ])}) == {}
+
+    def test_iter_users_personalisations_without_populating_data(self, mock_data_client):
+        draft_services = DraftServiceAggregate("g-cloud-11")
+        draft_services.add({"id": 1, "supplierId": 1, "lotSlug": "test_lot_slug_1", "status": "submitted"})
+        mock_data_client.find_framework_suppliers_iter.return_value = iter([
+            {
+                "supplierId": 1, "supplierName": "One", "onFramework": True,
+                "declaration": {"primaryContactEmail": "primary@1"},
+            },
+            {"supplierId": 2, "supplierName": "Two", "onFramework": False},
+        ])
+        mock_data_client.export_users.return_value = {"users": [
+            {"supplier_id": 1, "email address": "user@1"},
+            {"supplier_id": 1, "email address": "primary@1"},
+            {"supplier_id": 2, "email address": "user@2"},
+        ]}
+        data = SuccessfulSupplierContextForNotify(mock_data_client, "g-cloud-11", draft_services=draft_services)
+
+        personalisations = list(data.iter_users_personalisations())
+
+        assert [email_address for email_address, _ in personalisations] == ["user@1", "primary@1"]
+        assert personalisations[0][1]["company_name"] == "One"
+        assert data.data is None
+
+    def test_iter_users_personalisations_only_yields_each_email_address_once(self, mock_data_client):
+        draft_services = DraftServiceAggregate("g-cloud-11")
+        for supplier_id in (1, 2):
+            draft_services.add(
+                {"id": supplier_id, "supplierId": supplier_id, "lotSlug": "test_lot_slug_1", "status": "submitted"}
+            )
+        mock_data_client.find_framework_suppliers_iter.return_value = iter([
+            {
+                "supplierId": 1, "supplierName": "One", "onFramework": True,
+                "declaration": {"primaryContactEmail": "x@example.com"},
+            },
+            {"supplierId": 2, "supplierName": "Two", "onFramework": True},
+        ])
+        mock_data_client.export_users.return_value = {"users": [
+            {"supplier_id": 2, "email address": "x@example.com"},
+            {"supplier_id": 2, "email address": "b@example.com"},
+        ]}
+        data = SuccessfulSupplierContextForNotify(mock_data_client, "g-cloud-11", draft_services=draft_services)
+
+        assert [email_address for email_address, _ in data.iter_users_personalisations()] == [
+            "x@example.com", "b@example.com",
+        ]
+
+    def test_iter_notifications(self, mock_data_client):
+        mock_data_client.find_framework_suppliers_iter.return_value = iter([
+            {"supplierId": 1, "supplierName": "One", "onFramework": True},
+        ])
+        mock_data_client.export_users.return_value = {"users": [{"supplier_id": 1, "email address": "user@1"}]}
+        mock_data_client.find_draft_services_iter.return_value = [
+            {"id": 1, "supplierId": 1, "lotSlug": "test_lot_slug_1", "status": "submitted"},
+        ]
+        data = SuccessfulSupplierContextForNotify(mock_data_client, "g-cloud-11")
+
+        notifications = list(data.iter_notifications("template-id", {"extra": "context"}))
+
+        assert [(n["email_address"], n["template_id"]) for n in notifications] == [("user@1", "template-id")]
+        assert notifications[0]["personalisation"]["extra"] == "context"
+
 
 class TestAppliedToFrameworkSupplierContextForNotify:
     def test_get_suppliers_with_users_personalisations_groups_users_by_supplier_id(
@@ -199,6 +346,15 @@ class TestAppliedToFrameworkSupplierContextForNotify:
 
         assert all("applied" in p for p in data.get_users_personalisations().values())
 
+    def test_iter_notifications_uses_template_for_whether_supplier_applied(self, mock_data_client):
+        data = AppliedToFrameworkSupplierContextForNotify(
+            mock_data_client, "g-cloud-11", supplier_ids=[12345, 23456],
+        )
+
+        assert [
+            (n["email_address"], n["template_id"]) for n in data.iter_notifications("made", "not-made")
+        ] == [("1@12345", "made"), ("1@23456", "not-made")]
+
 
 class TestCountryCodeToName:
     GB_COUNTRY_JSON = {
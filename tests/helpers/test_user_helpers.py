@@ -0,0 +1,65 @@
+import mock
+import pytest
+
+from dmscripts.helpers.user_helpers import SupplierUserIndex
+
+
+def user(id, supplier_id, active=True):
+    return {
+        "id": id,
+        "emailAddress": f"user{id}@example.com",
+        "active": active,
+        "role": "supplier",
+        "supplier": {"supplierId": supplier_id, "name": f"Supplier {supplier_id}"},
+    }
+
+
+USERS = [user(1, 100), user(2, 100, active=False), user(3, 200), user(4, 100)]
+
+
+@pytest.fixture
+def data_api_client():
+    client = mock.Mock()
+    client.find_users_iter.side_effect = lambda supplier_id=None, role=None: iter(
+        u for u in USERS if supplier_id in (None, u["supplier"]["supplierId"])
+    )
+    return client
+
+
+class TestSupplierUserIndex:
+    def test_lists_all_supplier_users_once(self, data_api_client):
+        supplier_users = SupplierUserIndex(data_api_client)
+
+        assert supplier_users.email_addresses(100) == ["user1@example.com", "user4@example.com"]
+        assert supplier_users.email_addresses("200") == ["user3@example.com"]
+        assert supplier_users.email_addresses(300) == []
+        assert data_api_client.find_users_iter.call_args_list == [mock.call(role="supplier")]
+
+    def test_inactive_users(self, data_api_client):
+        supplier_users = SupplierUserIndex(data_api_client)
+
+        assert [u["id"] for u in supplier_users.users(100)] == [1, 4]
+        assert [u["id"] for u in supplier_users.users(100, active=False)] == [1, 2, 4]
+
+    def test_users_are_not_listed_until_needed(self, data_api_client):
+        SupplierUserIndex(data_api_client)
+
+        assert data_api_client.find_users_iter.called is False
+
+    def test_finds_users_for_each_supplier_if_there_are_only_a_few(self, data_api_client):
+        supplier_users = SupplierUserIndex(data_api_client, supplier_ids=[100, 200])
+
+        assert supplier_users.email_addresses(100) == ["user1@example.com", "user4@example.com"]
+        assert supplier_users.email_addresses(100) == ["user1@example.com", "user4@example.com"]
+        assert supplier_users.email_addresses(200) == ["user3@example.com"]
+        assert data_api_client.find_users_iter.call_args_list == [
+            mock.call(supplier_id=100), mock.call(supplier_id=200),
+        ]
+
+    def test_lists_all_supplier_users_for_lots_of_suppliers(self, data_api_client):
+        supplier_users = SupplierUserIndex(data_api_client, supplier_ids=[100, 200], threshold=2)
+
+        supplier_users.email_addresses(100)
+        supplier_users.email_addresses(200)
+
+        assert data_api_client.find_users_iter.call_args_list == [mock.call(role="supplier")]
@@ -119,7 +119,7 @@ class TestGetBriefData:
 
     def test_get_brief_data(self):
         client = mock.Mock(spec=DataAPIClient)
-        client.find_briefs_iter.return_value = [example_brief]
+        client.find_briefs.return_value = {"briefs": [example_brief], "links": {}}
         client.find_brief_responses_iter.return_value = [
             example_winning_brief_response,
             BriefResponseStub().response()
@@ -163,7 +163,7 @@ class TestGetBriefData:
             ))
         ]
 
-        assert client.find_briefs_iter.call_args_list == [
+        assert client.find_briefs.call_args_list == [
             mock.call(status="closed,awarded,unsuccessful,cancelled", with_users=True,
                       with_clarification_questions=True)
         ]
@@ -177,7 +177,7 @@ class TestGetBriefData:
 
     def test_get_brief_data_with_buyer_user_details(self):
         client = mock.Mock(spec=DataAPIClient)
-        client.find_briefs_iter.return_value = [example_brief]
+        client.find_briefs.return_value = {"briefs": [example_brief], "links": {}}
         client.find_brief_responses_iter.return_value = [
             example_winning_brief_response,
             BriefResponseStub().response()
@@ -242,7 +242,7 @@ class TestExportDOSOpportunities:
             ]
         }
 
-        data_api_client.find_briefs_iter.return_value = [example_brief]
+        data_api_client.find_briefs.return_value = {"briefs": [example_brief], "links": {}}
         data_api_client.find_brief_responses_iter.return_value = [
             example_winning_brief_response,
             BriefResponseStub().response()
@@ -87,12 +87,12 @@ def test_get_csv_rows_returns_headers_and_rows():
 
 @mock.patch('dmscripts.export_framework_applicant_details.write_csv')
 @mock.patch('dmscripts.export_framework_applicant_details.get_csv_rows')
-@mock.patch('dmscripts.export_framework_applicant_details.find_suppliers_with_details_and_draft_service_counts')
+@mock.patch('dmscripts.export_framework_applicant_details.find_suppliers_with_details_and_draft_service_counts_in_bulk')
 def test_export_supplier_details_calls_helper_functions(find_suppliers, get_csv_rows, write_csv):
     data_api_client = mock.Mock()
     get_csv_rows.return_value = ['header1', 'header2'], 'rows_iter'
     export_supplier_details(data_api_client, 'g-things-23', "filename.csv", "lot-1,lot-2")
 
-    find_suppliers.assert_called_once_with(data_api_client, 'g-things-23', map_impl=mock.ANY)
+    find_suppliers.assert_called_once_with(data_api_client, 'g-things-23')
     get_csv_rows.assert_called_once_with(find_suppliers.return_value, 'g-things-23', "lot-1,lot-2", logger=None)
     write_csv.assert_called_once_with(['header1', 'header2'], 'rows_iter', "filename.csv")
@@ -4,9 +4,11 @@ from collections import OrderedDict
 import json
 import mock
 import os
+import pytest
 from six.moves import cStringIO
 
 from dmscripts.export_framework_applications_at_close import GenerateFrameworkApplicationsCSV
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 
 
 FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -87,7 +89,8 @@ def test_one_supplier_one_lot(mock_data_client):
         assert f.getvalue() == expected_file.read()
 
 
-def test_many_suppliers_many_lots(mock_data_client):
+@pytest.mark.parametrize('with_draft_service_aggregate', (False, True))
+def test_many_suppliers_many_lots(mock_data_client, with_draft_service_aggregate):
     """Full test for creating the csv using realistic data."""
     lot_dicts = [
         {'slug': 'saas', 'lotSlug': 'saas', 'extraneous_field': 'foo'},
@@ -167,7 +170,17 @@ def test_many_suppliers_many_lots(mock_data_client):
             assert False, "The csv creator received an invalid supplier id."
     mock_data_client.find_draft_services_iter.side_effect = service_api_side_effect
 
-    csv_builder = GenerateFrameworkApplicationsCSV(client=mock_data_client, target_framework_slug='test_framework_slug')
+    draft_services = None
+    if with_draft_service_aggregate:
+        draft_services = DraftServiceAggregate('test_framework_slug')
+        for sf in mock_data_client.find_framework_suppliers.return_value['supplierFrameworks']:
+            for i, draft in enumerate(service_api_side_effect(sf['supplierId'])):
+                draft_services.add(dict(draft, id=i, supplierId=sf['supplierId']))
+        mock_data_client.find_draft_services_iter.side_effect = AssertionError("shouldn't find draft services")
+
+    csv_builder = GenerateFrameworkApplicationsCSV(
+        client=mock_data_client, target_framework_slug='test_framework_slug', draft_services=draft_services
+    )
     f = cStringIO()
     csv_builder.populate_output()
     csv_builder.write_csv(outfile=f)
@@ -0,0 +1,187 @@
+import mock
+import pytest
+
+from dmapiclient import HTTPError
+
+from dmscripts.framework_snapshot import SnapshotDataAPIClient, take_snapshot
+from dmscripts.generate_supplier_user_csv import generate_supplier_csv, generate_user_csv
+from dmscripts.helpers.framework_helpers import (
+    find_suppliers_with_details_and_draft_service_counts,
+    find_suppliers_with_details_and_draft_service_counts_in_bulk,
+    find_suppliers_with_details_and_draft_services,
+)
+
+
+SUPPLIER_FRAMEWORKS = [
+    {
+        "supplierId": 1,
+        "frameworkSlug": "g-cloud-12",
+        "onFramework": True,
+        "declaration": {"status": "complete", "primaryContact": "Alice"},
+        "agreementId": 11,
+        "agreementReturned": True,
+        "agreementStatus": "signed",
+        "countersignedPath": "g-cloud-12/agreements/1/1-countersigned.pdf",
+        "countersignedAt": "2020-09-01T00:00:00.000000Z",
+    },
+    {
+        "supplierId": 2,
+        "frameworkSlug": "g-cloud-12",
+        "onFramework": False,
+        "declaration": {"status": "started"},
+        "agreementId": None,
+        "agreementReturned": False,
+        "agreementStatus": None,
+        "countersignedPath": None,
+        "countersignedAt": None,
+    },
+]
+
+DRAFT_SERVICES = [
+    {"id": 101, "supplierId": 1, "lotSlug": "cloud-hosting", "status": "submitted", "frameworkSlug": "g-cloud-12"},
+    {"id": 102, "supplierId": 1, "lotSlug": "cloud-support", "status": "not-submitted", "frameworkSlug": "g-cloud-12"},
+    {"id": 103, "supplierId": 2, "lotSlug": "cloud-hosting", "status": "submitted", "frameworkSlug": "g-cloud-12"},
+]
+
+SERVICES = [
+    {"id": "1001", "supplierId": 1, "lot": "cloud-hosting", "status": "published", "frameworkSlug": "g-cloud-12"},
+]
+
+SUPPLIERS = [
+    {"id": 1, "name": "Supplier 1"},
+    {"id": 2, "name": "Supplier 2"},
+    {"id": 3, "name": "Supplier on another framework"},
+]
+
+USERS = [
+    {
+        "email address": "alice@example.com",
+        "user_name": "Alice",
+        "supplier_id": 1,
+        "declaration_status": "complete",
+        "application_status": "application",
+        "application_result": "pass",
+        "framework_agreement": True,
+        "variations_agreed": "",
+        "published_service_count": 1,
+        "user_research_opted_in": True,
+    },
+]
+
+
+@pytest.fixture
+def api_client():
+    client = mock.Mock()
+    client.get_framework.return_value = {
+        "frameworks": {"slug": "g-cloud-12", "lots": [{"slug": "cloud-hosting"}, {"slug": "cloud-support"}]}
+    }
+    client.find_framework_suppliers_iter.side_effect = lambda *args, **kwargs: iter(SUPPLIER_FRAMEWORKS)
+    client.find_suppliers_iter.side_effect = lambda *args, **kwargs: iter(SUPPLIERS)
+    client.find_draft_services_by_framework_iter.side_effect = lambda *args, **kwargs: iter(DRAFT_SERVICES)
+    client.find_services_iter.side_effect = lambda *args, **kwargs: iter(SERVICES)
+    client.get_framework_agreement.side_effect = lambda id: {"agreement": {"id": id, "supplierId": 1}}
+    client.export_users.return_value = {"users": USERS}
+    client.export_suppliers.side_effect = HTTPError(mock.Mock(status_code=400), "Framework not open")
+    return client
+
+
+@pytest.fixture
+def snapshot(api_client, tmp_path):
+    path = str(tmp_path / "g-cloud-12.snapshot")
+    take_snapshot(api_client, "g-cloud-12", path, logger=mock.Mock())
+    return SnapshotDataAPIClient(path)
+
+
+class TestTakeSnapshot:
+    def test_each_listing_is_fetched_once(self, api_client, snapshot):
+        assert api_client.find_framework_suppliers_iter.call_args_list == [
+            mock.call("g-cloud-12", with_declarations=True)
+        ]
+        assert api_client.find_draft_services_by_framework_iter.call_count == 1
+        assert api_client.find_suppliers_iter.call_count == 1
+        assert api_client.find_services_iter.call_args_list == [mock.call(framework="g-cloud-12")]
+        assert api_client.get_framework_agreement.call_args_list == [mock.call(11)]
+
+    def test_only_keeps_suppliers_that_applied(self, snapshot):
+        assert [supplier["id"] for supplier in snapshot.find_suppliers_iter()] == [1, 2]
+
+    def test_no_snapshot_is_left_if_the_crawl_fails(self, api_client, tmp_path):
+        api_client.find_services_iter.side_effect = ConnectionError()
+
+        with pytest.raises(ConnectionError):
+            take_snapshot(api_client, "g-cloud-12", str(tmp_path / "snapshot"), logger=mock.Mock())
+
+        assert list(tmp_path.iterdir()) == [tmp_path / "snapshot.tmp"]
+
+
+class TestSnapshotDataAPIClient:
+    def test_get_framework(self, snapshot):
+        assert snapshot.get_framework("g-cloud-12")["frameworks"]["slug"] == "g-cloud-12"
+
+    def test_other_frameworks_are_not_in_the_snapshot(self, snapshot):
+        with pytest.raises(ValueError):
+            snapshot.get_framework("g-cloud-11")
+
+    def test_find_framework_suppliers(self, snapshot):
+        assert snapshot.find_framework_suppliers("g-cloud-12")["supplierFrameworks"] == SUPPLIER_FRAMEWORKS
+        assert [
+            sf["supplierId"] for sf in snapshot.find_framework_suppliers_iter("g-cloud-12", agreement_returned=False)
+        ] == [2]
+        assert [
+            sf["supplierId"] for sf in snapshot.find_framework_suppliers_iter("g-cloud-12", statuses="signed,approved")
+        ] == [1]
+        assert all(
+            "declaration" not in sf
+            for sf in snapshot.find_framework_suppliers_iter("g-cloud-12", with_declarations=False)
+        )
+
+    def test_get_supplier_framework_info(self, snapshot):
+        assert snapshot.get_supplier_framework_info(2, "g-cloud-12") == {"frameworkInterest": SUPPLIER_FRAMEWORKS[1]}
+
+    def test_missing_records_are_not_found(self, snapshot):
+        with pytest.raises(HTTPError) as e:
+            snapshot.get_supplier(3)
+
+        assert e.value.status_code == 404
+
+    def test_draft_services(self, snapshot):
+        assert [ds["id"] for ds in snapshot.find_draft_services(1, framework="g-cloud-12")["services"]] == [101, 102]
+        assert [
+            ds["id"] for ds in snapshot.find_draft_services_by_framework_iter("g-cloud-12", status="submitted")
+        ] == [101, 103]
+
+    def test_services(self, snapshot):
+        assert list(snapshot.find_services_iter(framework="g-cloud-12", status="published")) == SERVICES
+        assert list(snapshot.find_services_iter(supplier_id=2)) == []
+
+    def test_get_framework_agreement(self, snapshot):
+        assert snapshot.get_framework_agreement(11) == {"agreement": {"id": 11, "supplierId": 1}}
+
+    def test_has_no_methods_that_write(self, snapshot):
+        with pytest.raises(AttributeError):
+            snapshot.set_framework_result(1, "g-cloud-12", True, "user")
+
+
+class TestExportersRunAgainstSnapshot:
+    def test_supplier_records_match_the_api(self, api_client, snapshot):
+        from_api = list(find_suppliers_with_details_and_draft_service_counts_in_bulk(api_client, "g-cloud-12"))
+
+        assert list(find_suppliers_with_details_and_draft_service_counts_in_bulk(snapshot, "g-cloud-12")) == from_api
+        assert list(find_suppliers_with_details_and_draft_service_counts(snapshot, "g-cloud-12")) == from_api
+
+    def test_supplier_records_with_draft_services(self, snapshot):
+        records = list(find_suppliers_with_details_and_draft_services(snapshot, "g-cloud-12", statuses="submitted"))
+
+        assert [
+            (record["supplier"]["id"], [service["id"] for service in record["services"]]) for record in records
+        ] == [(1, [101]), (2, [103])]
+
+    def test_generate_user_csv(self, snapshot):
+        headers, rows, _ = generate_user_csv("g-cloud-12", snapshot, user_research_opted_in=True, logger=mock.Mock())
+
+        assert rows == [[USERS[0][heading] for heading in headers]]
+
+    def test_generate_supplier_csv_when_the_export_was_not_available(self, snapshot):
+        headers, rows, _ = generate_supplier_csv("g-cloud-12", snapshot, logger=mock.Mock())
+
+        assert rows == []
@@ -68,6 +68,29 @@ def api(suppliers):
                 ).response()
                 for draft in suppliers[id].get("drafts", [])
             ]
+        api_mock.find_framework_suppliers_iter.side_effect = \
+            lambda slug, with_declarations: [
+                SupplierFrameworkStub(
+                    supplier_id=id,
+                    framework_slug=slug,
+                    on_framework=supplier["onFramework"],
+                    with_declaration=True,
+                    declaration_status="complete",
+                ).response()
+                for id, supplier in suppliers.items()
+            ]
+        api_mock.find_draft_services_by_framework_iter.side_effect = \
+            lambda framework: [
+                DraftServiceStub(
+                    supplier_id=id,
+                    framework_slug=framework,
+                    status=draft["status"],
+                ).response()
+                for id, supplier in suppliers.items()
+                for draft in supplier.get("drafts", [])
+            ]
+        api_mock.find_suppliers_iter.side_effect = \
+            lambda: [SupplierStub(id=id).response() for id in suppliers]
         yield api_mock
 
 
@@ -75,3 +98,11 @@ def test_finds_all_suppliers_on_framework_and_with_at_least_one_completed_draft_
     suppliers = generate_framework_agreement_signature_pages.find_suppliers(api, framework)
     suppliers = list(suppliers)
     assert len(suppliers) == 1
+    assert api.get_supplier.called is False
+
+
+def test_finds_given_suppliers_one_at_a_time(api, framework):
+    suppliers = generate_framework_agreement_signature_pages.find_suppliers(api, framework, supplier_ids=[1001, 2003])
+    suppliers = list(suppliers)
+    assert len(suppliers) == 1
+    assert api.find_suppliers_iter.called is False
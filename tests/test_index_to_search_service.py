@@ -1,13 +1,82 @@
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+import json
+import re
+import threading
+import time
+
+from freezegun import freeze_time
 import mock
 import pytest
 
-from dmapiclient import HTTPError
+from dmapiclient import DataAPIClient, HTTPError
 from dmscripts.index_to_search_service import (
-    do_index, BriefIndexer, ServiceIndexer
-
+    build_index, do_index, print_progress, BriefIndexer, Checkpoint, DocumentProjection, HashManifest, IndexPipeline,
+    ServiceIndexer, mapped_fields,
 )
 
 
+def services_page(services):
+    return {"services": list(services), "links": {}}
+
+
+class LocalSearchAPI:
+    """Stand-in for the search API which keeps documents in a dict
+
+    Supports creating indexes, setting aliases, the status endpoint, counting documents with a search, and indexing
+    and deleting single documents. Indexing ids in `failing_ids` fails with a 400 response.
+    """
+
+    def __init__(self, rmock, url="http://search-api-url", failing_ids=()):
+        self.indexes = {}
+        self.aliases = {}
+        self.sent = []
+        self.failing_ids = set(failing_ids)
+        rmock.put(re.compile(re.escape(url) + r"/[^/]+$"), json=self.put, complete_qs=False)
+        rmock.get(url + "/_status", json=self.status, complete_qs=False)
+        rmock.get(re.compile(re.escape(url) + r"/[^/]+/[^/]+/search"), json=self.search, complete_qs=False)
+        document_url = re.compile(re.escape(url) + r"/[^/]+/[^/]+/[^/]+$")
+        rmock.put(document_url, json=self.index_document, complete_qs=False)
+        rmock.delete(document_url, json=self.delete_document, complete_qs=False)
+
+    def put(self, request, context):
+        # request.path is lowercased by requests_mock
+        name = urlparse(request.url).path.split("/")[1]
+        data = request.json()
+        if data["type"] == "index":
+            self.indexes[name] = {}
+        else:
+            self.aliases[name] = data["target"]
+        return {"message": "acknowledged"}
+
+    def status(self, request, context):
+        return {"es_status": {
+            index: {"aliases": [alias for alias, target in self.aliases.items() if target == index]}
+            for index in self.indexes
+        }}
+
+    def search(self, request, context):
+        index_name = urlparse(request.url).path.split("/")[1]
+        return {"meta": {"total": len(self.indexes[index_name])}, "documents": []}
+
+    def index_document(self, request, context):
+        index_name, _, item_id = urlparse(request.url).path.split("/")[1:]
+        self.sent.append({"action": "index", "id": item_id, "document": request.json()["document"]})
+        if item_id in self.failing_ids:
+            context.status_code = 400
+            return {"error": "mapper_parsing_exception"}
+        self.indexes.setdefault(index_name, {})[item_id] = request.json()["document"]
+        return {"message": "acknowledged"}
+
+    def delete_document(self, request, context):
+        index_name, _, item_id = urlparse(request.url).path.split("/")[1:]
+        self.sent.append({"action": "delete", "id": item_id})
+        if self.indexes.setdefault(index_name, {}).pop(item_id, None) is None:
+            context.status_code = 404
+            return {"error": "not_found"}
+        return {"message": "acknowledged"}
+
+
 class TestIndexers:
 
     def setup(self):
@@ -70,12 +139,12 @@ class TestIndexers:
         ]
 
     def test_service_indexer_request_items_calls_data_api_client_with_frameworks(self):
-        self.data_api_client.return_value.find_services_iter.return_value = iter(('service1', 'service2',))
+        self.data_api_client.return_value.find_services.return_value = services_page(('service1', 'service2',))
         indexer = ServiceIndexer(
             'services', self.data_api_client.return_value, self.search_api_client.return_value, 'myIndex'
         )
         assert tuple(indexer.request_items('framework1,framework2')) == ('service1', 'service2',)
-        assert self.data_api_client.return_value.find_services_iter.call_args_list == [
+        assert self.data_api_client.return_value.find_services.call_args_list == [
             mock.call(framework='framework1,framework2')
         ]
 
@@ -237,3 +306,601 @@ class TestIndexers:
         assert str(e.value) == "Incorrect mapping 'services' for the supplied framework(s): g-cloud-10"
 
         assert create_index.call_args_list == []
+
+
+class TestIndexPipeline:
+    class SlowIndexer:
+        def __init__(self, pipeline_ref, delay=0.001):
+            self.pipeline_ref = pipeline_ref
+            self.delay = delay
+            self.indexed = []
+            self.max_ahead = 0
+            self.lock = threading.Lock()
+
+        def __call__(self, item):
+            time.sleep(self.delay)
+            with self.lock:
+                self.indexed.append(item)
+                pipeline = self.pipeline_ref[0]
+                self.max_ahead = max(self.max_ahead, pipeline.fetched - len(self.indexed))
+            return item != "bad"
+
+    def make_pipeline(self, sources, **kwargs):
+        ref = []
+        indexer = self.SlowIndexer(ref)
+        pipeline = IndexPipeline(indexer, sources, **kwargs)
+        ref.append(pipeline)
+        return indexer, pipeline
+
+    def test_indexes_everything_from_every_source(self):
+        indexer, pipeline = self.make_pipeline(
+            [range(0, 100), range(100, 150), range(150, 160)], fetch_workers=2, index_workers=3
+        )
+
+        assert list(pipeline.run()) == [True] * 160
+        assert sorted(indexer.indexed) == list(range(160))
+        assert pipeline.fetched == 160
+
+    def test_status_is_false_for_failed_items(self):
+        indexer, pipeline = self.make_pipeline([["good", "bad", "good"]], index_workers=2)
+
+        assert sorted(pipeline.run()) == [False, True, True]
+
+    def test_fetching_waits_for_indexing(self):
+        indexer, pipeline = self.make_pipeline([range(500)], index_workers=2, queue_size=5)
+
+        assert len(list(pipeline.run())) == 500
+        # items can be waiting in the queue, in the hands of an index worker,
+        # or fetched but waiting to be put in the queue
+        assert indexer.max_ahead <= 5 + 2 + 1
+
+    def test_fetch_errors_are_raised(self):
+        def source():
+            yield from range(10)
+            raise HTTPError("fetch failed")
+
+        indexer, pipeline = self.make_pipeline([source(), range(1000)], fetch_workers=2, queue_size=5)
+
+        with pytest.raises(HTTPError):
+            list(pipeline.run())
+
+    def test_index_errors_are_raised(self):
+        indexer = mock.Mock(side_effect=ValueError("oops"))
+        pipeline = IndexPipeline(indexer, [range(1000)], index_workers=2, queue_size=5)
+
+        with pytest.raises(ValueError):
+            list(pipeline.run())
+
+    def test_indexing_stops_if_the_caller_stops_iterating(self):
+        indexer, pipeline = self.make_pipeline([range(300)], index_workers=3, queue_size=5)
+
+        results = pipeline.run()
+        for _ in range(6):
+            next(results)
+        results.close()
+
+        indexed = len(indexer.indexed)
+        # items can be waiting for a result to be taken, or in the hands of an index worker
+        assert indexed < 300
+        time.sleep(0.05)
+        assert len(indexer.indexed) == indexed
+
+    def test_service_indexer_fetches_each_framework_separately(self):
+        data_api_client = mock.Mock()
+        data_api_client.find_services.return_value = services_page([])
+        indexer = ServiceIndexer("services", data_api_client, mock.Mock(), "myIndex")
+
+        for source in indexer.request_item_sources("g-cloud-11,g-cloud-12"):
+            list(source)
+
+        assert data_api_client.find_services.call_args_list == [
+            mock.call(framework="g-cloud-11"),
+            mock.call(framework="g-cloud-12"),
+        ]
+
+    def test_print_progress_reports_fetch_and_index_rates(self):
+        pipeline = IndexPipeline(mock.Mock(), [])
+        pipeline.fetched = 300
+        pipeline.handoff.put("item")
+
+        with mock.patch("dmscripts.index_to_search_service.logger") as logger:
+            print_progress(100, datetime.utcnow() - timedelta(seconds=10), pipeline)
+
+        assert logger.info.call_args.kwargs["extra"]["counter"] == 100
+        assert logger.info.call_args.kwargs["extra"]["fetched"] == 300
+        assert logger.info.call_args.kwargs["extra"]["queued"] == 1
+        assert logger.info.call_args.kwargs["extra"]["fetch_rps"] == pytest.approx(30, rel=0.1)
+
+
+class TestIncrementalIndexing:
+    @pytest.fixture
+    def data_api_client(self):
+        data_api_client = mock.create_autospec(DataAPIClient)
+        with mock.patch("dmscripts.index_to_search_service.dmapiclient.DataAPIClient", return_value=data_api_client):
+            yield data_api_client
+
+    @pytest.fixture
+    def search_api(self, rmock):
+        return LocalSearchAPI(rmock)
+
+    def do_index(self, state_file, **kwargs):
+        kwargs.setdefault("mapping", False)
+        return do_index(
+            "services",
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            serial=True,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            state_file=str(state_file),
+            **kwargs,
+        )
+
+    def test_first_run_indexes_everything_and_saves_watermark(self, tmp_path, data_api_client, search_api):
+        data_api_client.find_services.return_value = services_page([
+            {"id": "1", "status": "published", "updatedAt": "2020-01-01T00:00:00.000000Z"},
+            {"id": "2", "status": "published", "updatedAt": "2021-01-01T00:00:00.000000Z"},
+        ])
+
+        with freeze_time("2021-06-01 02:00:00"):
+            assert self.do_index(tmp_path / "state.json") is True
+
+        assert sorted(search_api.indexes["myIndex"]) == ["1", "2"]
+        assert json.loads((tmp_path / "state.json").read_text()) == {
+            "services/myIndex/g-cloud-12": "2021-06-01T02:00:00.000000Z",
+        }
+
+    def test_later_runs_only_index_changed_items(self, tmp_path, data_api_client, search_api):
+        (tmp_path / "state.json").write_text(json.dumps({
+            "services/myIndex/g-cloud-12": "2021-06-01T02:00:00.000000Z",
+            "services/otherIndex/g-cloud-12": "2020-01-01T00:00:00.000000Z",
+        }))
+        search_api.indexes["myIndex"] = {"1": {}, "2": {}, "3": {}}
+        data_api_client.find_services.return_value = services_page([
+            {"id": "1", "status": "published", "updatedAt": "2021-01-01T00:00:00.000000Z"},
+            {"id": "2", "status": "published", "updatedAt": "2021-06-01T09:00:00.000000Z"},
+            {"id": "3", "status": "disabled", "updatedAt": "2021-06-01T10:00:00.000000Z"},
+            {"id": "4", "status": "disabled", "updatedAt": "2020-01-01T00:00:00.000000Z"},
+        ])
+
+        with freeze_time("2021-06-02 02:00:00"):
+            assert self.do_index(tmp_path / "state.json") is True
+
+        assert search_api.sent == [
+            {"action": "index", "id": "2", "document": mock.ANY},
+            {"action": "delete", "id": "3"},
+        ]
+        assert sorted(search_api.indexes["myIndex"]) == ["1", "2"]
+        assert json.loads((tmp_path / "state.json").read_text()) == {
+            "services/myIndex/g-cloud-12": "2021-06-02T02:00:00.000000Z",
+            "services/otherIndex/g-cloud-12": "2020-01-01T00:00:00.000000Z",
+        }
+
+    def test_watermark_is_kept_if_anything_fails(self, tmp_path, data_api_client, rmock):
+        LocalSearchAPI(rmock, failing_ids={"2"})
+        (tmp_path / "state.json").write_text(json.dumps({"services/myIndex/g-cloud-12": "2021-06-01T02:00:00.000000Z"}))
+        data_api_client.find_services.return_value = services_page([
+            {"id": "2", "status": "published", "updatedAt": "2021-06-01T09:00:00.000000Z"},
+        ])
+
+        assert self.do_index(tmp_path / "state.json") is False
+
+        assert json.loads((tmp_path / "state.json").read_text()) == {
+            "services/myIndex/g-cloud-12": "2021-06-01T02:00:00.000000Z",
+        }
+
+    @mock.patch.object(ServiceIndexer, "create_index", autospec=True)
+    def test_creating_an_index_indexes_everything(self, create_index, tmp_path, data_api_client, search_api):
+        (tmp_path / "state.json").write_text(json.dumps({"services/myIndex/g-cloud-12": "2021-06-01T02:00:00.000000Z"}))
+        data_api_client.find_services.return_value = services_page([
+            {"id": "1", "status": "published", "updatedAt": "2021-01-01T00:00:00.000000Z"},
+        ])
+
+        assert self.do_index(tmp_path / "state.json", mapping="services-g-cloud-12") is True
+
+        assert sorted(search_api.indexes["myIndex"]) == ["1"]
+
+    def test_briefs_that_closed_since_the_watermark_have_changed(self):
+        indexer = BriefIndexer("briefs", mock.Mock(), mock.Mock(), "myIndex")
+        brief = {
+            "id": 1,
+            "updatedAt": "2021-05-01T00:00:00.000000Z",
+            "publishedAt": "2021-05-01T00:00:00.000000Z",
+            "applicationsClosedAt": "2021-06-01T23:59:59.000000Z",
+        }
+
+        assert indexer.changed_since(brief, "2021-06-01T02:00:00.000000Z")
+        assert not indexer.changed_since(brief, "2021-06-02T02:00:00.000000Z")
+
+
+class TestSkipUnchanged:
+    @pytest.fixture
+    def data_api_client(self):
+        data_api_client = mock.create_autospec(DataAPIClient)
+        data_api_client.find_services.return_value = services_page([
+            {"id": "1", "status": "published", "serviceName": "One"},
+            {"id": "2", "status": "published", "serviceName": "Two"},
+        ])
+        with mock.patch("dmscripts.index_to_search_service.dmapiclient.DataAPIClient", return_value=data_api_client):
+            yield data_api_client
+
+    @pytest.fixture
+    def search_api(self, rmock):
+        return LocalSearchAPI(rmock)
+
+    def do_index(self, manifest_file, **kwargs):
+        kwargs.setdefault("mapping", False)
+        kwargs.setdefault("index", "myIndex")
+        return do_index(
+            "services",
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            serial=True,
+            frameworks="g-cloud-12",
+            manifest_file=str(manifest_file),
+            **kwargs,
+        )
+
+    def test_second_run_skips_unchanged_items(self, tmp_path, data_api_client, search_api, rmock):
+        assert self.do_index(tmp_path / "manifest.json") is True
+        requests_made = rmock.call_count
+
+        with mock.patch("dmscripts.index_to_search_service.logger") as logger:
+            assert self.do_index(tmp_path / "manifest.json") is True
+
+        assert rmock.call_count == requests_made
+        assert mock.call(
+            "Sent {sent} {doc_type} to the search API, skipped {skipped} unchanged",
+            extra={"sent": 0, "skipped": 2, "doc_type": "services"},
+        ) in logger.info.call_args_list
+
+    def test_changed_items_are_sent(self, tmp_path, data_api_client, search_api):
+        assert self.do_index(tmp_path / "manifest.json") is True
+        data_api_client.find_services.return_value = services_page([
+            {"id": "1", "status": "published", "serviceName": "One"},
+            {"id": "2", "status": "published", "serviceName": "Two point oh"},
+            {"id": "3", "status": "disabled", "serviceName": "Three"},
+        ])
+        search_api.sent.clear()
+
+        assert self.do_index(tmp_path / "manifest.json") is True
+
+        assert search_api.sent == [
+            {"action": "index", "id": "2", "document": mock.ANY},
+            {"action": "delete", "id": "3"},
+        ]
+
+    def test_items_that_should_be_removed_from_the_index_have_changed(self, tmp_path, data_api_client, search_api):
+        assert self.do_index(tmp_path / "manifest.json") is True
+        data_api_client.find_services.return_value = services_page([
+            {"id": "1", "status": "disabled", "serviceName": "One"},
+            {"id": "2", "status": "published", "serviceName": "Two"},
+        ])
+
+        assert self.do_index(tmp_path / "manifest.json") is True
+
+        assert sorted(search_api.indexes["myIndex"]) == ["2"]
+
+    def test_force_sends_everything(self, tmp_path, data_api_client, search_api):
+        assert self.do_index(tmp_path / "manifest.json") is True
+        search_api.sent.clear()
+
+        assert self.do_index(tmp_path / "manifest.json", force=True) is True
+
+        assert len(search_api.sent) == 2
+
+    def test_failed_items_are_sent_again(self, tmp_path, data_api_client, rmock):
+        search_api = LocalSearchAPI(rmock, failing_ids={"2"})
+        assert self.do_index(tmp_path / "manifest.json") is False
+        search_api.sent.clear()
+
+        assert self.do_index(tmp_path / "manifest.json") is False
+
+        assert search_api.sent == [{"action": "index", "id": "2", "document": mock.ANY}]
+
+    def test_manifest_for_another_index_is_ignored(self, tmp_path, data_api_client, search_api):
+        assert self.do_index(tmp_path / "manifest.json") is True
+        search_api.sent.clear()
+
+        assert self.do_index(tmp_path / "manifest.json", index="otherIndex") is True
+
+        assert len(search_api.sent) == 2
+        assert json.loads((tmp_path / "manifest.json").read_text())["index"] == "otherIndex"
+
+    def test_content_hash_does_not_depend_on_key_order(self):
+        assert HashManifest.content_hash({"id": "1", "document": {"a": 1, "b": 2}}) == \
+            HashManifest.content_hash({"document": {"b": 2, "a": 1}, "id": "1"})
+
+
+class TestDocumentProjection:
+    MAPPING = {
+        "mappings": {
+            "_meta": {
+                "transformations": [
+                    {"append_conditionally": {
+                        "field": "lot", "any_of": ["cloud-support"], "target_field": "serviceCategories",
+                        "append_value": ["support"],
+                    }},
+                ],
+            },
+            "properties": {
+                "dmtext_serviceName": {"type": "text"},
+                "dmfilter_serviceCategories": {"type": "keyword"},
+                "dmagg_serviceCategories": {"type": "keyword"},
+                "sortonly_id": {"type": "keyword"},
+            },
+        },
+    }
+
+    @pytest.fixture
+    def mapping_file(self, tmp_path):
+        mapping_file = tmp_path / "services-g-cloud-12.json"
+        mapping_file.write_text(json.dumps(self.MAPPING))
+        return mapping_file
+
+    def test_mapped_fields(self):
+        assert mapped_fields(self.MAPPING, "services") == {
+            "id", "serviceName", "serviceCategories", "sortonly_id", "lot", "cloud-support", "support",
+        }
+
+    def test_mapped_fields_under_doc_type(self):
+        mapping = {"mappings": {"services": self.MAPPING["mappings"]}}
+
+        assert mapped_fields(mapping, "services") == mapped_fields(self.MAPPING, "services")
+
+    def test_mapping_file_must_match_frameworks(self, tmp_path):
+        mapping_file = tmp_path / "services-g-cloud-11.json"
+        mapping_file.write_text(json.dumps(self.MAPPING))
+
+        with pytest.raises(ValueError):
+            DocumentProjection.from_mapping_file(str(mapping_file), "services", "g-cloud-12")
+
+    def test_do_index_sends_only_mapped_fields(self, rmock, mapping_file):
+        search_api = LocalSearchAPI(rmock)
+        data_api_client = mock.create_autospec(DataAPIClient)
+        data_api_client.find_services.return_value = services_page([{
+            "id": "1", "status": "published", "serviceName": "One", "lot": "cloud-hosting",
+            "serviceDescription": "A very long description " * 100, "links": {"self": "http://data-api-url"},
+        }])
+
+        with mock.patch("dmscripts.index_to_search_service.dmapiclient.DataAPIClient", return_value=data_api_client):
+            with mock.patch("dmscripts.index_to_search_service.logger") as logger:
+                assert do_index(
+                    "services",
+                    "http://search-api-url", "mySearchAPIToken",
+                    "http://data-api-url", "myDataAPIToken",
+                    mapping=False, serial=True, index="myIndex", frameworks="g-cloud-12",
+                    mapping_file=str(mapping_file),
+                ) is True
+
+        assert [action["document"] for action in search_api.sent] == [
+            {"id": "1", "serviceName": "One", "lot": "cloud-hosting"}
+        ]
+        assert logger.info.call_args_list[-1] == mock.call(
+            "Sent {documents} documents averaging {before:.0f} bytes before and {after:.0f} bytes after "
+            "projecting to mapped fields",
+            extra={"documents": 1, "before": mock.ANY, "after": 52},
+        )
+        assert logger.info.call_args_list[-1][1]["extra"]["before"] > 2500
+
+
+class TestCheckpoints:
+    SERVICES = [{"id": str(i), "status": "published"} for i in range(1, 6)]
+
+    @pytest.fixture
+    def data_api_client(self):
+        data_api_client = mock.create_autospec(DataAPIClient)
+        data_api_client.find_services.return_value = services_page(self.SERVICES)
+        with mock.patch("dmscripts.index_to_search_service.dmapiclient.DataAPIClient", return_value=data_api_client):
+            yield data_api_client
+
+    def do_index(self, checkpoint_file, **kwargs):
+        kwargs.setdefault("mapping", False)
+        return do_index(
+            "services",
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            serial=True,
+            index="myIndex",
+            frameworks="g-cloud-12",
+            checkpoint_file=str(checkpoint_file),
+            **kwargs,
+        )
+
+    def test_checkpoint_is_removed_if_everything_is_indexed(self, tmp_path, rmock, data_api_client):
+        LocalSearchAPI(rmock)
+
+        assert self.do_index(tmp_path / "checkpoint.json") is True
+
+        assert not (tmp_path / "checkpoint.json").exists()
+
+    def test_resume_only_retries_failed_items(self, tmp_path, rmock, data_api_client):
+        search_api = LocalSearchAPI(rmock, failing_ids={"2", "4"})
+        with freeze_time("2021-06-01 02:00:00"):
+            assert self.do_index(tmp_path / "checkpoint.json") is False
+
+        checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+        assert checkpoint == {
+            "key": "services/myIndex/g-cloud-12",
+            "startedAt": "2021-06-01T02:00:00.000000Z",
+            "done": ["1", "3", "5"],
+            "failed": ["2", "4"],
+        }
+
+        search_api.failing_ids = set()
+        search_api.sent.clear()
+        assert self.do_index(tmp_path / "checkpoint.json", resume=True) is True
+
+        assert [action["id"] for action in search_api.sent] == ["2", "4"]
+        assert sorted(search_api.indexes["myIndex"]) == ["1", "2", "3", "4", "5"]
+        assert not (tmp_path / "checkpoint.json").exists()
+
+    def test_interrupted_run_can_be_resumed(self, tmp_path, rmock, data_api_client):
+        search_api = LocalSearchAPI(rmock)
+
+        def interrupted():
+            yield from self.SERVICES[:3]
+            raise ConnectionError("network blip")
+
+        with mock.patch.object(ServiceIndexer, "request_items", return_value=interrupted()):
+            with pytest.raises(ConnectionError):
+                self.do_index(tmp_path / "checkpoint.json")
+
+        assert json.loads((tmp_path / "checkpoint.json").read_text())["done"] == ["1", "2", "3"]
+
+        search_api.sent.clear()
+        assert self.do_index(tmp_path / "checkpoint.json", resume=True) is True
+
+        assert [action["id"] for action in search_api.sent] == ["4", "5"]
+
+    @mock.patch.object(ServiceIndexer, "create_index", autospec=True)
+    def test_resuming_does_not_create_the_index_again(self, create_index, tmp_path, rmock, data_api_client):
+        LocalSearchAPI(rmock, failing_ids={"2"})
+        assert self.do_index(tmp_path / "checkpoint.json", mapping="services-g-cloud-12") is False
+        assert create_index.call_count == 1
+
+        self.do_index(tmp_path / "checkpoint.json", mapping="services-g-cloud-12", resume=True)
+
+        assert create_index.call_count == 1
+
+    def test_resumed_run_saves_watermark_from_when_the_first_run_started(self, tmp_path, rmock, data_api_client):
+        search_api = LocalSearchAPI(rmock, failing_ids={"2"})
+        with freeze_time("2021-06-01 02:00:00"):
+            self.do_index(tmp_path / "checkpoint.json", state_file=str(tmp_path / "state.json"))
+
+        search_api.failing_ids = set()
+        with freeze_time("2021-06-01 03:00:00"):
+            self.do_index(tmp_path / "checkpoint.json", state_file=str(tmp_path / "state.json"), resume=True)
+
+        assert json.loads((tmp_path / "state.json").read_text()) == {
+            "services/myIndex/g-cloud-12": "2021-06-01T02:00:00.000000Z",
+        }
+
+    def test_checkpoint_for_another_run_is_not_resumed(self, tmp_path, rmock, data_api_client):
+        search_api = LocalSearchAPI(rmock)
+        (tmp_path / "checkpoint.json").write_text(json.dumps({
+            "key": "services/otherIndex/g-cloud-12", "startedAt": "2021-06-01T02:00:00.000000Z",
+            "done": ["1", "2", "3", "4", "5"], "failed": [],
+        }))
+
+        assert self.do_index(tmp_path / "checkpoint.json", resume=True) is True
+
+        assert sorted(search_api.indexes["myIndex"]) == ["1", "2", "3", "4", "5"]
+
+    def test_checkpoint_is_saved_periodically(self, tmp_path):
+        checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"), "key", every=2)
+
+        checkpoint.record("1", True)
+        assert not (tmp_path / "checkpoint.json").exists()
+        checkpoint.record("2", False)
+        assert json.loads((tmp_path / "checkpoint.json").read_text())["failed"] == ["2"]
+
+
+class TestBuildIndex:
+    @pytest.fixture
+    def data_api_client(self):
+        services = [{"id": str(i), "status": "published"} for i in range(10)] + [{"id": "10", "status": "disabled"}]
+
+        data_api_client = mock.create_autospec(DataAPIClient)
+        data_api_client.find_services.side_effect = lambda framework, status=None: {
+            "services": [s for s in services if status is None or s["status"] == status],
+            "links": {},
+            "meta": {"total": len([s for s in services if status is None or s["status"] == status])},
+        }
+        with mock.patch("dmscripts.index_to_search_service.dmapiclient.DataAPIClient", return_value=data_api_client):
+            yield data_api_client
+
+    @pytest.fixture
+    def search_api(self, rmock):
+        search_api = LocalSearchAPI(rmock)
+        search_api.indexes["g-cloud-12-2021-05-01-020000"] = {"1": {}}
+        search_api.aliases["g-cloud-12"] = "g-cloud-12-2021-05-01-020000"
+        return search_api
+
+    def build_index(self, **kwargs):
+        return build_index(
+            "services",
+            "http://search-api-url", "mySearchAPIToken",
+            "http://data-api-url", "myDataAPIToken",
+            mapping="services-g-cloud-12",
+            alias="g-cloud-12",
+            frameworks="g-cloud-12",
+            verify_attempts=1,
+            **kwargs,
+        )
+
+    @freeze_time("2021-06-01 02:00:00")
+    def test_build_index_loads_new_index_and_moves_alias(self, data_api_client, search_api):
+        assert self.build_index() == "g-cloud-12-2021-06-01-020000"
+
+        assert sorted(search_api.indexes["g-cloud-12-2021-06-01-020000"]) == sorted(str(i) for i in range(10))
+        assert search_api.aliases == {
+            "g-cloud-12": "g-cloud-12-2021-06-01-020000",
+            "g-cloud-12-old": "g-cloud-12-2021-05-01-020000",
+        }
+
+    @freeze_time("2021-06-01 02:00:00")
+    def test_build_index_logs_timings_for_each_stage(self, data_api_client, search_api):
+        with mock.patch("dmscripts.index_to_search_service.logger") as logger:
+            self.build_index()
+
+        timings = logger.info.call_args_list[-1].kwargs["extra"]["timings"]
+        assert [stage.rsplit(" ", 1)[0] for stage in timings.split(", ")] == [
+            "create g-cloud-12-2021-06-01-020000",
+            "load g-cloud-12-2021-06-01-020000",
+            "verify g-cloud-12-2021-06-01-020000",
+            "move alias g-cloud-12",
+        ]
+
+    def test_build_index_does_not_move_alias_if_items_fail(self, data_api_client, rmock):
+        search_api = LocalSearchAPI(rmock, failing_ids={"3"})
+
+        assert self.build_index() is None
+
+        assert search_api.aliases == {}
+
+    def test_build_index_does_not_move_alias_if_counts_do_not_match(self, data_api_client, search_api):
+        with mock.patch.object(ServiceIndexer, "expected_count", return_value=11):
+            assert self.build_index() is None
+
+        assert search_api.aliases == {"g-cloud-12": "g-cloud-12-2021-05-01-020000"}
+
+    def test_build_index_checks_mapping_matches_frameworks(self, data_api_client, search_api):
+        with pytest.raises(ValueError):
+            build_index(
+                "services",
+                "http://search-api-url", "mySearchAPIToken",
+                "http://data-api-url", "myDataAPIToken",
+                mapping="services",
+                alias="g-cloud-12",
+                frameworks="g-cloud-12",
+            )
+
+        assert search_api.aliases == {"g-cloud-12": "g-cloud-12-2021-05-01-020000"}
+
+    @freeze_time("2021-06-01 02:00:00")
+    @pytest.mark.parametrize("failing_alias", ("g-cloud-12", "g-cloud-12-old"))
+    def test_build_index_leaves_aliases_alone_if_moving_them_fails(self, data_api_client, search_api, rmock,
+                                                                   failing_alias):
+        search_api.indexes["g-cloud-12-2021-04-01-020000"] = {}
+        search_api.aliases["g-cloud-12-old"] = "g-cloud-12-2021-04-01-020000"
+        rmock.put(
+            "http://search-api-url/{}".format(failing_alias), status_code=400, json={"error": "alias failed"}
+        )
+
+        with pytest.raises(HTTPError):
+            self.build_index()
+
+        assert search_api.aliases == {
+            "g-cloud-12": "g-cloud-12-2021-05-01-020000",
+            "g-cloud-12-old": "g-cloud-12-2021-04-01-020000",
+        }
+
+    def test_build_index_does_not_move_alias_if_search_api_status_is_unavailable(self, data_api_client, rmock):
+        search_api = LocalSearchAPI(rmock)
+        rmock.get("http://search-api-url/_status", status_code=400, json={"message": "status failed"})
+
+        with pytest.raises(RuntimeError, match="status failed"):
+            self.build_index()
+
+        assert search_api.aliases == {}
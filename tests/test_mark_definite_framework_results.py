@@ -2,6 +2,7 @@ import pytest
 
 from itertools import product, repeat
 
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 from dmscripts.mark_definite_framework_results import mark_definite_framework_results
 
 from .assessment_helpers import BaseAssessmentTest, BaseAssessmentMismatchedOnFrameworksTestMixin
@@ -56,6 +57,34 @@ class TestNoPrevResults(BaseAssessmentTest):
 
         _assert_set_framework_result_actions(self.mock_data_client, expected_set_framework_actions, dry_run=dry_run)
 
+    def test_with_draft_service_aggregate(self):
+        draft_services = DraftServiceAggregate("h-cloud-99")
+        for drafts in self.mock_draft_services.values():
+            for draft in drafts:
+                draft_services.add(draft)
+
+        mark_definite_framework_results(
+            self.mock_data_client,
+            "Blazes Boylan",
+            "h-cloud-99",
+            self._declaration_definite_pass_schema(),
+            declaration_discretionary_pass_schema=self._declaration_definite_pass_schema()["definitions"]["baseline"],
+            dry_run=False,
+            draft_services=draft_services,
+        )
+
+        expected_set_framework_actions = (
+            (2345, False),
+            (3456, True),
+            (4321, True),
+            (4567, False),
+            (5432, False),
+            (8765, True),
+        )
+
+        _assert_set_framework_result_actions(self.mock_data_client, expected_set_framework_actions)
+        assert self.mock_data_client.find_draft_services_by_framework_iter.called is False
+
     @pytest.mark.parametrize(
         # see above explanation of parameterization
         "reassess_passed_suppliers,reassess_failed_suppliers,dry_run",
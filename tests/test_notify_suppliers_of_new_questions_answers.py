@@ -17,6 +17,7 @@ from dmscripts.notify_suppliers_of_new_questions_answers import (
     send_supplier_emails,
     get_template_personalisation,
 )
+from dmscripts.helpers.user_helpers import SupplierUserIndex
 
 NOTIFY_API_KEY = "1" * 73
 
@@ -185,18 +186,17 @@ def test_invert_a_dictionary_so_supplier_id_is_key_and_brief_id_is_value():
 
 def test_get_supplier_email_addresses_by_supplier_id_filters_out_inactive_users():
     data_api_client = mock.Mock()
-    data_api_client.find_users.return_value = {
-        'users': [
-            {'id': 1, 'emailAddress': 'bananas@example.com', 'active': False},
-            {'id': 2, 'emailAddress': 'mangoes@example.com', 'active': True},
-            {'id': 3, 'emailAddress': 'guava@example.com', 'active': True}
-        ]
-    }
-
-    assert get_supplier_email_addresses_by_supplier_id(data_api_client, 1) == [
+    data_api_client.find_users_iter.return_value = iter([
+        {'id': 1, 'emailAddress': 'bananas@example.com', 'active': False, 'supplier': {'supplierId': 1}},
+        {'id': 2, 'emailAddress': 'mangoes@example.com', 'active': True, 'supplier': {'supplierId': 1}},
+        {'id': 3, 'emailAddress': 'guava@example.com', 'active': True, 'supplier': {'supplierId': 1}},
+        {'id': 4, 'emailAddress': 'kiwi@example.com', 'active': True, 'supplier': {'supplierId': 2}},
+    ])
+
+    assert get_supplier_email_addresses_by_supplier_id(SupplierUserIndex(data_api_client), 1) == [
         'mangoes@example.com', 'guava@example.com'
     ]
-    assert data_api_client.find_users.call_args == mock.call(supplier_id=1)
+    assert data_api_client.find_users_iter.call_args == mock.call(role='supplier')
 
 
 def test_create_context_for_supplier():
@@ -350,9 +350,12 @@ def test_main_calls_functions(
             data_api_client.return_value,
             get_live_briefs_with_new_questions_and_answers_between_two_dates.return_value
         )
+    supplier_users = get_supplier_email_addresses_by_supplier_id.call_args[0][0]
+    assert isinstance(supplier_users, SupplierUserIndex)
+    assert supplier_users.data_api_client is data_api_client.return_value
     assert get_supplier_email_addresses_by_supplier_id.call_args_list == [
-        mock.call(data_api_client.return_value, 3),
-        mock.call(data_api_client.return_value, 4),
+        mock.call(supplier_users, 3),
+        mock.call(supplier_users, 4),
     ]
     assert send_supplier_emails.call_args_list == [
         mock.call(
@@ -410,7 +413,7 @@ def test_main_can_restrict_to_custom_list_of_suppliers(
 
     assert data_api_client.call_args == mock.call('api_url', 'api_token')
     assert get_supplier_email_addresses_by_supplier_id.call_args_list == [
-        mock.call(data_api_client.return_value, 4),
+        mock.call(mock.ANY, 4),
     ]
     assert send_supplier_emails.call_args_list == [
         mock.call(
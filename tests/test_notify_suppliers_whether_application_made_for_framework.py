@@ -8,6 +8,7 @@ from dmutils.email.exceptions import EmailError, EmailTemplateError
 from dmapiclient import DataAPIClient
 from dmscripts.notify_suppliers_whether_application_made_for_framework import (
     notify_suppliers_whether_application_made,
+    notifications,
     NOTIFY_TEMPLATES,
 )
 
@@ -231,3 +232,12 @@ class TestNotifySuppliersWhetherApplicationMade:
                 "Error sending email to supplier '712345' user 's2qDcB8cMZHhlyLW-QJ0vBtVAf5p6_MzE-RA_ksP4hA=': Arghhh!"
             )
         ]
+
+    def test_notifications_for_email_engine(self):
+        assert [
+            (n["email_address"], n["template_id"], n["personalisation"]["applied"])
+            for n in notifications(self.data_api_client, 'g-cloud-12', supplier_ids=[712346])
+        ] == [
+            ("user2@example.com", NOTIFY_TEMPLATES['application_made'], True),
+            ("user3@example.com", NOTIFY_TEMPLATES['application_made'], True),
+        ]
@@ -9,6 +9,7 @@ from dmscripts.notify_suppliers_with_incomplete_applications import (
     notify_suppliers_with_incomplete_applications,
     MESSAGES,
 )
+from dmscripts.helpers.draft_service_helpers import DraftServiceAggregate
 from dmtestutils.api_model_stubs import FrameworkStub
 
 
@@ -129,6 +130,17 @@ class TestNotifySuppliersWithIncompleteApplications:
 
         self.logging_mock = mock.create_autospec(Logger, instance=True)
 
+    @staticmethod
+    def find_users_iter(framework_suppliers, users_case):
+        def find_users_iter(supplier_id=None, role=None):
+            return iter([
+                dict(user, supplier={'supplierId': sf['supplierId']})
+                for sf in framework_suppliers
+                for user in users_case['users']
+                if supplier_id in (None, sf['supplierId'])
+            ])
+        return find_users_iter
+
     @pytest.mark.parametrize(
         'draft_services_case,framework_supplier_case,users_case,expected_mails,expected_message', message_test_cases
     )
@@ -142,7 +154,9 @@ class TestNotifySuppliersWithIncompleteApplications:
         """
         self.data_api_client_mock.find_draft_services_iter.return_value = draft_services_case
         self.data_api_client_mock.find_framework_suppliers_iter.return_value = framework_supplier_case
-        self.data_api_client_mock.find_users.return_value = users_case
+        self.data_api_client_mock.find_users_iter.side_effect = self.find_users_iter(
+            framework_supplier_case, users_case
+        )
 
         mail_client_mock = mail_client_constructor_mock.return_value = mock.Mock(spec=DMNotifyClient)
         mail_client_mock.logger = mock.Mock(spec=Logger)
@@ -174,7 +188,9 @@ class TestNotifySuppliersWithIncompleteApplications:
         """
         self.data_api_client_mock.find_draft_services_iter.return_value = draft_services_case
         self.data_api_client_mock.find_framework_suppliers_iter.return_value = framework_supplier_case
-        self.data_api_client_mock.find_users.return_value = users_case
+        self.data_api_client_mock.find_users_iter.side_effect = self.find_users_iter(
+            framework_supplier_case, users_case
+        )
 
         mail_client_mock = mail_client_constructor_mock.return_value = mock.Mock(spec=DMNotifyClient)
         mail_client_mock.logger = mock.Mock(spec=Logger)
@@ -210,3 +226,52 @@ class TestNotifySuppliersWithIncompleteApplications:
             )
 
         assert str(exc.value) == "Suppliers cannot amend applications unless the framework is open."
+
+    @mock.patch('dmscripts.notify_suppliers_with_incomplete_applications.scripts_notify_client', autospec=True)
+    def test_users_are_listed_once_for_all_suppliers(self, mail_client_constructor_mock):
+        framework_suppliers = [
+            {'supplierId': supplier_id, 'applicationCompanyDetailsConfirmed': False, 'declaration': {}}
+            for supplier_id in range(100)
+        ]
+        self.data_api_client_mock.find_draft_services_iter.return_value = []
+        self.data_api_client_mock.find_framework_suppliers_iter.return_value = framework_suppliers
+        self.data_api_client_mock.find_users_iter.side_effect = self.find_users_iter(
+            framework_suppliers, {'users': [{'active': True, 'emailAddress': 'abc@example.com'}]}
+        )
+        mail_client_mock = mail_client_constructor_mock.return_value = mock.Mock(spec=DMNotifyClient)
+        mail_client_mock.logger = mock.Mock(spec=Logger)
+
+        notify_suppliers_with_incomplete_applications(
+            'g-cloud-10', self.data_api_client_mock, 'notify_api_key', False, self.logging_mock
+        )
+
+        assert mail_client_mock.send_email.call_count == 100
+        assert self.data_api_client_mock.find_users_iter.call_args_list == [mock.call(role='supplier')]
+        assert self.data_api_client_mock.find_users.called is False
+
+    @mock.patch('dmscripts.notify_suppliers_with_incomplete_applications.scripts_notify_client', autospec=True)
+    def test_draft_service_aggregate(self, mail_client_constructor_mock):
+        framework_suppliers = [
+            {'supplierId': supplier_id, 'applicationCompanyDetailsConfirmed': True, 'declaration': {
+                'status': 'complete', 'primaryContactEmail': f'{supplier_id}@example.com',
+            }}
+            for supplier_id in (1, 2, 3)
+        ]
+        draft_services = DraftServiceAggregate('g-cloud-10')
+        for i, (supplier_id, status) in enumerate(((1, 'submitted'), (2, 'submitted'), (2, 'not-submitted'))):
+            draft_services.add({'id': i, 'supplierId': supplier_id, 'lotSlug': 'cloud-hosting', 'status': status})
+        self.data_api_client_mock.find_framework_suppliers_iter.return_value = framework_suppliers
+        self.data_api_client_mock.find_users_iter.side_effect = self.find_users_iter(framework_suppliers, {'users': []})
+        mail_client_mock = mail_client_constructor_mock.return_value = mock.Mock(spec=DMNotifyClient)
+        mail_client_mock.logger = mock.Mock(spec=Logger)
+
+        notify_suppliers_with_incomplete_applications(
+            'g-cloud-10', self.data_api_client_mock, 'notify_api_key', False, self.logging_mock,
+            draft_services=draft_services,
+        )
+
+        assert [(call[0][0], call[0][2]['message']) for call in mail_client_mock.send_email.call_args_list] == [
+            ('2@example.com', MESSAGES['unsubmitted_services'].format(1)),
+            ('3@example.com', MESSAGES['no_services']),
+        ]
+        assert self.data_api_client_mock.find_draft_services_iter.called is False